@@ -1,7 +1,14 @@
 """ Abstract class to represent a parameterized Circuit object"""
-import copy
+import io
+
+import numpy
 
 from _abstract_gate import AbstractGate
+from _circuit_storage import GateStorage
+from _interaction_graph import InteractionGraph
+import _circuit_io
+import _fingerprint
+import _scheduling
 
 
 class AbstractCircuitError(Exception):
@@ -14,6 +21,13 @@ class AbstractCircuit(object):
     Circuit is an abstract class that captures the basic features of a
     quantum circuit by defining it as a 2D array of abstractGates.
 
+    The gates are kept in a GateStorage, i.e. a table of gate types plus
+    NumPy arrays holding the type id, targets, parameter indexes,
+    variational flag and time of every gate. basic_block is built from
+    those arrays when accessed. The weighted graph of interacting qubit
+    pairs and the content hash of the circuit are kept up to date as
+    gates are added.
+
     Attributes:
         basic_block (list):
             An 2D list of AbstractGates, where each row corresponds
@@ -22,9 +36,16 @@ class AbstractCircuit(object):
             Number of qubits in the circuit register
         n_parameters (integer):
             Number of parameters
+        n_blocks (integer):
+            Number of repetitions of basic_block. Repetitions are not
+            stored; simulators apply the block n_blocks times.
+        shared_parameters (bool):
+            Whether every repetition uses the parameters of the first
+            one. Otherwise the parameter indexes of repetition b are
+            shifted by b times the number of parameters of the block.
     """
 
-    def __init__(self, n_qubits, n_blocks=1):
+    def __init__(self, n_qubits, n_blocks=1, shared_parameters=False):
         """
         Inits an AbstractCircuit.
 
@@ -32,29 +53,74 @@ class AbstractCircuit(object):
 
         Args:
             n_qubits: number of qubits of the circuit register
-            n_parameters (integer, optional): number of parameters involved
-            in the circuit
+            n_blocks (integer, optional): number of repetitions of the
+                basic block
+            shared_parameters (bool, optional): all the repetitions share
+                the parameters of the basic block
         """
         if not isinstance(n_qubits, int):
             raise AssertionError('number of qubits must be an integer.')
         if not isinstance(n_blocks, int) or n_blocks < 1:
-            raise ValueError('number of qubits must be a positive integer.')
+            raise ValueError('number of blocks must be a positive integer.')
         self.n_qubits = n_qubits
         self.n_blocks = n_blocks
-        self.basic_block = []
+        self.shared_parameters = bool(shared_parameters)
+        self.gates = GateStorage()
+        self.interactions = InteractionGraph(n_qubits)
+        # hash of the gates only; the register size and the repetitions
+        # can change after construction and are added by fingerprint()
+        self._digest = _fingerprint.new_digest('gates')
         self.n_variables = 0
         self.n_constants = 0
 
+    @classmethod
+    def from_arrays(cls, n_qubits, templates, type_id, targets, indexes,
+                    layer_offsets, n_blocks=1, shared_parameters=False):
+        """
+        Build a circuit from gate arrays
+
+        Args:
+            n_qubits (integer): number of qubits of the circuit register
+            templates (list): GateTemplates referred to by type_id
+            type_id (numpy.ndarray): template index of every gate
+            targets (numpy.ndarray): (n_gates, width) qubit indexes,
+                padded with -1
+            indexes (numpy.ndarray): (n_gates, depth) parameter indexes,
+                padded with -1
+            layer_offsets (numpy.ndarray): first gate of every layer,
+                followed by n_gates
+            n_blocks (integer): number of block repetitions
+            shared_parameters (bool): repetitions share their parameters
+        """
+        circuit = cls(n_qubits, n_blocks, shared_parameters)
+        layer_offsets = numpy.asarray(layer_offsets)
+        for start, stop in zip(layer_offsets[:-1], layer_offsets[1:]):
+            if start == stop:
+                continue
+            # append runs of consecutive gates of the same type at once
+            bounds = numpy.flatnonzero(numpy.diff(type_id[start:stop])) + 1
+            bounds = [0] + bounds.tolist() + [stop - start]
+            for run_start, run_stop in zip(bounds[:-1], bounds[1:]):
+                template = templates[type_id[start + run_start]]
+                rows = slice(start + run_start, start + run_stop)
+                circuit._append_gates(
+                    template, targets[rows, :template.span],
+                    indexes[rows, :template.n_parameters])
+            circuit._end_layer()
+        return circuit
+
+    @staticmethod
     def empty(n_qubits):
         """
             Returns:
                 multiplative identity circuit
         """
-        return AbstractCircuit(n_qubits, b_blocks=1)
+        return AbstractCircuit(n_qubits, n_blocks=1)
 
     def get_n_parameters(self, is_variational=False):
         """
-        Return number of constants or number of n_variables
+        Return number of constants or number of n_variables of the basic
+        block
 
         Args:
             is_variational (bool)
@@ -65,6 +131,150 @@ class AbstractCircuit(object):
         else:
             return self.n_constants
 
+    def get_block_offsets(self, is_variational=False, n_blocks=None):
+        """
+        Return the shift of the parameter indexes of every repetition of
+        the basic block
+
+        Args:
+            is_variational (bool)
+            n_blocks (integer, optional): number of repetitions, defaults
+                to n_blocks
+
+        Returns:
+            offsets (numpy.ndarray): (n_blocks,) index offsets
+        """
+        if n_blocks is None:
+            n_blocks = self.n_blocks
+        if self.shared_parameters:
+            return numpy.zeros(n_blocks, dtype=numpy.int64)
+        return (numpy.arange(n_blocks, dtype=numpy.int64) *
+                self.get_n_parameters(is_variational))
+
+    def get_n_total_parameters(self, is_variational=False, n_blocks=None):
+        """
+        Return number of constants or number of variables of all the
+        repetitions of the basic block
+
+        Args:
+            is_variational (bool)
+            n_blocks (integer, optional): number of repetitions, defaults
+                to n_blocks
+        """
+        if n_blocks is None:
+            n_blocks = self.n_blocks
+        if self.shared_parameters:
+            return self.get_n_parameters(is_variational)
+        return n_blocks * self.get_n_parameters(is_variational)
+
+    def get_n_gates(self):
+        return self.gates.n_gates
+
+    def get_depth(self):
+        return self.gates.n_layers
+
+    def get_critical_path(self):
+        """
+        Return the per-qubit critical-path durations and the total time
+        of the circuit, scheduling every gate as soon as possible
+        """
+        return _scheduling.critical_path(self)
+
+    def get_duration(self):
+        return self.get_critical_path()[1]
+
+    def compacted(self, mode='asap'):
+        """
+        Return a copy of the circuit re-layered by ASAP or ALAP
+        scheduling, with gates acting on disjoint qubits in every layer
+
+        Args:
+            mode (string): 'asap' or 'alap'
+        """
+        return _scheduling.compact(self, mode)
+
+    def fingerprint(self, relabel_invariant=False):
+        """
+        Return a stable hash of the gates, targets and parameter indexes
+        of the circuit. The default hash is maintained as layers are
+        added and costs nothing to read.
+
+        Args:
+            relabel_invariant (bool): give the same hash to circuits
+                which only differ by a relabeling of their qubits
+        """
+        return _fingerprint.circuit_fingerprint(self, relabel_invariant)
+
+    def get_interaction_graph(self):
+        return self.interactions
+
+    def get_gate(self, row):
+        """
+        Return the AbstractGate stored in a given row of the gate arrays
+
+        Args:
+            row (integer): position of the gate in the circuit
+        """
+        return AbstractGate.from_template(
+            self.gates.table[self.gates.type_id[row]],
+            self.gates.gate_targets(row),
+            self.gates.gate_indexes(row))
+
+    def get_layer(self, layer):
+        """
+        Return a layer as a list of AbstractGates
+
+        Args:
+            layer (integer): index of the layer
+        """
+        start, stop = self.gates.layer_range(layer)
+        return [self.get_gate(row) for row in range(start, stop)]
+
+    @property
+    def basic_block(self):
+        """
+        2D list of AbstractGates built from the gate arrays. Changing
+        the gates of the list does not change the circuit.
+        """
+        return [self.get_layer(n) for n in range(self.gates.n_layers)]
+
+    def _check_targets(self, targets):
+        """Raise ValueError unless every target is a qubit of the
+        register"""
+        targets = numpy.asarray(targets)
+        if targets.size > 0 and (targets.min() < 0 or
+                                 targets.max() >= self.n_qubits):
+            raise ValueError('targets must be qubits of the register')
+
+    def _append_gates(self, template, targets, indexes):
+        """
+        Append placements of a gate template to the current layer
+
+        Args:
+            template (GateTemplate): definition shared by the gates
+            targets (numpy.ndarray): (n, span) array of qubit indexes
+            indexes (numpy.ndarray): (n, n_parameters) array of
+                parameter indexes
+        """
+        self._check_targets(targets)
+        if indexes.size > 0:
+            n_indexes = int(indexes.max()) + 1
+            if template.is_variational:
+                self.n_variables = max(self.n_variables, n_indexes)
+            else:
+                self.n_constants = max(self.n_constants, n_indexes)
+        type_id = self.gates.table.get_id(template)
+        self.gates.append(type_id, targets, indexes)
+        self.interactions.add_gates(targets, template.time)
+        self._digest.update(_fingerprint.gate_rows_bytes(template, targets,
+                                                         indexes))
+
+    def _end_layer(self):
+        """Close the layer holding the gates appended since the last
+        layer"""
+        self.gates.end_layer()
+        self._digest.update(_fingerprint.LAYER_MARKER)
+
     def _add_layer(self, layer):
         """
         Add layer of gates to the circuit basic_block
@@ -79,16 +289,23 @@ class AbstractCircuit(object):
             if not isinstance(gate, AbstractGate):
                 raise AssertionError('Invalid layer: elements of layer' +
                                      'not valid AbstractGates')
-            if gate.get_is_variational():
-                if any(ind + 1 > self.n_variables for ind in
-                       gate.get_indexes()):
-                    self.n_variables = max(gate.get_indexes()) + 1
-            else:
-                if any(ind + 1 > self.n_constants for ind in
-                       gate.get_indexes()):
-                    self.n_constants = max(gate.get_indexes()) + 1
-
-        self.basic_block.append(layer)
+            # checked before any gate of the layer is appended
+            self._check_targets(gate.get_targets())
+
+        # append runs of consecutive gates of the same type at once
+        run_start = 0
+        for n in range(1, len(layer) + 1):
+            template = layer[run_start].get_template()
+            if n == len(layer) or layer[n].get_template() is not template:
+                run = layer[run_start:n]
+                self._append_gates(
+                    template,
+                    numpy.array([gate.get_targets() for gate in run],
+                                dtype=numpy.int32),
+                    numpy.array([gate.get_indexes() for gate in run],
+                                dtype=numpy.int32))
+                run_start = n
+        self._end_layer()
 
     # def __imul__(self, other):
     #     """
@@ -103,12 +320,51 @@ class AbstractCircuit(object):
     #     self.basic_block.append(layer)
 
     def __str__(self):
-        string_rep = ''
-        for n, layer in enumerate(self.basic_block):
-            string_rep += 'layer {0}\n'.format(n)
-            for gate in layer:
-                string_rep += str(gate)+'\n'
-        return string_rep
+        string_rep = io.StringIO()
+        _circuit_io.write_text(self, string_rep)
+        return string_rep.getvalue()
+
+    def write(self, fileobj, header=True):
+        """
+        Write the circuit to a text file object, one layer at a time
+
+        Args:
+            fileobj (file): text file object
+            header (bool): write the register size and gate type table,
+                needed to recover gate times and types when reading
+        """
+        _circuit_io.write_text(self, fileobj, header)
+
+    @classmethod
+    def read(cls, fileobj, n_qubits=None):
+        """
+        Read a circuit from a text file object written by write
+
+        Args:
+            fileobj (file): text file object
+            n_qubits (integer, optional): number of qubits of the
+                register when the text has no header
+        """
+        return cls.from_arrays(**_circuit_io.read_text(fileobj, n_qubits))
+
+    def save(self, file):
+        """
+        Save the circuit gate arrays as an .npz archive
+
+        Args:
+            file (string or file): destination, as for numpy.savez
+        """
+        _circuit_io.save_npz(self, file)
+
+    @classmethod
+    def load(cls, file):
+        """
+        Load a circuit saved by save
+
+        Args:
+            file (string or file): source, as for numpy.load
+        """
+        return cls.from_arrays(**_circuit_io.load_npz(file))
 
     def __repr__(self):
         return str(self)
@@ -140,32 +396,51 @@ class AbstractCircuit(object):
         # fix index of first qubit for the gate
         start = int(skip_first_qubit)
 
-        n_parameters = self.get_n_parameters(gate.get_is_variational())
-        # build layer
-        gate_layer = []
-
         # compute number of adyacent gates and gate indexes
         n_gates = (self.n_qubits - start) // span
-        list_qubits = [start + x * span for x in list(range(0, n_gates))]
+        first_qubits = start + span * numpy.arange(n_gates, dtype=numpy.int32)
+        targets = first_qubits[:, None] + numpy.arange(span,
+                                                       dtype=numpy.int32)
 
-        for m, n in enumerate(list_qubits):
-            gate = copy.deepcopy(gate)
-            gate.assign_qubit_indexes(list(range(n, n + span)))
+        # add new layer of placements of the shared gate template
+        self.add_gates_layer(gate, targets, same_angle)
 
-            if same_angle is True:
-                indexes = list(range(n_parameters,
-                                     n_parameters +
-                                     gate.get_n_parameters()))
-            else:
-                indexes = list(range(n_parameters +
-                                     m*gate.get_n_parameters(),
-                                     n_parameters +
-                                     (m+1)*gate.get_n_parameters()))
-            gate.assign_parameter_indexes(indexes)
-            gate_layer.append(gate)
+    def add_gates_layer(self, gate, targets, same_angle=False):
+        """
+        Add a layer placing a gate on each row of a target array
 
-        # add new layer
-        self._add_layer(gate_layer)
+        Args:
+
+            gate (AbstractGate): gate to be placed
+            targets (numpy.ndarray): (n, span) array, each row holding
+                the qubits upon which one placement acts
+            same_angle (bool):
+                assign same angle to all the placements
+        """
+        if not isinstance(gate, AbstractGate):
+            raise AssertionError('Gate is not a valid AbstractGate')
+
+        targets = numpy.asarray(targets, dtype=numpy.int32)
+        if targets.ndim != 2 or targets.shape[1] != gate.get_span():
+            raise ValueError('targets must be an (n, span) array')
+        if len(targets) == 0:
+            raise ValueError('Cannot add empty layer')
+        self._check_targets(targets)
+
+        n_parameters = self.get_n_parameters(gate.get_is_variational())
+        gate_parameters = gate.get_n_parameters()
+        if same_angle is True:
+            indexes = numpy.tile(numpy.arange(gate_parameters,
+                                              dtype=numpy.int32),
+                                 (len(targets), 1))
+        else:
+            indexes = numpy.arange(len(targets) * gate_parameters,
+                                   dtype=numpy.int32).reshape(
+                                       len(targets), gate_parameters)
+
+        self._append_gates(gate.get_template(), targets,
+                           indexes + n_parameters)
+        self._end_layer()
 
     def add_gate_as_layer(self, gate, targets):
         """
@@ -186,6 +461,8 @@ class AbstractCircuit(object):
         if gate.get_span() != len(targets):
             raise ValueError('lens of targets and span must coincide')
 
+        self._check_targets(targets)
+
         gate.assign_qubit_indexes(targets)
 
         n_parameters = self.get_n_parameters(gate.get_is_variational())
@@ -1,5 +1,6 @@
 """Tests for _qubit_operator.py."""
 import copy
+import io
 
 import unittest
 
@@ -42,6 +43,26 @@ class AbstractCircuitTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             _ = AbstractCircuit(10, 2.0)
 
+    def test_empty(self):
+        circuit = AbstractCircuit.empty(3)
+        self.assertEqual(circuit.n_qubits, 3)
+        self.assertEqual(circuit.n_blocks, 1)
+        self.assertEqual(circuit.get_n_gates(), 0)
+
+    def test_block_offsets(self):
+        circuit = build_n_qubit_circuit_test(4, False)
+        circuit.n_blocks = 3
+        n_variables = circuit.get_n_parameters(True)
+        self.assertEqual(circuit.get_block_offsets(True).tolist(),
+                         [0, n_variables, 2 * n_variables])
+        self.assertEqual(circuit.get_n_total_parameters(True),
+                         3 * n_variables)
+        self.assertEqual(circuit.get_n_total_parameters(True, 5),
+                         5 * n_variables)
+        shared = AbstractCircuit(4, 3, shared_parameters=True)
+        self.assertEqual(shared.get_block_offsets(True).tolist(), [0, 0, 0])
+        self.assertEqual(shared.get_n_total_parameters(True), 0)
+
     def test_bad_action_add_layer_empty(self):
         circuit_example = AbstractCircuit(3)
         with self.assertRaises(ValueError):
@@ -123,5 +144,296 @@ class AbstractCircuitTest(unittest.TestCase):
         self.assertEqual(circuit.basic_block[1][1].__str__(), 'ZZ\t2,3\tv1')
         self.assertEqual(circuit.basic_block[3][0].__str__(), 'ZZ\t1,2\tv2')
 
+    def test_gate_arrays(self):
+        circuit = build_n_qubit_circuit_test(4, False)
+        gates = circuit.gates
+        self.assertEqual(circuit.get_n_gates(), 11)
+        self.assertEqual(circuit.get_depth(), 4)
+        self.assertEqual(len(gates.table), 2)
+        self.assertEqual(gates.layer_offsets.tolist(), [0, 4, 6, 10, 11])
+        self.assertEqual(gates.targets[4:7].tolist(),
+                         [[0, 1], [2, 3], [0, -1]])
+        self.assertEqual(gates.indexes[:, 0].tolist(),
+                         [0, 1, 2, 3, 0, 1, 4, 5, 6, 7, 2])
+        self.assertEqual(gates.is_variational.tolist(),
+                         [False] * 4 + [True] * 2 + [False] * 4 + [True])
+        self.assertEqual(gates.time.tolist(),
+                         [10.0] * 4 + [40.0] * 2 + [10.0] * 4 + [40.0])
+
+    def test_gate_arrays_grow_to_widest_gate(self):
+        circuit = AbstractCircuit(3)
+        circuit.add_gate_as_layer(AbstractGate('X', 1, 10.0, 0, False), [2])
+        circuit.add_gate_as_layer(AbstractGate('XYZ', 3, 10.0, 2, True),
+                                  [0, 1, 2])
+        self.assertEqual(circuit.gates.targets.tolist(),
+                         [[2, -1, -1], [0, 1, 2]])
+        self.assertEqual(circuit.gates.indexes.tolist(),
+                         [[-1, -1], [0, 1]])
+        self.assertEqual(str(circuit.get_gate(0)), 'X\t2\t')
+        self.assertEqual(str(circuit.get_gate(1)), 'XYZ\t0,1,2\tv0,v1')
+
+    def test_mixed_layer_keeps_gate_order(self):
+        circuit = AbstractCircuit(3)
+        layer = []
+        for name, target in [('X', 0), ('X', 1), ('Y', 2)]:
+            gate = AbstractGate(name, 1, 10.0, 0, False)
+            gate.assign_qubit_indexes([target])
+            layer.append(gate)
+        circuit._add_layer(layer)
+        self.assertEqual([str(gate) for gate in circuit.basic_block[0]],
+                         ['X\t0\t', 'X\t1\t', 'Y\t2\t'])
+
+    def test_add_adyacent_gates_layer_does_not_copy_gate(self):
+        gate = AbstractGate('ZZ', 2, 40.0, 1, True)
+        circuit = AbstractCircuit(4)
+        circuit.add_adyacent_gates_layer(gate)
+        self.assertEqual([], gate.get_targets())
+        for placed in circuit.basic_block[0]:
+            self.assertIs(placed.get_template(), gate.get_template())
+
+    def test_add_gates_layer(self):
+        gate = AbstractGate('ZZ', 2, 40.0, 1, True)
+        circuit = AbstractCircuit(4)
+        circuit.add_gates_layer(gate, [[0, 3], [1, 2]])
+        circuit.add_gates_layer(gate, [[0, 1], [2, 3]], same_angle=True)
+        self.assertEqual([str(g) for g in circuit.basic_block[0]],
+                         ['ZZ\t0,3\tv0', 'ZZ\t1,2\tv1'])
+        self.assertEqual([str(g) for g in circuit.basic_block[1]],
+                         ['ZZ\t0,1\tv2', 'ZZ\t2,3\tv2'])
+        with self.assertRaises(ValueError):
+            circuit.add_gates_layer(gate, [[0, 4]])
+        with self.assertRaises(ValueError):
+            circuit.add_gates_layer(gate, [[0, 1, 2]])
+
+    def test_wide_deep_circuit(self):
+        circuit = build_n_qubit_circuit_test(1000, False)
+        for _ in range(124):
+            circuit.add_adyacent_gates_layer(
+                AbstractGate('X', 1, 10.0, 1, False))
+        self.assertEqual(circuit.get_depth(), 128)
+        self.assertEqual(circuit.get_n_gates(), 2999 + 124 * 1000)
+        self.assertEqual(circuit.get_n_parameters(False), 126000)
+
+    def test_interaction_graph(self):
+        circuit = build_n_qubit_circuit_test(4, False)
+        circuit.add_gate_as_layer(AbstractGate('ZZ', 2, 40.0, 1, True),
+                                  [3, 2])
+        circuit.add_gate_as_layer(AbstractGate('XXY', 3, 5.0, 0, False),
+                                  [0, 1, 3])
+        graph = circuit.get_interaction_graph()
+        self.assertEqual(graph.pairs().tolist(),
+                         [[0, 1], [2, 3], [1, 2], [0, 3], [1, 3]])
+        self.assertEqual(graph.counts().tolist(), [2, 2, 1, 1, 1])
+        self.assertEqual(graph.times().tolist(),
+                         [45.0, 80.0, 40.0, 5.0, 5.0])
+        matrix = graph.adjacency_matrix()
+        self.assertEqual(matrix[3, 2], 2)
+        self.assertEqual(matrix[0, 2], 0)
+        self.assertEqual(graph.degrees().tolist(), [3, 4, 3, 4])
+        self.assertEqual(
+            (graph.sparse_matrix('time').toarray() ==
+             graph.adjacency_matrix('time')).all(), True)
+
+    def test_targets_out_of_register(self):
+        gate = AbstractGate('ZZ', 2, 40.0, 1, True)
+        circuit = AbstractCircuit(3)
+        with self.assertRaises(ValueError):
+            circuit.add_gate_as_layer(gate, [1, 5])
+        with self.assertRaises(ValueError):
+            circuit.add_gate_as_layer(gate, [-1, 2])
+        with self.assertRaises(ValueError):
+            circuit.add_gates_layer(gate, [[0, 1], [2, 3]])
+        gate_in_register = AbstractGate('ZZ', 2, 40.0, 1, True)
+        gate_in_register.assign_qubit_indexes([0, 1])
+        gate_outside = AbstractGate('ZZ', 2, 40.0, 1, True)
+        gate_outside.assign_qubit_indexes([2, 3])
+        with self.assertRaises(ValueError):
+            circuit._add_layer([gate_in_register, gate_outside])
+        # nothing was recorded by the rejected gates
+        self.assertEqual(circuit.gates.n_gates, 0)
+        self.assertEqual(circuit.get_interaction_graph().n_pairs, 0)
+
+    def test_interaction_graph_targets_out_of_register(self):
+        graph = AbstractCircuit(3).get_interaction_graph()
+        with self.assertRaises(ValueError):
+            graph.add_gates([[1, 5]], 1.)
+        self.assertEqual(graph.n_pairs, 0)
+
+    def test_critical_path(self):
+        circuit = build_n_qubit_circuit_test(4, False)
+        qubit_times, total_time = circuit.get_critical_path()
+        self.assertEqual(qubit_times.tolist(), [60.0, 100.0, 100.0, 60.0])
+        self.assertEqual(total_time, 100.0)
+        self.assertEqual(circuit.get_duration(), 100.0)
+
+    def test_compacted_asap_merges_single_gate_layers(self):
+        x_gate = AbstractGate('X', 1, 10.0, 1, False)
+        zz_gate = AbstractGate('ZZ', 2, 40.0, 1, True)
+        circuit = AbstractCircuit(4)
+        circuit.add_gate_as_layer(zz_gate, [0, 1])
+        circuit.add_gate_as_layer(x_gate, [2])
+        circuit.add_gate_as_layer(zz_gate, [2, 3])
+        circuit.add_gate_as_layer(x_gate, [0])
+        circuit.add_gate_as_layer(x_gate, [1])
+        compacted = circuit.compacted()
+        self.assertEqual(compacted.get_depth(), 2)
+        self.assertEqual([str(g) for g in compacted.basic_block[0]],
+                         ['ZZ\t0,1\tv0', 'X\t2\tc0'])
+        self.assertEqual([str(g) for g in compacted.basic_block[1]],
+                         ['ZZ\t2,3\tv1', 'X\t0\tc1', 'X\t1\tc2'])
+        self.assertEqual(compacted.get_n_parameters(True), 2)
+        self.assertEqual(compacted.get_n_parameters(False), 3)
+
+    def test_compacted_alap(self):
+        x_gate = AbstractGate('X', 1, 10.0, 1, False)
+        zz_gate = AbstractGate('ZZ', 2, 40.0, 1, True)
+        circuit = AbstractCircuit(4)
+        circuit.add_gate_as_layer(x_gate, [3])
+        circuit.add_gate_as_layer(zz_gate, [0, 1])
+        circuit.add_gate_as_layer(zz_gate, [1, 2])
+        circuit.add_gate_as_layer(zz_gate, [2, 3])
+        asap = circuit.compacted('asap')
+        alap = circuit.compacted('alap')
+        self.assertEqual([len(layer) for layer in asap.basic_block],
+                         [2, 1, 1])
+        self.assertEqual([len(layer) for layer in alap.basic_block],
+                         [1, 2, 1])
+        self.assertEqual(str(alap.basic_block[1][0]), 'X\t3\tc0')
+        with self.assertRaises(ValueError):
+            circuit.compacted('later')
+
+    def test_str(self):
+        circuit = AbstractCircuit(3)
+        circuit.add_gate_as_layer(AbstractGate('X', 1, 10.0, 0, False), [2])
+        circuit.add_adyacent_gates_layer(
+            AbstractGate('ZZ', 2, 40.0, 1, True), True, True)
+        self.assertEqual(str(circuit), 'layer 0\nX\t2\t\nlayer 1\nZZ\t1,2\tv0\n')
+
+    def test_text_round_trip(self):
+        circuit = build_n_qubit_circuit_test(5, False)
+        circuit.add_gate_as_layer(AbstractGate('XYZ', 3, 7.5, 2, True,
+                                               'pauli'), [4, 0, 2])
+        stream = io.StringIO()
+        circuit.write(stream)
+        stream.seek(0)
+        copied = AbstractCircuit.read(stream)
+        self.assertEqual(str(copied), str(circuit))
+        self.assertEqual(copied.n_qubits, 5)
+        self.assertEqual(copied.get_n_parameters(True),
+                         circuit.get_n_parameters(True))
+        self.assertEqual(copied.get_n_parameters(False),
+                         circuit.get_n_parameters(False))
+        self.assertEqual(copied.gates.time.tolist(),
+                         circuit.gates.time.tolist())
+        self.assertIs(copied.get_gate(14).get_template(),
+                      circuit.get_gate(14).get_template())
+
+    def test_text_round_trip_templates_differing_by_time(self):
+        circuit = AbstractCircuit(2)
+        circuit.add_gate_as_layer(AbstractGate('X', 1, 10.0, 1, False), [0])
+        circuit.add_gate_as_layer(AbstractGate('X', 1, 20.0, 1, False,
+                                               'slow'), [1])
+        stream = io.StringIO()
+        circuit.write(stream)
+        stream.seek(0)
+        copied = AbstractCircuit.read(stream)
+        self.assertEqual(copied.gates.time.tolist(), [10.0, 20.0])
+        self.assertEqual(copied.get_gate(1).get_template().gate_type, 'slow')
+        self.assertIs(copied.get_gate(1).get_template(),
+                      circuit.get_gate(1).get_template())
+        self.assertEqual(copied.fingerprint(), circuit.fingerprint())
+
+    def test_round_trip_keeps_blocks(self):
+        circuit = AbstractCircuit(3, 4, shared_parameters=True)
+        circuit.add_adyacent_gates_layer(AbstractGate('RX', 1, 10.0, 1,
+                                                      True))
+        stream = io.StringIO()
+        circuit.write(stream)
+        stream.seek(0)
+        copied = AbstractCircuit.read(stream)
+        self.assertEqual(copied.n_blocks, 4)
+        self.assertTrue(copied.shared_parameters)
+        self.assertEqual(copied.fingerprint(), circuit.fingerprint())
+        stream = io.BytesIO()
+        circuit.save(stream)
+        stream.seek(0)
+        copied = AbstractCircuit.load(stream)
+        self.assertEqual(copied.n_blocks, 4)
+        self.assertTrue(copied.shared_parameters)
+
+    def test_text_without_header(self):
+        circuit = build_n_qubit_circuit_test(4, True)
+        copied = AbstractCircuit.read(io.StringIO(str(circuit)))
+        self.assertEqual(str(copied), str(circuit))
+        self.assertEqual(copied.n_qubits, 4)
+        self.assertEqual(copied.get_gate(0).get_time(), 0.0)
+
+    def test_npz_round_trip(self):
+        circuit = build_n_qubit_circuit_test(6, False)
+        circuit.add_gate_as_layer(AbstractGate('XYZ', 3, 7.5, 2, True,
+                                               'pauli'), [4, 0, 2])
+        stream = io.BytesIO()
+        circuit.save(stream)
+        stream.seek(0)
+        copied = AbstractCircuit.load(stream)
+        self.assertEqual(str(copied), str(circuit))
+        self.assertEqual(copied.n_qubits, 6)
+        self.assertEqual(copied.gates.layer_offsets.tolist(),
+                         circuit.gates.layer_offsets.tolist())
+        self.assertEqual(copied.gates.is_variational.tolist(),
+                         circuit.gates.is_variational.tolist())
+        self.assertEqual(copied.get_gate(17).get_type(), 'pauli')
+
+    def test_fingerprint(self):
+        circuit = build_n_qubit_circuit_test(4, False)
+        same = build_n_qubit_circuit_test(4, False)
+        other = build_n_qubit_circuit_test(4, True)
+        self.assertEqual(circuit.fingerprint(), same.fingerprint())
+        self.assertNotEqual(circuit.fingerprint(), other.fingerprint())
+        copied = AbstractCircuit.read(io.StringIO(str(circuit)))
+        self.assertNotEqual(circuit.fingerprint(), copied.fingerprint())
+        stream = io.BytesIO()
+        circuit.save(stream)
+        stream.seek(0)
+        self.assertEqual(circuit.fingerprint(),
+                         AbstractCircuit.load(stream).fingerprint())
+        before = circuit.fingerprint()
+        circuit.add_gate_as_layer(AbstractGate('X', 1, 10.0, 1, False), [0])
+        self.assertNotEqual(before, circuit.fingerprint())
+
+    def test_fingerprint_relabel_invariant(self):
+        gate = AbstractGate('ZZ', 2, 40.0, 1, True)
+        circuit = AbstractCircuit(3)
+        circuit.add_gate_as_layer(gate, [0, 1])
+        circuit.add_gate_as_layer(gate, [1, 2])
+        relabeled = AbstractCircuit(3)
+        relabeled.add_gate_as_layer(gate, [2, 0])
+        relabeled.add_gate_as_layer(gate, [0, 1])
+        self.assertNotEqual(circuit.fingerprint(), relabeled.fingerprint())
+        self.assertEqual(circuit.fingerprint(True),
+                         relabeled.fingerprint(True))
+        swapped = AbstractCircuit(3)
+        swapped.add_gate_as_layer(gate, [1, 2])
+        swapped.add_gate_as_layer(gate, [1, 0])
+        self.assertNotEqual(circuit.fingerprint(True),
+                            swapped.fingerprint(True))
+
+    def test_fingerprint_after_setting_blocks(self):
+        gate = AbstractGate('ZZ', 2, 40.0, 1, True)
+        circuits = [AbstractCircuit(3), AbstractCircuit(3, n_blocks=3),
+                    AbstractCircuit(3, n_blocks=3, shared_parameters=True)]
+        for circuit in circuits:
+            circuit.add_gate_as_layer(gate, [0, 1])
+        before = [c.fingerprint(r) for c in circuits for r in (False, True)]
+        circuits[0].n_blocks = 3
+        self.assertEqual(circuits[0].fingerprint(), circuits[1].fingerprint())
+        self.assertEqual(circuits[0].fingerprint(True),
+                         circuits[1].fingerprint(True))
+        self.assertNotEqual(circuits[0].fingerprint(), before[0])
+        circuits[1].shared_parameters = True
+        self.assertEqual(circuits[1].fingerprint(), before[4])
+        self.assertEqual(circuits[1].fingerprint(True), before[5])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,10 +1,39 @@
 """ Abstract class to represent a parameterized Gate object"""
+from collections import namedtuple
 
 
 class AbstractGateError(Exception):
     pass
 
 
+class GateTemplate(namedtuple('GateTemplate',
+                              ['name', 'span', 'time', 'n_parameters',
+                               'is_variational', 'gate_type'])):
+    """ Immutable definition of a gate, shared by all its placements
+
+    A template holds everything about a gate except where it is placed,
+    i.e. its targets and parameter indexes. Templates are interned by
+    get_template so that equal definitions are the same object.
+    """
+    __slots__ = ()
+
+
+_templates = {}
+
+
+def get_template(name, span, time=0.0, n_parameters=0,
+                 is_variational=False, gate_type='default'):
+    """
+    Return the shared GateTemplate with the given definition
+    """
+    key = (name, span, time, n_parameters, is_variational, gate_type)
+    template = _templates.get(key)
+    if template is None:
+        template = GateTemplate(*key)
+        _templates[key] = template
+    return template
+
+
 class AbstractGate(object):
     """ Class for defining the core features of a parameterized Gate
 
@@ -26,8 +55,15 @@ class AbstractGate(object):
             Boolean indicating whether the gate acts as a variational
             gate or not. e.g. True
 
+    Gates use __slots__ and carry no per-instance __dict__. The gate
+    definition lives in a shared GateTemplate and each gate only stores
+    its targets and parameter indexes. Circuits do not keep AbstractGate
+    objects; they store their gates as arrays and hand out AbstractGates
+    as views built on demand.
     """
 
+    __slots__ = ('template', 'targets', 'indexes')
+
     def __init__(self, name, span, time=0.0, n_parameters=0,
                  is_variational=False, gate_type='default'):
         """
@@ -61,14 +97,50 @@ class AbstractGate(object):
             raise ValueError('variational must be a boolean.')
         if not isinstance(gate_type, str):
             raise ValueError('Gate type must be a string.')
-        self.name = name
-        self.span = span
-        self.time = time
-        self.n_parameters = n_parameters
-        self.is_variational = is_variational
+        self.template = get_template(name, span, time, n_parameters,
+                                     is_variational, gate_type)
         self.targets = []
         self.indexes = []
-        self.gate_type = gate_type
+
+    @classmethod
+    def from_template(cls, template, targets=None, indexes=None):
+        """
+        Return a gate placing a GateTemplate, skipping argument checks
+
+        Args:
+            template (GateTemplate): definition of the gate
+            targets (list, optional): qubits targeted by the gate
+            indexes (list, optional): parameter indexes of the gate
+        """
+        gate = cls.__new__(cls)
+        gate.template = template
+        gate.targets = [] if targets is None else targets
+        gate.indexes = [] if indexes is None else indexes
+        return gate
+
+    @property
+    def name(self):
+        return self.template.name
+
+    @property
+    def span(self):
+        return self.template.span
+
+    @property
+    def time(self):
+        return self.template.time
+
+    @property
+    def n_parameters(self):
+        return self.template.n_parameters
+
+    @property
+    def is_variational(self):
+        return self.template.is_variational
+
+    @property
+    def gate_type(self):
+        return self.template.gate_type
 
     def get_name(self):
         return self.name
@@ -122,19 +194,18 @@ class AbstractGate(object):
             raise AbstractGateError("Number of qubits for gate is incorrect")
         self.targets = indexes
 
+    def get_template(self):
+        return self.template
+
     def __str__(self):
-        targets_str = ''
-        indexes_str = ''
         if self.get_is_variational() is True:
             var_type = 'v'
         else:
             var_type = 'c'
-        for t in self.targets:
-            targets_str += str(t)+','
-        for i in self.indexes:
-            indexes_str += var_type+str(i)+','
-        return ("{0}\t{1}\t{2}".format(self.name, targets_str[:-1],
-                                       indexes_str[:-1]))
+        targets_str = ','.join([str(t) for t in self.targets])
+        indexes_str = ','.join([var_type + str(i) for i in self.indexes])
+        return ("{0}\t{1}\t{2}".format(self.name, targets_str,
+                                       indexes_str))
 
     def __repr__(self):
         return str(self)
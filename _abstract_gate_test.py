@@ -4,7 +4,8 @@ import copy
 import unittest
 
 from _abstract_gate import (AbstractGate,
-                            AbstractGateError)
+                            AbstractGateError,
+                            get_template)
 
 class AbstractGateTest(unittest.TestCase):
 
@@ -30,6 +31,28 @@ class AbstractGateTest(unittest.TestCase):
         self.assertEqual([], two_qubit_gate.get_indexes())
         self.assertEqual([], two_qubit_gate.get_targets())
 
+    def test_gate_has_no_dict(self):
+        gate = AbstractGate('X', 1, 10.0, 1, False)
+        self.assertFalse(hasattr(gate, '__dict__'))
+        with self.assertRaises(AttributeError):
+            gate.label = 'x'
+
+    def test_gates_share_template(self):
+        gate = AbstractGate('XX', 2, 10.0, 1, True, 'pauli')
+        other = AbstractGate('XX', 2, 10.0, 1, True, 'pauli')
+        gate.assign_qubit_indexes([0, 1])
+        self.assertIs(gate.get_template(), other.get_template())
+        self.assertEqual(('XX', 2, 10.0, 1, True, 'pauli'),
+                         tuple(gate.get_template()))
+        self.assertEqual([], other.get_targets())
+        with self.assertRaises(AttributeError):
+            gate.get_template().span = 3
+
+    def test_from_template(self):
+        template = get_template('ZZ', 2, 40.0, 1, True)
+        gate = AbstractGate.from_template(template, [1, 2], [3])
+        self.assertEqual(gate.__str__(), 'ZZ\t1,2\tv3')
+
     def test_assign_parameter_indexes(self):
         gate = AbstractGate('XXY', 3, 10.0, 1, True)
         gate.assign_parameter_indexes([0])
@@ -0,0 +1,409 @@
+""" Resident allocation service speaking JSON lines
+
+Every line sent to the service is one allocation request:
+
+    {"id": 1, "device": "19Q-Acorn.json", "program": "H 0\\nCNOT 0 1\\n",
+     "options": {"maxiter": 500}, "seed": 3}
+
+and every line it writes back is the answer to one request:
+
+    {"id": 1, "mapping": {"0": 5, "1": 6}, "cost": 3, "total_iter": 500,
+     "search_time": 0.41, "batch_size": 1}
+
+or {"id": 1, "error": "..."} when the request failed. The mapping sends
+every qubit of the program to a hardware qubit, the cost being the
+number of SWAP gates plus the gate depth of the program routed by
+_local_compiler (the objective of qneuron_opt), and the search being the
+simulated annealing of _coplacement. {"op": "stats"} returns the state
+of the caches.
+
+Devices are loaded the first time they are named and kept with their
+distance matrix, symmetries and a cache of the costs of the mappings
+already tried, symmetric mappings sharing one entry,
+so that only the search remains per request. Requests for the same
+device are answered in batches by one worker at a time: requests
+arriving while the worker is busy wait for the next batch, and
+identical requests of a batch share one search.
+
+The service reads stdin (python _allocation_service.py) or listens on a
+local TCP port (python _allocation_service.py --port 8765).
+"""
+from __future__ import absolute_import
+
+import collections
+import concurrent.futures
+import json
+import random
+import socketserver
+import sys
+import threading
+import time
+
+from _coplacement import CoPlacement
+from _fingerprint import program_fingerprint
+from _local_compiler import LocalCompileJob, parse_quil
+from hardwaregraph import Hardware_load
+
+DEFAULT_OPTIONS = {
+    'init_T': 10,
+    'time_const': 25,
+    'step_perT': 10,
+    'final_T': 0.1,
+    'maxiter': 2000,
+}
+
+
+def load_rigetti(name):
+    """Returns the HardwareGraph of a Rigetti device specification file"""
+    return Hardware_load(name, {'org': 'Rigetti'})
+
+
+def relabel(instructions, mapping):
+    """Returns instructions with every qubit q moved to mapping[q]"""
+    return [(name, parameters, tuple(mapping[q] for q in qubits))
+            for name, parameters, qubits in instructions]
+
+
+def routing_cost(job):
+    """Returns the SWAP count plus the gate depth of a compiled job"""
+    return job.topological_swaps() + job.gate_depth()
+
+
+CostCacheInfo = collections.namedtuple('CostCacheInfo',
+                                       ['hits', 'misses', 'maxsize',
+                                        'currsize'])
+
+
+class CostCache(object):
+    """ Least recently used cache of the costs of mappings
+
+    Attributes:
+        maxsize (integer):
+            Maximum number of costs kept
+        hits (integer):
+            Number of costs found in the cache
+        misses (integer):
+            Number of costs computed
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._costs = collections.OrderedDict()
+
+    def get(self, key, compute):
+        """
+        Returns the cost of a key, computing it on a miss
+
+        Args:
+            key (tuple): hashable key of the mapping
+            compute (callable): returns the cost when called without
+                arguments
+        """
+        if key in self._costs:
+            self.hits += 1
+            self._costs.move_to_end(key)
+            return self._costs[key]
+        self.misses += 1
+        cost = compute()
+        self._costs[key] = cost
+        while len(self._costs) > self.maxsize:
+            self._costs.popitem(last=False)
+        return cost
+
+    def info(self):
+        """Returns the hit and miss counters and the size of the cache"""
+        return CostCacheInfo(self.hits, self.misses, self.maxsize,
+                             len(self._costs))
+
+    def __len__(self):
+        return len(self._costs)
+
+
+class DeviceState(object):
+    """ Warm state of one device
+
+    Attributes:
+        hardware (HardwareGraph):
+            Device
+        costs (CostCache):
+            Cost of every (program, mapping) pair already routed
+        n_requests (integer):
+            Number of requests answered
+        n_searches (integer):
+            Number of searches run
+    """
+
+    def __init__(self, hardware, cache_size=100000):
+        """
+        Args:
+            hardware (HardwareGraph): device
+            cache_size (integer): number of mapping costs kept
+        """
+        self.hardware = hardware
+        # computed once here rather than by the first routed program
+        hardware.distance_matrix()
+        hardware.orbits()
+        self.costs = CostCache(cache_size)
+        self.n_requests = 0
+        self.n_searches = 0
+        self._programs = {}
+
+    def program(self, text):
+        """Returns the fingerprint, instructions and qubits of a program,
+        parsing it once"""
+        key = program_fingerprint(text)
+        if key not in self._programs:
+            instructions = parse_quil(text)
+            qubits = sorted(set(q for _, _, qs in instructions for q in qs))
+            self._programs[key] = (instructions, qubits)
+        return (key,) + self._programs[key]
+
+    def cost(self, key, instructions, qubits, region):
+        """Returns the routing cost of the program qubits placed on
+        region. The regions related by a symmetry of the device share
+        one entry, the cost of their canonical region, which is the one
+        routed."""
+        region = self.hardware.canonical_mapping(region)
+        mapping = dict(zip(qubits, region))
+        return self.costs.get(
+            (key, tuple(region)),
+            lambda: routing_cost(LocalCompileJob(
+                0, relabel(instructions, mapping), self.hardware)))
+
+    def allocate(self, text, options=None, seed=None):
+        """
+        Search the mapping of a program with the lowest routing cost
+
+        Args:
+            text (string): Quil text of the program
+            options (dict, optional): simulated annealing settings as for
+                _annealing.sa, without 'perturb'
+            seed (integer, optional): seed of the initial placement and
+                of the perturbations
+
+        Returns:
+            result (dict): 'mapping' from program qubit to hardware
+                qubit, canonical under the symmetries of the device,
+                'cost' and 'total_iter'
+        """
+        key, instructions, qubits = self.program(text)
+        settings = dict(DEFAULT_OPTIONS, verbose=False)
+        settings.update(options or {})
+        placement = CoPlacement(
+            self.hardware, [len(qubits)],
+            lambda k, region: self.cost(key, instructions, qubits, region),
+            random.Random(seed))
+        self.n_searches += 1
+        results = placement.optimize(options=settings)
+        # the region whose cost was routed
+        region = self.hardware.canonical_mapping(results['xval_opt'][0])
+        return {
+            'mapping': dict(zip(qubits, region)),
+            'cost': results['fval_opt'],
+            'total_iter': results['total_iter']
+        }
+
+
+class AllocationService(object):
+    """ Allocation requests answered from warm device states
+
+    Attributes:
+        devices (dict):
+            DeviceState of every device name loaded
+    """
+
+    def __init__(self, loader=load_rigetti, max_workers=4,
+                 cache_size=100000):
+        """
+        Args:
+            loader (callable): returns the HardwareGraph of a device name
+            max_workers (integer): number of devices served at once
+            cache_size (integer): number of mapping costs kept per device
+        """
+        self.loader = loader
+        self.cache_size = cache_size
+        self.devices = {}
+        self._lock = threading.Lock()
+        # one lock per device name, held while the device is loaded
+        self._loading = collections.defaultdict(threading.Lock)
+        self._pending = collections.defaultdict(list)
+        self._busy = set()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+
+    def add_device(self, name, hardware):
+        """Serve an already loaded HardwareGraph under a name"""
+        state = DeviceState(hardware, self.cache_size)
+        with self._lock:
+            self.devices[name] = state
+        return state
+
+    def device(self, name):
+        """Returns the DeviceState of a device, loading it once even
+        when several threads ask for it at the same time"""
+        with self._lock:
+            state = self.devices.get(name)
+            loading = self._loading[name]
+        if state is not None:
+            return state
+        with loading:
+            with self._lock:
+                state = self.devices.get(name)
+            if state is None:
+                state = self.add_device(name, self.loader(name))
+        return state
+
+    def submit(self, request):
+        """
+        Queue a request
+
+        Args:
+            request (dict): decoded request line
+
+        Returns:
+            future (concurrent.futures.Future): the response
+        """
+        future = concurrent.futures.Future()
+        if request.get('op') == 'stats':
+            future.set_result(dict(self.stats(), id=request.get('id')))
+            return future
+        name = request.get('device')
+        with self._lock:
+            self._pending[name].append((request, future))
+            if name in self._busy:
+                return future
+            self._busy.add(name)
+        self._executor.submit(self._drain, name)
+        return future
+
+    def handle(self, request):
+        """Answer one request, waiting for its batch"""
+        return self.submit(request).result()
+
+    def _drain(self, name):
+        """Answers the requests of a device batch after batch"""
+        while True:
+            with self._lock:
+                batch = self._pending.pop(name, [])
+                if not batch:
+                    self._busy.discard(name)
+                    return
+            self._answer(name, batch)
+
+    def _answer(self, name, batch):
+        try:
+            state = self.device(name)
+        except Exception as error:
+            for request, future in batch:
+                future.set_result(self._error(request, error))
+            return
+        searches = {}
+        for request, future in batch:
+            start = time.time()
+            try:
+                key = (request['program'],
+                       json.dumps(request.get('options'), sort_keys=True),
+                       request.get('seed'))
+                if key not in searches:
+                    searches[key] = state.allocate(request['program'],
+                                                   request.get('options'),
+                                                   request.get('seed'))
+                response = dict(searches[key], id=request.get('id'),
+                                search_time=time.time() - start,
+                                batch_size=len(batch))
+            except Exception as error:
+                response = self._error(request, error)
+            state.n_requests += 1
+            future.set_result(response)
+
+    @staticmethod
+    def _error(request, error):
+        return {'id': request.get('id'),
+                'error': '{0}: {1}'.format(type(error).__name__, error)}
+
+    def stats(self):
+        """Returns the requests, searches and cost cache of every
+        device"""
+        with self._lock:
+            devices = dict(self.devices)
+        return {'devices': dict(
+            (name, {'n_requests': state.n_requests,
+                    'n_searches': state.n_searches,
+                    'cache': state.costs.info()._asdict()})
+            for name, state in devices.items())}
+
+    def close(self):
+        self._executor.shutdown()
+
+
+def _respond(service, line, write):
+    """Decodes a request line and writes its response when ready.
+    Returns the future of the response."""
+    try:
+        request = json.loads(line)
+    except ValueError as error:
+        future = concurrent.futures.Future()
+        future.set_result({'id': None,
+                           'error': 'ValueError: {0}'.format(error)})
+    else:
+        future = service.submit(request)
+    future.add_done_callback(lambda done: write(done.result()))
+    return future
+
+
+def serve_lines(service, infile, outfile):
+    """
+    Answer the requests read from infile, one JSON object per line
+
+    Responses are written as they are ready, so they can come out of
+    order; match them by id.
+    """
+    lock = threading.Lock()
+
+    def write(response):
+        with lock:
+            outfile.write(json.dumps(response) + '\n')
+            outfile.flush()
+
+    futures = [_respond(service, line, write)
+               for line in infile if line.strip()]
+    concurrent.futures.wait(futures)
+
+
+def serve_socket(service, host='127.0.0.1', port=8765):
+    """Answer JSON-lines requests from every client of a TCP port"""
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            lock = threading.Lock()
+
+            def write(response):
+                with lock:
+                    self.wfile.write((json.dumps(response) + '\n')
+                                     .encode('utf-8'))
+                    self.wfile.flush()
+
+            # answered before the connection is closed
+            futures = [_respond(service, line.decode('utf-8'), write)
+                       for line in self.rfile if line.strip()]
+            concurrent.futures.wait(futures)
+
+    server = socketserver.ThreadingTCPServer((host, port), Handler)
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    service = AllocationService()
+    if '--port' in sys.argv:
+        port = int(sys.argv[sys.argv.index('--port') + 1])
+        serve_socket(service, port=port)
+    else:
+        serve_lines(service, sys.stdin, sys.stdout)
+        service.close()
@@ -0,0 +1,176 @@
+"""Tests for _allocation_service.py."""
+import io
+import json
+import threading
+import unittest
+
+from _allocation_service import (AllocationService,
+                                 CostCache,
+                                 DeviceState,
+                                 relabel,
+                                 routing_cost,
+                                 serve_lines)
+from _coplacement_test import build_grid
+from _local_compiler import LocalCompileJob
+from _local_compiler_test import build_line
+
+PROGRAM = """H 0
+CNOT 0 1
+CNOT 1 2
+CNOT 0 2
+MEASURE 2 [2]
+"""
+
+OPTIONS = {'maxiter': 200, 'init_T': 5, 'time_const': 4, 'final_T': 0.1}
+
+
+class DeviceStateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.state = DeviceState(build_line(6))
+
+    def test_allocate(self):
+        result = self.state.allocate(PROGRAM, OPTIONS, seed=1)
+        mapping = result['mapping']
+        self.assertEqual(sorted(mapping), [0, 1, 2])
+        self.assertEqual(len(set(mapping.values())), 3)
+        self.assertTrue(set(mapping.values()) <= set(range(6)))
+        key, instructions, qubits = self.state.program(PROGRAM)
+        self.assertEqual(result['cost'],
+                         self.state.cost(key, instructions, qubits,
+                                         [mapping[q] for q in qubits]))
+        # three gates on a triangle need a SWAP on a line
+        self.assertEqual(result['cost'], 8)
+
+    def test_cost_is_that_of_the_mapping(self):
+        # routing breaks ties by qubit labels, so on this grid [3, 0, 1]
+        # needs one more SWAP than its mirror image [0, 3, 4]
+        state = DeviceState(build_grid(2, 3))
+        key, instructions, qubits = state.program(PROGRAM)
+
+        def routed(region):
+            return routing_cost(LocalCompileJob(
+                0, relabel(instructions, dict(zip(qubits, region))),
+                state.hardware))
+        self.assertEqual(state.cost(key, instructions, qubits, [3, 0, 1]),
+                         routed([0, 3, 4]))
+        result = state.allocate(PROGRAM, OPTIONS, seed=1)
+        region = [result['mapping'][q] for q in qubits]
+        self.assertEqual(state.hardware.canonical_mapping(region), region)
+        self.assertEqual(result['cost'], routed(region))
+
+    def test_costs_are_kept(self):
+        self.state.allocate(PROGRAM, OPTIONS, seed=1)
+        hits = self.state.costs.hits
+        self.state.allocate(PROGRAM, OPTIONS, seed=1)
+        self.assertGreater(self.state.costs.hits, hits)
+        # 120 mappings of 3 qubits on 6, in mirror pairs
+        self.assertLessEqual(len(self.state.costs), 60)
+        self.assertEqual(self.state.n_searches, 2)
+
+    def test_mirror_mappings_share_costs(self):
+        key, instructions, qubits = self.state.program(PROGRAM)
+        self.state.cost(key, instructions, qubits, [0, 1, 2])
+        self.state.cost(key, instructions, qubits, [5, 4, 3])
+        self.assertEqual(self.state.costs.info().misses, 1)
+        self.assertEqual(self.state.costs.info().hits, 1)
+
+    def test_cost_cache_evicts_least_recently_used(self):
+        costs = CostCache(2)
+        for key in ['a', 'b', 'a', 'c']:
+            costs.get(key, lambda: key.upper())
+        self.assertEqual(costs.get('a', lambda: None), 'A')
+        self.assertIsNone(costs.get('b', lambda: None))
+        self.assertEqual(costs.info(), (2, 4, 2, 2))
+
+    def test_too_many_qubits(self):
+        with self.assertRaises(ValueError):
+            DeviceState(build_line(2)).allocate(PROGRAM, OPTIONS)
+
+
+class AllocationServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loaded = threading.Event()
+        self.release = threading.Event()
+        self.loads = []
+
+        def loader(name):
+            self.loads.append(name)
+            self.loaded.set()
+            self.release.wait(10)
+            return build_line(6)
+
+        self.service = AllocationService(loader, max_workers=2)
+
+    def tearDown(self):
+        self.release.set()
+        self.service.close()
+
+    def request(self, request_id, seed=1):
+        return {'id': request_id, 'device': 'line', 'program': PROGRAM,
+                'options': OPTIONS, 'seed': seed}
+
+    def test_batching(self):
+        first = self.service.submit(self.request(0))
+        self.assertTrue(self.loaded.wait(10))
+        # queued while the device is being loaded
+        futures = [self.service.submit(self.request(n)) for n in (1, 2)]
+        futures.append(self.service.submit(self.request(3, seed=2)))
+        self.release.set()
+        responses = [f.result(10) for f in [first] + futures]
+        self.assertEqual([r['id'] for r in responses], [0, 1, 2, 3])
+        self.assertEqual([r['batch_size'] for r in responses], [1, 3, 3, 3])
+        self.assertEqual(responses[1]['mapping'], responses[2]['mapping'])
+        self.assertEqual(self.loads, ['line'])
+        stats = self.service.stats()['devices']['line']
+        self.assertEqual(stats['n_requests'], 4)
+        self.assertEqual(stats['n_searches'], 3)
+
+    def test_device_loaded_once(self):
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(self.service.device('line')))
+            for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(self.loaded.wait(10))
+        self.release.set()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(self.loads, ['line'])
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(state is results[0] for state in results))
+
+    def test_errors(self):
+        self.release.set()
+        response = self.service.handle({'id': 'x', 'device': 'line'})
+        self.assertEqual(response['id'], 'x')
+        self.assertTrue(response['error'].startswith('KeyError'))
+
+        def failing(name):
+            raise IOError('no such device')
+
+        service = AllocationService(failing)
+        response = service.handle(self.request(1))
+        service.close()
+        self.assertIn('no such device', response['error'])
+
+    def test_serve_lines(self):
+        self.release.set()
+        infile = io.StringIO('\n'.join([json.dumps(self.request(7)),
+                                        'not json',
+                                        json.dumps({'op': 'stats',
+                                                    'id': 8})]) + '\n')
+        outfile = io.StringIO()
+        serve_lines(self.service, infile, outfile)
+        responses = dict((r['id'], r) for r in
+                         map(json.loads, outfile.getvalue().splitlines()))
+        self.assertEqual(sorted(responses[7]['mapping']), ['0', '1', '2'])
+        self.assertEqual(responses[7]['cost'], 8)
+        self.assertIn('error', responses[None])
+        self.assertIn('devices', responses[8])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+""" Simulated annealing over qubit mappings
+
+The objective functions and perturbation schemes are given by the
+caller, so this module has no dependency on pyquil or on a device.
+"""
+from __future__ import absolute_import
+
+from math import exp
+from random import uniform
+
+
+def sa(init_guess, obj_function, options):
+    """
+    Args:
+        init_guess: initial guess for the qubit mapping.
+        obj_function: Objective function
+        options: a dictionary containing optimization settings.
+            'init_T': initial temperature
+            'time_const': time constant
+            'step_perT': iterations per temperature
+            'final_T': final temperature
+                The overall annealing has temperature dropping
+                as T0 * exp(-t/tau) where T0 is the initial
+                temperature and tau is the time constant. Here
+                the time parameter t is an integer marking the
+                number of steps in dropping temperature so far.
+                For every 'step_perT' number of iterations we
+                increment t by 1. Iterations are stopped until
+                final temperature is reached or maximum number
+                of iterations is reached.
+            'maxiter': maximum number of iterations
+            'perturb': function for perturbing the current guess
+            'verbose': print the function values (default True)
+    Returns:
+        results: a dictionary containing the outcome of optimization
+            'fval_opt': optimized function value
+            'xval_opt': optimized input
+            'total_iter': total number of iterations
+            'history_xval': accepted input at every step
+            'history_fval': accepted function value at every step
+    """
+
+    # General simulated annealing parameters
+    iter_count = 0
+    iter_max = options['maxiter']
+    xval_current = init_guess
+    fval_current = obj_function(init_guess)
+    ps = options['perturb']
+    verbose = options.get('verbose', True)
+
+    # Annealing scheme parameters
+    T0 = options['init_T']
+    tau = options['time_const']
+    inner_count = 0
+    step_perT = options['step_perT']
+    t = 0
+    T_current = T0
+    T_final = options['final_T']
+    if T0 * exp(-iter_max / (step_perT * tau)) > T_final:
+        print('Warning: final temperature not reached even at maximum '
+              'iteration.')
+
+    # Storing the history
+    history_xval = [xval_current]
+    history_fval = [fval_current]
+    xval_opt = xval_current
+    fval_opt = fval_current
+
+    if verbose:
+        print("Iter\tFval")
+    while iter_count < iter_max and T_current > T_final:
+
+        # Generate and evaluate new guess
+        xval_proposed = ps(xval_current)
+        try:
+            fval_proposed = obj_function(xval_proposed)
+            if verbose:
+                print("%d\t%d" % (iter_count, fval_proposed))
+            iter_count = iter_count + 1
+            inner_count = inner_count + 1
+        except (AttributeError, ValueError):
+            # (Error from quilc received and handled) the proposal is
+            # dropped
+            xval_proposed = xval_current
+            fval_proposed = fval_current
+        delta_f = fval_proposed - fval_current
+
+        # Metropolis step
+        if inner_count == step_perT:
+            t = t + 1
+            T_current = T0 * exp(-t / tau)
+            inner_count = 0
+        eta = uniform(0, 1)
+        if delta_f <= 0 or eta < exp(-delta_f / T_current):
+            if fval_proposed < fval_opt:
+                xval_opt = xval_proposed
+                fval_opt = fval_proposed
+            xval_current = xval_proposed
+            fval_current = fval_proposed
+        history_xval.append(xval_current)
+        history_fval.append(fval_current)
+
+    return {
+        'fval_opt': fval_opt,
+        'xval_opt': xval_opt,
+        'total_iter': iter_count,
+        'history_xval': history_xval,
+        'history_fval': history_fval
+    }
@@ -0,0 +1,46 @@
+"""Tests for _annealing.py."""
+import random
+import unittest
+
+from _annealing import sa
+
+
+class AnnealingTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(2)
+        self.options = {
+            'init_T': 10,
+            'time_const': 25,
+            'step_perT': 10,
+            'final_T': 0.1,
+            'maxiter': 2000,
+            'perturb': lambda x: x + random.choice([-2, -1, 1, 2]),
+            'verbose': False
+        }
+
+    def test_minimizes(self):
+        result = sa(40, lambda x: (x - 3) ** 2, self.options)
+        self.assertEqual(result['xval_opt'], 3)
+        self.assertEqual(result['fval_opt'], 0)
+        self.assertEqual(len(result['history_xval']),
+                         len(result['history_fval']))
+        self.assertEqual(min(result['history_fval']), 0)
+
+    def test_failed_evaluations_keep_current_guess(self):
+        def obj_function(x):
+            if x % 2:
+                raise ValueError('odd guess')
+            return abs(x)
+        result = sa(10, obj_function, self.options)
+        self.assertTrue(all(x % 2 == 0 for x in result['history_xval']))
+
+    def test_no_iteration(self):
+        self.options['maxiter'] = 0
+        result = sa(5, abs, self.options)
+        self.assertEqual(result['xval_opt'], 5)
+        self.assertEqual(result['total_iter'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
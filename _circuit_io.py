@@ -0,0 +1,216 @@
+""" Streaming text and binary serialization of circuits
+
+The text format is the one printed by AbstractCircuit.__str__: a
+'layer n' line opening every layer followed by one line per gate with
+the gate name, its targets and its parameter indexes, prefixed by 'v'
+for variational and 'c' for constant parameters. It can be preceded by
+a header holding the register size and the table of gate types, so that
+reading it back recovers the gate times and types; every gate line then
+ends with the position of its type in the table, which tells apart
+types differing only by their time or gate type.
+
+The binary format is an .npz archive of the gate arrays of the circuit
+together with its gate type table.
+"""
+from __future__ import absolute_import
+
+import numpy
+
+from _abstract_gate import get_template
+
+
+def _gate_lines(gates, start, stop, type_ids=False):
+    """Yield the text lines of rows start to stop of a GateStorage,
+    ending with the type id of the gate when type_ids is True"""
+    table = gates.table
+    targets = gates.targets[start:stop].tolist()
+    indexes = gates.indexes[start:stop].tolist()
+    for n, type_id in enumerate(gates.type_id[start:stop].tolist()):
+        name, span, _, n_parameters, is_variational, _ = table[type_id]
+        var_type = 'v' if is_variational else 'c'
+        line = '{0}\t{1}\t{2}'.format(
+            name,
+            ','.join([str(t) for t in targets[n][:span]]),
+            ','.join([var_type + str(i) for i in indexes[n][:n_parameters]]))
+        if type_ids:
+            line += '\t{0}'.format(type_id)
+        yield line + '\n'
+
+
+def write_text(circuit, fileobj, header=False):
+    """
+    Write a circuit to a file object, one layer at a time
+
+    Args:
+        circuit (AbstractCircuit): circuit to be written
+        fileobj (file): text file object
+        header (bool): write the register size and the gate type table
+            before the layers, and the type id of every gate
+    """
+    gates = circuit.gates
+    if header:
+        fileobj.write('#circuit\t{0}\t{1}\t{2}\n'.format(
+            circuit.n_qubits, circuit.n_blocks,
+            's' if circuit.shared_parameters else 'i'))
+        for template in gates.table.types:
+            fileobj.write('#gate\t{0}\t{1}\t{2!r}\t{3}\t{4}\t{5}\n'.format(
+                template.name, template.span, template.time,
+                template.n_parameters,
+                'v' if template.is_variational else 'c',
+                template.gate_type))
+    for layer in range(gates.n_layers):
+        start, stop = gates.layer_range(layer)
+        fileobj.write('layer {0}\n'.format(layer))
+        fileobj.write(''.join(_gate_lines(gates, start, stop, header)))
+
+
+def read_text(fileobj, n_qubits=None):
+    """
+    Read a circuit written by write_text, one line at a time
+
+    Gates ending with a type id take the type of that position of the
+    header table. Otherwise they take the first type of the header with
+    the same name, span and parameters, or without one a type with time
+    0.0 and gate type 'default', and the register is as large as the
+    highest target.
+
+    Args:
+        fileobj (file): text file object
+        n_qubits (integer, optional): number of qubits of the register,
+            overriding the one in the header
+
+    Returns:
+        arrays (dict): keyword arguments of AbstractCircuit.from_arrays
+    """
+    header_qubits, n_blocks, shared_parameters = None, 1, False
+    templates, template_ids = [], {}
+    type_ids, targets, indexes, layer_offsets = [], [], [], []
+    for line in fileobj:
+        line = line.rstrip('\n')
+        if not line:
+            continue
+        if line.startswith('#circuit\t'):
+            fields = line.split('\t')
+            header_qubits, n_blocks = int(fields[1]), int(fields[2])
+            shared_parameters = len(fields) > 3 and fields[3] == 's'
+        elif line.startswith('#gate\t'):
+            fields = line.split('\t')
+            template = get_template(fields[1], int(fields[2]),
+                                    float(fields[3]), int(fields[4]),
+                                    fields[5] == 'v', fields[6])
+            key = (template.name, template.span, template.n_parameters,
+                   template.is_variational)
+            template_ids.setdefault(key, len(templates))
+            templates.append(template)
+        elif line.startswith('layer '):
+            layer_offsets.append(len(type_ids))
+        else:
+            fields = line.split('\t')
+            name, gate_targets, gate_indexes = fields[:3]
+            gate_targets = [int(t) for t in gate_targets.split(',') if t]
+            gate_indexes = [i for i in gate_indexes.split(',') if i]
+            if len(fields) > 3 and fields[3]:
+                type_id = int(fields[3])
+                if not 0 <= type_id < len(templates) or \
+                        templates[type_id].name != name:
+                    raise ValueError('Gate {0} has no type {1} in the '
+                                     'header'.format(name, type_id))
+                type_ids.append(type_id)
+            else:
+                is_variational = bool(gate_indexes) and \
+                    gate_indexes[0][0] == 'v'
+                key = (name, len(gate_targets), len(gate_indexes),
+                       is_variational)
+                if key not in template_ids:
+                    template_ids[key] = len(templates)
+                    templates.append(get_template(name, len(gate_targets),
+                                                  0.0, len(gate_indexes),
+                                                  is_variational))
+                type_ids.append(template_ids[key])
+            targets.append(gate_targets)
+            indexes.append([int(i[1:]) for i in gate_indexes])
+    layer_offsets.append(len(type_ids))
+
+    def pad(rows):
+        width = max([len(row) for row in rows] + [1])
+        padded = numpy.full((len(rows), width), -1, dtype=numpy.int32)
+        for n, row in enumerate(rows):
+            padded[n, :len(row)] = row
+        return padded
+
+    padded_targets = pad(targets)
+    if n_qubits is None:
+        n_qubits = header_qubits
+    if n_qubits is None:
+        n_qubits = int(padded_targets.max()) + 1 if targets else 0
+    return {
+        'n_qubits': n_qubits,
+        'templates': templates,
+        'type_id': numpy.asarray(type_ids, dtype=numpy.int32),
+        'targets': padded_targets,
+        'indexes': pad(indexes),
+        'layer_offsets': numpy.asarray(layer_offsets, dtype=numpy.int64),
+        'n_blocks': n_blocks,
+        'shared_parameters': shared_parameters
+    }
+
+
+def save_npz(circuit, file):
+    """
+    Save a circuit as an .npz archive of its gate arrays
+
+    Args:
+        circuit (AbstractCircuit): circuit to be saved
+        file (string or file): destination, as for numpy.savez
+    """
+    gates = circuit.gates
+    types = gates.table.types
+    numpy.savez_compressed(
+        file,
+        n_qubits=circuit.n_qubits,
+        n_blocks=circuit.n_blocks,
+        shared_parameters=circuit.shared_parameters,
+        names=numpy.array([t.name for t in types], dtype=str),
+        spans=numpy.array([t.span for t in types], dtype=numpy.int32),
+        times=numpy.array([t.time for t in types], dtype=numpy.float64),
+        n_parameters=numpy.array([t.n_parameters for t in types],
+                                 dtype=numpy.int32),
+        is_variational=numpy.array([t.is_variational for t in types],
+                                   dtype=bool),
+        gate_types=numpy.array([t.gate_type for t in types], dtype=str),
+        type_id=gates.type_id,
+        targets=gates.targets,
+        indexes=gates.indexes,
+        layer_offsets=gates.layer_offsets)
+
+
+def load_npz(file):
+    """
+    Load the gate arrays saved by save_npz
+
+    Args:
+        file (string or file): source, as for numpy.load
+
+    Returns:
+        arrays (dict): keyword arguments of AbstractCircuit.from_arrays
+    """
+    with numpy.load(file) as data:
+        templates = [get_template(str(name), int(span), float(time),
+                                  int(n_parameters), bool(is_variational),
+                                  str(gate_type))
+                     for name, span, time, n_parameters, is_variational,
+                     gate_type in zip(data['names'], data['spans'],
+                                      data['times'], data['n_parameters'],
+                                      data['is_variational'],
+                                      data['gate_types'])]
+        return {
+            'n_qubits': int(data['n_qubits']),
+            'templates': templates,
+            'type_id': data['type_id'],
+            'targets': data['targets'],
+            'indexes': data['indexes'],
+            'layer_offsets': data['layer_offsets'],
+            'n_blocks': int(data['n_blocks']),
+            'shared_parameters': ('shared_parameters' in data and
+                                  bool(data['shared_parameters']))
+        }
@@ -0,0 +1,157 @@
+""" Struct-of-arrays storage for the gates of a circuit"""
+import numpy
+
+
+class GateTable(object):
+    """ Table of the distinct gate types appearing in a circuit
+
+    Every gate of a circuit is stored as a row referring to an entry of
+    this table, so that names, spans and other per-type data are kept
+    once per type instead of once per gate.
+
+    Attributes:
+        types (list):
+            list of (name, span, time, n_parameters, is_variational,
+            gate_type) tuples, the position in the list being the type id
+    """
+
+    def __init__(self):
+        self.types = []
+        self._ids = {}
+
+    def get_id(self, key):
+        """
+        Return the type id of a gate type, adding it to the table if new
+
+        Args:
+            key (tuple): (name, span, time, n_parameters, is_variational,
+                gate_type) tuple describing the gate type
+        """
+        type_id = self._ids.get(key)
+        if type_id is None:
+            type_id = len(self.types)
+            self._ids[key] = type_id
+            self.types.append(key)
+        return type_id
+
+    def __getitem__(self, type_id):
+        return self.types[type_id]
+
+    def __len__(self):
+        return len(self.types)
+
+
+class GateStorage(object):
+    """ Growable struct-of-arrays holding the gates of a circuit
+
+    Gates are rows of a set of NumPy arrays. Targets and parameter indexes
+    are stored in 2D arrays padded with -1 up to the widest gate stored so
+    far. Layers are contiguous ranges of rows delimited by layer_offsets.
+
+    Attributes:
+        table (GateTable):
+            table of gate types referred to by type_id
+        n_gates (integer):
+            number of gates stored
+    """
+
+    def __init__(self, capacity=16):
+        self.table = GateTable()
+        self.n_gates = 0
+        self._capacity = capacity
+        self._type_id = numpy.empty(capacity, dtype=numpy.int32)
+        self._targets = numpy.full((capacity, 1), -1, dtype=numpy.int32)
+        self._indexes = numpy.full((capacity, 1), -1, dtype=numpy.int32)
+        self._is_variational = numpy.empty(capacity, dtype=bool)
+        self._time = numpy.empty(capacity, dtype=numpy.float64)
+        self._layer_offsets = [0]
+
+    @property
+    def type_id(self):
+        return self._type_id[:self.n_gates]
+
+    @property
+    def targets(self):
+        return self._targets[:self.n_gates]
+
+    @property
+    def indexes(self):
+        return self._indexes[:self.n_gates]
+
+    @property
+    def is_variational(self):
+        return self._is_variational[:self.n_gates]
+
+    @property
+    def time(self):
+        return self._time[:self.n_gates]
+
+    @property
+    def layer_offsets(self):
+        return numpy.asarray(self._layer_offsets, dtype=numpy.int64)
+
+    @property
+    def n_layers(self):
+        return len(self._layer_offsets) - 1
+
+    def _reserve(self, n_gates, span, n_parameters):
+        """Grow the arrays to hold n_gates rows of the given widths"""
+        capacity = self._capacity
+        while capacity < n_gates:
+            capacity *= 2
+        width = max(self._targets.shape[1], span)
+        depth = max(self._indexes.shape[1], n_parameters)
+        if capacity != self._capacity:
+            self._type_id = numpy.resize(self._type_id, capacity)
+            self._is_variational = numpy.resize(self._is_variational,
+                                                capacity)
+            self._time = numpy.resize(self._time, capacity)
+        if (capacity, width) != self._targets.shape:
+            targets = numpy.full((capacity, width), -1, dtype=numpy.int32)
+            targets[:self.n_gates, :self._targets.shape[1]] = self.targets
+            self._targets = targets
+        if (capacity, depth) != self._indexes.shape:
+            indexes = numpy.full((capacity, depth), -1, dtype=numpy.int32)
+            indexes[:self.n_gates, :self._indexes.shape[1]] = self.indexes
+            self._indexes = indexes
+        self._capacity = capacity
+
+    def append(self, type_id, targets, indexes):
+        """
+        Append gates of a single type
+
+        Args:
+            type_id (integer): type id of the gates in the table
+            targets (numpy.ndarray): (n, span) array of qubit indexes
+            indexes (numpy.ndarray): (n, n_parameters) array of
+                parameter indexes
+        """
+        _, span, time, n_parameters, is_variational, _ = self.table[type_id]
+        n = len(targets)
+        start, stop = self.n_gates, self.n_gates + n
+        self._reserve(stop, span, n_parameters)
+        self._type_id[start:stop] = type_id
+        self._targets[start:stop, :span] = targets
+        self._indexes[start:stop, :n_parameters] = indexes
+        self._is_variational[start:stop] = is_variational
+        self._time[start:stop] = time
+        self.n_gates = stop
+
+    def end_layer(self):
+        """Close the current layer with the gates appended since the last
+        call"""
+        self._layer_offsets.append(self.n_gates)
+
+    def layer_range(self, layer):
+        """Return the (start, stop) rows of a layer"""
+        return self._layer_offsets[layer], self._layer_offsets[layer + 1]
+
+    def gate_targets(self, row):
+        """Return the targets of a gate as a list"""
+        span = self.table[self._type_id[row]][1]
+        return self._targets[row, :span].tolist()
+
+    def gate_indexes(self, row):
+        """Return the parameter indexes of a gate as a list"""
+        n_parameters = self.table[self._type_id[row]][3]
+        return self._indexes[row, :n_parameters].tolist()
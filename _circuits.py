@@ -2,16 +2,26 @@
 import numpy
 from qutip import *
 
+from _gradient import parameter_shift_gradient
+from _layer_cache import LayeredUnitaryCache
+from _simulator import CompiledCircuit
+
 
 class ParametrizedCircuit:
     """
     A parametrized (programmable) quantum circuit.
     """
-    def __init__(self, parameters, n_repetitions):
+    def __init__(self, parameters, n_repetitions, circuit=None,
+                 constants=None):
         """
         Args:
             parameters (numpy.ndarray) : array of circuit parameters
             n_repetitions (int) : number of circuit block repetitions
+            circuit (AbstractCircuit) : optional circuit whose variational
+                                        parameters are parameters; its
+                                        basic block is applied
+                                        n_repetitions times
+            constants (numpy.ndarray) : constant parameters of circuit
 
         Attributes:
             n_parameters (int) : number of unique circuit parameters
@@ -21,9 +31,15 @@ class ParametrizedCircuit:
         """
         self.parameters = parameters
         self.n_parameters = len(parameters)
-        self.n_repetitions
+        self.n_repetitions = n_repetitions
         self.unitary = None
         self.cost_function = None
+        self.circuit = circuit
+        self.constants = constants
+        self.compiled = None
+        self.unitary_cache = None
+        if circuit is not None:
+            self.compiled = CompiledCircuit(circuit, n_repetitions)
 
     # Instance-dependent
     def set_unitary(self, unitary):
@@ -34,10 +50,96 @@ class ParametrizedCircuit:
         """
         self.unitary = unitary
 
-    # TODO! (average fidelity as default?)
-    def set_cost_function(self):
-        raise NotImplementedError
+    def update_parameters(self, parameters):
+        """Sets new parameters and the matching unitary of the circuit
+
+        Only the layers referencing changed parameters are rebuilt, so
+        optimizers changing a few parameters per step pay for those
+        layers only.
+
+        Args:
+            parameters (numpy.ndarray) : new circuit parameters
+
+        Returns:
+            unitary (Qobj) : unitary representation of circuit
+        """
+        if self.circuit is None:
+            raise ValueError('The circuit is needed to build the unitary')
+        if self.unitary_cache is None:
+            self.unitary_cache = LayeredUnitaryCache(self.circuit,
+                                                     self.constants,
+                                                     self.n_repetitions)
+        self.parameters = parameters
+        n_qubits = self.circuit.n_qubits
+        self.set_unitary(Qobj(self.unitary_cache.unitary(parameters),
+                              dims=[[2] * n_qubits, [2] * n_qubits]))
+        return self.unitary
+
+    def set_cost_function(self, cost_function=None, target=None):
+        """Sets the cost function of the circuit output
+
+        Args:
+            cost_function (callable) : maps a (B, 2^n) batch of output
+                                        statevectors to (B,) costs
+            target (numpy.ndarray or Qobj) : target statevector; when no
+                                        cost_function is given the cost
+                                        is the infidelity with target
+        """
+        if cost_function is None:
+            if target is None:
+                raise ValueError('Either cost_function or target is needed')
+            if isinstance(target, Qobj):
+                target = target.full()
+            target = numpy.asarray(target, dtype=complex).ravel()
 
-    # TODO!
-    def compute_gradient(self):
-        raise NotImplementedError
+            def cost_function(states):
+                overlaps = numpy.asarray(states).dot(target.conj())
+                return 1. - numpy.abs(overlaps) ** 2
+        self.cost_function = cost_function
+
+    def _check_ready(self):
+        if self.compiled is None:
+            raise ValueError('The circuit is needed to evaluate costs')
+        if self.cost_function is None:
+            raise ValueError('Cost function has not been set')
+
+    def compute_cost(self, parameters=None):
+        """Evaluates the cost function
+
+        Args:
+            parameters (numpy.ndarray) : parameters, or (B, n_parameters)
+                                        batch of them; defaults to the
+                                        current parameters
+        """
+        self._check_ready()
+        if parameters is None:
+            parameters = self.parameters
+        states = numpy.atleast_2d(self.compiled.run(parameters,
+                                                    self.constants))
+        costs = self.cost_function(states)
+        if numpy.ndim(parameters) < 2:
+            return costs[0]
+        return costs
+
+    def compute_gradient(self, parameters=None, batch_size=None):
+        """Computes the gradient of the cost function by the
+        parameter-shift rule
+
+        All shifted parameter sets are simulated in one batch. Parameters
+        shared by several gates get the sum of the terms of each gate.
+
+        Args:
+            parameters (numpy.ndarray) : defaults to the current
+                                        parameters
+            batch_size (int) : maximum number of statevectors simulated
+                                at once
+
+        Returns:
+            gradient (numpy.ndarray) : derivatives of the cost function
+        """
+        self._check_ready()
+        if parameters is None:
+            parameters = self.parameters
+        return parameter_shift_gradient(self.compiled, parameters,
+                                        self.cost_function, self.constants,
+                                        batch_size=batch_size)
@@ -0,0 +1,192 @@
+"""Tests for _circuits.py."""
+import unittest
+
+import numpy
+
+from _abstract_circuit import AbstractCircuit
+from _abstract_gate import AbstractGate
+from _circuits import ParametrizedCircuit
+from _layer_cache import LayeredUnitaryCache
+
+
+def build_variational_circuit(n_qubits):
+    """ Circuit with generalized rotations, ZZ exponentials sharing one
+    angle and a variational controlled-Ry"""
+    circuit = AbstractCircuit(n_qubits)
+    circuit.add_adyacent_gates_layer(AbstractGate('U', 1, 10.0, 3, True))
+    zz_gate = AbstractGate('ZZ', 2, 40.0, 1, True)
+    circuit.add_adyacent_gates_layer(zz_gate, True)
+    circuit.add_adyacent_gates_layer(zz_gate, True, True)
+    circuit.add_gate_as_layer(AbstractGate('CRY', 2, 40.0, 1, True),
+                              [n_qubits - 1, 0])
+    circuit.add_gate_as_layer(AbstractGate('CU', 2, 40.0, 3, True), [1, 2])
+    circuit.add_gate_as_layer(AbstractGate('RX', 1, 10.0, 1, False), [0])
+    return circuit
+
+
+class ParametrizedCircuitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.circuit = build_variational_circuit(4)
+        n_parameters = self.circuit.get_n_parameters(True)
+        self.parameters = numpy.random.RandomState(5).uniform(
+            -3., 3., n_parameters)
+        target = numpy.zeros(16, dtype=complex)
+        target[[3, 12]] = 1. / numpy.sqrt(2.)
+        self.pcircuit = ParametrizedCircuit(self.parameters, 1,
+                                            self.circuit, [0.3])
+        self.pcircuit.set_cost_function(target=target)
+
+    def finite_difference(self, step=1e-6):
+        gradient = numpy.zeros(len(self.parameters))
+        for n in range(len(self.parameters)):
+            shift = numpy.zeros(len(self.parameters))
+            shift[n] = step
+            gradient[n] = (self.pcircuit.compute_cost(self.parameters + shift) -
+                           self.pcircuit.compute_cost(self.parameters - shift)
+                           ) / (2. * step)
+        return gradient
+
+    def test_init(self):
+        self.assertEqual(self.pcircuit.n_repetitions, 1)
+        self.assertEqual(self.pcircuit.n_parameters, 12 + 2 + 1 + 3)
+
+    def test_gradient_repeated_blocks(self):
+        parameters = numpy.random.RandomState(6).uniform(
+            -3., 3., 2 * len(self.parameters))
+        self.pcircuit = ParametrizedCircuit(parameters, 2, self.circuit,
+                                            [0.3, -0.7])
+        self.pcircuit.set_cost_function(target=numpy.eye(16)[5])
+        self.parameters = parameters
+        numpy.testing.assert_allclose(self.pcircuit.compute_gradient(),
+                                      self.finite_difference(), atol=1e-6)
+
+    def test_compute_cost_batch(self):
+        batch = numpy.array([self.parameters, self.parameters + 0.1])
+        costs = self.pcircuit.compute_cost(batch)
+        self.assertEqual(costs.shape, (2,))
+        self.assertAlmostEqual(costs[0], self.pcircuit.compute_cost())
+        self.assertTrue(0. <= costs[1] <= 1.)
+
+    def test_compute_gradient(self):
+        numpy.testing.assert_allclose(self.pcircuit.compute_gradient(),
+                                      self.finite_difference(), atol=1e-7)
+
+    def test_compute_gradient_in_chunks(self):
+        numpy.testing.assert_allclose(
+            self.pcircuit.compute_gradient(batch_size=7),
+            self.pcircuit.compute_gradient(), atol=1e-12)
+
+    def test_custom_cost_function(self):
+        def cost_function(states):
+            return numpy.abs(states[:, 0]) ** 2
+        self.pcircuit.set_cost_function(cost_function)
+        numpy.testing.assert_allclose(self.pcircuit.compute_gradient(),
+                                      self.finite_difference(), atol=1e-7)
+
+    def test_cost_function_needed(self):
+        pcircuit = ParametrizedCircuit(self.parameters, 1, self.circuit)
+        with self.assertRaises(ValueError):
+            pcircuit.compute_gradient()
+        with self.assertRaises(ValueError):
+            pcircuit.set_cost_function()
+
+
+class LayeredUnitaryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.circuit = build_variational_circuit(4)
+        self.parameters = numpy.random.RandomState(9).uniform(
+            -3., 3., self.circuit.get_n_parameters(True))
+        self.cache = LayeredUnitaryCache(self.circuit, [0.3])
+        self.pcircuit = ParametrizedCircuit(self.parameters, 1,
+                                            self.circuit, [0.3])
+
+    def reference_unitary(self, parameters):
+        return self.pcircuit.compiled.run(
+            parameters, [0.3], numpy.eye(16, dtype=complex)).T
+
+    def test_unitary(self):
+        numpy.testing.assert_allclose(self.cache.unitary(self.parameters),
+                                      self.reference_unitary(self.parameters),
+                                      atol=1e-12)
+        self.assertEqual(self.cache.n_rebuilt, 6)
+
+    def test_incremental_updates(self):
+        self.cache.unitary(self.parameters)
+        parameters = self.parameters.copy()
+        # coordinate sweep, changing one parameter per step
+        for n in [13, 0, 17, 12, 14, 3]:
+            parameters[n] += 0.5
+            rebuilt = self.cache.n_rebuilt
+            numpy.testing.assert_allclose(self.cache.unitary(parameters),
+                                          self.reference_unitary(parameters),
+                                          atol=1e-12)
+            self.assertEqual(self.cache.n_rebuilt, rebuilt + 1)
+        # parameters of two layers changing at once
+        parameters[[1, 15]] -= 0.5
+        rebuilt = self.cache.n_rebuilt
+        numpy.testing.assert_allclose(self.cache.unitary(parameters),
+                                      self.reference_unitary(parameters),
+                                      atol=1e-12)
+        self.assertEqual(self.cache.n_rebuilt, rebuilt + 2)
+        # unchanged parameters rebuild nothing
+        self.cache.unitary(parameters)
+        self.assertEqual(self.cache.n_rebuilt, rebuilt + 2)
+
+    def test_repeated_blocks(self):
+        circuit = build_variational_circuit(4)
+        circuit.n_blocks = 3
+        cache = LayeredUnitaryCache(circuit, [0.3, 0.3, 0.3])
+        compiled = cache.compiled
+        parameters = numpy.random.RandomState(2).uniform(
+            -3., 3., compiled.n_variables)
+
+        def reference(parameters):
+            return compiled.run(parameters, [0.3, 0.3, 0.3],
+                                numpy.eye(16, dtype=complex)).T
+        numpy.testing.assert_allclose(cache.unitary(parameters),
+                                      reference(parameters), atol=1e-12)
+        block_parameters = self.circuit.get_n_parameters(True)
+        # changes in the first, second and last blocks
+        for n in [0, block_parameters + 4, 2 * block_parameters + 1]:
+            parameters[n] += 0.5
+            numpy.testing.assert_allclose(cache.unitary(parameters),
+                                          reference(parameters), atol=1e-12)
+            # then again in the same block, which only rebuilds one layer
+            parameters[n + 1] += 0.5
+            rebuilt = cache.n_rebuilt
+            numpy.testing.assert_allclose(cache.unitary(parameters),
+                                          reference(parameters), atol=1e-12)
+            self.assertEqual(cache.n_rebuilt, rebuilt + 1)
+        # only the parameter slots are kept per block
+        self.assertEqual(cache._block_slots.shape,
+                         (3, cache.compiled.block_slots))
+
+    def test_repeated_blocks_shared_parameters(self):
+        circuit = build_variational_circuit(4)
+        circuit.n_blocks = 4
+        circuit.shared_parameters = True
+        cache = LayeredUnitaryCache(circuit, [0.3])
+        numpy.testing.assert_allclose(
+            cache.unitary(self.parameters),
+            numpy.linalg.matrix_power(self.cache.unitary(self.parameters),
+                                      4), atol=1e-10)
+        self.assertEqual(cache.n_rebuilt, cache.n_layers)
+
+    def test_state(self):
+        numpy.testing.assert_allclose(
+            self.cache.state(self.parameters),
+            self.pcircuit.compiled.run(self.parameters, [0.3]), atol=1e-12)
+
+    def test_update_parameters(self):
+        unitary = self.pcircuit.update_parameters(self.parameters + 0.1)
+        self.assertEqual(unitary.dims, [[2] * 4, [2] * 4])
+        numpy.testing.assert_allclose(
+            unitary.full(), self.reference_unitary(self.parameters + 0.1),
+            atol=1e-12)
+        self.assertIs(self.pcircuit.unitary, unitary)
+
+
+if __name__ == '__main__':
+    unittest.main()
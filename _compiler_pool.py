@@ -0,0 +1,303 @@
+""" Pooled client of the remote compiler
+
+CompilerPool keeps a bounded number of live compiler connections and a
+single device lookup, and puts three layers in front of them:
+
+- identical programs compiled at the same time share one request, and
+  recent results are kept in a small LRU cache;
+- failed requests are retried after a jittered exponential backoff;
+- the latency of every request is recorded in a log-spaced histogram.
+
+Connections are made by a factory, so the pool can be exercised with a
+local stand-in such as _local_compiler.LocalCompiler. pyquil is only
+imported by the default factory.
+"""
+from __future__ import absolute_import
+
+import collections
+import concurrent.futures
+import itertools
+import random
+import threading
+import time
+
+import numpy
+
+from _fingerprint import program_fingerprint
+
+
+def pyquil_device(name):
+    """Returns the pyquil device of a given name"""
+    from pyquil.api import get_devices
+    return get_devices(as_dict=True)[name]
+
+
+def pyquil_connection(device):
+    """Returns a new CompilerConnection to a device"""
+    from pyquil.api import CompilerConnection
+    return CompilerConnection(device)
+
+
+class LatencyHistogram(object):
+    """ Histogram of latencies in log-spaced buckets
+
+    Attributes:
+        edges (numpy.ndarray):
+            bucket edges in seconds; the first and last buckets also
+            count latencies below and above the edges
+        counts (numpy.ndarray):
+            number of latencies in every bucket
+    """
+
+    def __init__(self, low=1e-3, high=1e3, n_buckets=24):
+        self.edges = numpy.logspace(numpy.log10(low), numpy.log10(high),
+                                    n_buckets + 1)
+        self.counts = numpy.zeros(n_buckets, dtype=numpy.int64)
+        self.total = 0.
+        self.maximum = 0.
+
+    def add(self, latency):
+        bucket = numpy.searchsorted(self.edges, latency, side='right') - 1
+        self.counts[min(max(bucket, 0), len(self.counts) - 1)] += 1
+        self.total += latency
+        self.maximum = max(self.maximum, latency)
+
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        """Returns the upper edge of the bucket holding quantile q"""
+        n = self.count()
+        if n == 0:
+            return 0.
+        bucket = numpy.searchsorted(numpy.cumsum(self.counts), q * n)
+        return float(min(self.edges[bucket + 1], self.maximum))
+
+    def summary(self):
+        """Returns the count, mean, median, 90th and 99th percentiles
+        and maximum of the latencies"""
+        n = self.count()
+        return {
+            'count': n,
+            'mean': self.total / n if n else 0.,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'max': self.maximum
+        }
+
+
+class CompilerPool(object):
+    """ Bounded pool of compiler connections
+
+    compile_async and wait_for_job mirror CompilerConnection, so the pool
+    can replace a connection in existing code.
+
+    Attributes:
+        latencies (LatencyHistogram):
+            Latency of every request sent to a connection
+        stats (dict):
+            Counters of requests, coalesced and cached requests, retries
+            and connections made
+    """
+
+    def __init__(self, connection_factory=pyquil_connection, device=None,
+                 device_name='19Q-Acorn', device_lookup=pyquil_device,
+                 max_connections=4, max_retries=3, base_delay=0.5,
+                 max_delay=30., cache_size=256, sleep=time.sleep,
+                 rng=None):
+        """
+        Args:
+            connection_factory (callable): makes a connection to the
+                device passed as argument
+            device (optional): device, looked up by name when needed if
+                not given
+            device_name (string): name of the device to look up
+            device_lookup (callable): returns the device of a name
+            max_connections (integer): maximum number of live connections
+            max_retries (integer): number of retries of a failed request
+            base_delay (float): backoff before the first retry, seconds
+            max_delay (float): maximum backoff, seconds
+            cache_size (integer): number of results kept, 0 to disable
+            sleep (callable): waits a number of seconds
+            rng (random.Random, optional): source of the jitter
+        """
+        if max_connections < 1:
+            raise ValueError('max_connections must be positive.')
+        self.connection_factory = connection_factory
+        self.device_name = device_name
+        self.device_lookup = device_lookup
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache_size = cache_size
+        self.sleep = sleep
+        self.rng = rng if rng is not None else random.Random()
+        self.latencies = LatencyHistogram()
+        self.stats = collections.Counter()
+
+        self._device = device
+        # held while the device is looked up, apart from the pool lock
+        self._device_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = []
+        self._n_connections = 0
+        self._in_flight = {}
+        self._cache = collections.OrderedDict()
+        self._jobs = {}
+        self._job_ids = itertools.count()
+        self._executor = None
+
+    def device(self):
+        """Returns the device, looking it up once"""
+        with self._device_lock:
+            if self._device is None:
+                self._device = self.device_lookup(self.device_name)
+            return self._device
+
+    def _acquire(self):
+        """Returns an idle connection, making one if the pool is not
+        full, or waiting for one otherwise"""
+        device = self.device()
+        with self._available:
+            while not self._idle and \
+                    self._n_connections >= self.max_connections:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._n_connections += 1
+            self.stats['connections'] += 1
+        try:
+            return self.connection_factory(device)
+        except Exception:
+            self._release(None)
+            raise
+
+    def _release(self, connection):
+        """Returns a connection to the pool, or drops a broken one"""
+        with self._available:
+            if connection is None:
+                self._n_connections -= 1
+            else:
+                self._idle.append(connection)
+            self._available.notify()
+
+    def backoff(self, attempt):
+        """Returns the jittered delay before retry number attempt"""
+        cap = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return self.rng.uniform(0., cap)
+
+    def _record(self, start, outcome):
+        with self._lock:
+            self.latencies.add(time.time() - start)
+            self.stats[outcome] += 1
+
+    def _request(self, text, validate):
+        """Compiles on a pooled connection, retrying failures"""
+        for attempt in range(self.max_retries + 1):
+            connection = None
+            start = time.time()
+            try:
+                # making the connection is retried like the request
+                connection = self._acquire()
+                job = connection.wait_for_job(connection.compile_async(text))
+            except Exception:
+                # the connection may be the cause of the failure
+                if connection is not None:
+                    self._release(None)
+                self._record(start, 'failures')
+                if attempt == self.max_retries:
+                    raise
+            else:
+                self._release(connection)
+                try:
+                    if validate is not None:
+                        validate(job)
+                except Exception:
+                    self._record(start, 'rejected')
+                    if attempt == self.max_retries:
+                        raise
+                else:
+                    self._record(start, 'compiled')
+                    return job
+            with self._lock:
+                self.stats['retries'] += 1
+            self.sleep(self.backoff(attempt))
+
+    def compile(self, program, validate=None):
+        """
+        Compile a program and return its job
+
+        Args:
+            program (Program or string): pyquil Program or Quil text
+            validate (callable, optional): called with the job of a new
+                request, raises when the request must be retried, e.g.
+                lambda job: job.program_fidelity()
+
+        Returns:
+            job: job of the connection
+        """
+        text = program if isinstance(program, str) else program.out()
+        key = program_fingerprint(text)
+        with self._lock:
+            self.stats['requests'] += 1
+            if key in self._cache:
+                self.stats['cached'] += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            return future.result()
+        try:
+            job = self._request(text, validate)
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(job)
+            with self._lock:
+                if self.cache_size:
+                    self._cache[key] = job
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+            return job
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def compile_async(self, program, validate=None):
+        """Start compiling a program and return the identifier of its
+        job"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    self.max_connections)
+            job_id = next(self._job_ids)
+            self._jobs[job_id] = self._executor.submit(self.compile,
+                                                       program, validate)
+        return job_id
+
+    def get_job(self, job_id):
+        return self._jobs[job_id].result()
+
+    def wait_for_job(self, job_id, ping_time=None, status_time=None):
+        with self._lock:
+            future = self._jobs.pop(job_id)
+        return future.result()
+
+    def close(self):
+        """Drops the idle connections and stops the worker threads"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._n_connections -= len(self._idle)
+            self._idle = []
+        if executor is not None:
+            executor.shutdown()
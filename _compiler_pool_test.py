@@ -0,0 +1,181 @@
+"""Tests for _compiler_pool.py."""
+import random
+import threading
+import time
+import unittest
+
+from _compiler_pool import CompilerPool, LatencyHistogram
+from _local_compiler import LocalCompiler
+from _local_compiler_test import build_line
+
+
+class StandInServer(object):
+    """ Local compiler counting requests and live connections, failing
+    the first n_failures requests and holding requests until released"""
+
+    def __init__(self, n_failures=0, delay=0.):
+        self.hardware = build_line()
+        self.n_failures = n_failures
+        self.delay = delay
+        self.n_requests = 0
+        self.n_live = 0
+        self.max_live = 0
+        self.lock = threading.Lock()
+
+    def connect(self, device):
+        server = self
+
+        class Connection(LocalCompiler):
+            def compile_async(self, program):
+                with server.lock:
+                    server.n_requests += 1
+                    server.n_live += 1
+                    server.max_live = max(server.max_live, server.n_live)
+                    fail = server.n_failures > 0
+                    server.n_failures -= 1
+                time.sleep(server.delay)
+                with server.lock:
+                    server.n_live -= 1
+                if fail:
+                    raise IOError('connection reset')
+                return LocalCompiler.compile_async(self, program)
+        return Connection(device)
+
+
+class CompilerPoolTest(unittest.TestCase):
+
+    def make_pool(self, server, **kwargs):
+        self.delays = []
+        self.lookups = []
+
+        def lookup(name):
+            self.lookups.append(name)
+            return server.hardware
+        return CompilerPool(server.connect, device_lookup=lookup,
+                            sleep=self.delays.append, rng=random.Random(0),
+                            **kwargs)
+
+    def test_compile(self):
+        server = StandInServer()
+        pool = self.make_pool(server)
+        job = pool.compile('H 0\nCNOT 0 3\n')
+        self.assertEqual(job.topological_swaps(), 2)
+        pool.compile('H 1\n')
+        self.assertEqual(self.lookups, ['19Q-Acorn'])
+        self.assertEqual(pool.stats['connections'], 1)
+
+    def test_cached(self):
+        server = StandInServer()
+        pool = self.make_pool(server)
+        first = pool.compile('H 0\nCNOT 0 3\n')
+        self.assertIs(pool.compile('H 0\nCNOT 0 3\n'), first)
+        self.assertEqual(server.n_requests, 1)
+        self.assertEqual(pool.stats['cached'], 1)
+        pool = self.make_pool(server, cache_size=0)
+        pool.compile('H 0\n')
+        pool.compile('H 0\n')
+        self.assertEqual(server.n_requests, 3)
+
+    def test_coalesce_in_flight(self):
+        server = StandInServer(delay=0.05)
+        pool = self.make_pool(server, cache_size=0)
+        jobs = []
+        threads = [threading.Thread(
+            target=lambda: jobs.append(pool.compile('H 0\nCNOT 0 4\n')))
+            for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(server.n_requests, 1)
+        self.assertEqual(pool.stats['coalesced'], 5)
+        self.assertTrue(all(job is jobs[0] for job in jobs))
+
+    def test_bounded_connections(self):
+        server = StandInServer(delay=0.02)
+        pool = self.make_pool(server, max_connections=2)
+        ids = [pool.compile_async('H {0}\n'.format(q)) for q in range(5)]
+        for job_id in ids:
+            pool.wait_for_job(job_id)
+        pool.close()
+        self.assertEqual(server.n_requests, 5)
+        self.assertLessEqual(server.max_live, 2)
+        self.assertLessEqual(pool.stats['connections'], 2)
+
+    def test_retry_with_backoff(self):
+        server = StandInServer(n_failures=2)
+        pool = self.make_pool(server, base_delay=1., max_delay=3.)
+        pool.compile('H 0\n')
+        self.assertEqual(pool.stats['retries'], 2)
+        self.assertEqual(len(self.delays), 2)
+        self.assertTrue(0. <= self.delays[0] <= 1.)
+        self.assertTrue(0. <= self.delays[1] <= 2.)
+        # broken connections are replaced
+        self.assertEqual(pool.stats['connections'], 3)
+
+    def test_retry_connection_setup(self):
+        server = StandInServer()
+        attempts = []
+
+        def connect(device):
+            attempts.append(device)
+            if len(attempts) < 3:
+                raise IOError('connection refused')
+            return server.connect(device)
+        pool = self.make_pool(server, base_delay=1.)
+        pool.connection_factory = connect
+        pool.compile('H 0\n')
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(pool.stats['retries'], 2)
+        self.assertEqual(pool.stats['failures'], 2)
+        self.assertEqual(len(self.delays), 2)
+        # failed setups do not hold a place in the pool
+        self.assertEqual(pool._n_connections, 1)
+
+    def test_device_lookup_outside_pool_lock(self):
+        server = StandInServer()
+        pool = self.make_pool(server)
+        free = []
+
+        def lookup(name):
+            # releases and stats updates are not held up by the lookup
+            free.append(pool._lock.acquire(timeout=1))
+            if free[-1]:
+                pool._lock.release()
+            return server.hardware
+        pool.device_lookup = lookup
+        self.assertIs(pool.device(), server.hardware)
+        self.assertEqual(free, [True])
+
+    def test_give_up(self):
+        server = StandInServer(n_failures=10)
+        pool = self.make_pool(server, max_retries=2)
+        with self.assertRaises(IOError):
+            pool.compile('H 0\n')
+        self.assertEqual(server.n_requests, 3)
+
+    def test_validate(self):
+        server = StandInServer()
+        pool = self.make_pool(server, max_retries=1)
+
+        def validate(job):
+            raise ValueError('no fidelity')
+        with self.assertRaises(ValueError):
+            pool.compile('H 0\n', validate)
+        self.assertEqual(pool.stats['rejected'], 2)
+        # rejected jobs do not drop their connection
+        self.assertEqual(pool.stats['connections'], 1)
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram(low=1e-3, high=1e1, n_buckets=4)
+        for latency in [0.002, 0.02, 0.03, 0.5, 100.]:
+            histogram.add(latency)
+        self.assertEqual(histogram.counts.tolist(), [1, 2, 1, 1])
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 5)
+        self.assertAlmostEqual(summary['p50'], 0.1)
+        self.assertEqual(summary['max'], 100.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+""" Co-placement of several circuits on disjoint regions of a device
+
+A placement is a list of regions, region k listing the hardware qubits
+of circuit k in the order of its logical qubits. Regions are connected
+subgraphs of the HardwareGraph and never share a qubit. The placement
+minimizing the sum of the costs of the circuits is searched by
+simulated annealing, moving one region at a time, so the costs of the
+other circuits are reused.
+"""
+from __future__ import absolute_import
+
+import random
+
+from _annealing import sa
+
+DEFAULT_OPTIONS = {
+    'init_T': 10,
+    'time_const': 25,
+    'step_perT': 10,
+    'final_T': 0.1,
+    'maxiter': 2000,
+}
+
+
+def check_disjoint(regions):
+    """Raises ValueError when two regions share a qubit"""
+    qubits = [q for region in regions for q in region]
+    if len(set(qubits)) != len(qubits):
+        raise ValueError('Regions must not share qubits')
+
+
+def random_regions(hardware, sizes, exclude=(), attempts=100, rng=random):
+    """
+    Returns disjoint connected regions of given sizes
+
+    Args:
+        hardware (HardwareGraph): device
+        sizes (list): number of qubits of every region
+        exclude (iterable): qubits no region can use
+        attempts (integer): number of random tries
+        rng (random.Random): source of randomness
+    """
+    qubits = [int(q) for q in hardware.qubit_list if q not in set(exclude)]
+    for _ in range(attempts):
+        used = set(exclude)
+        regions = []
+        for size in sizes:
+            starts = [q for q in qubits if q not in used]
+            rng.shuffle(starts)
+            for start in starts:
+                region = hardware.connected_subgraph(start, size, used)
+                if len(region) == size:
+                    break
+            else:
+                break
+            rng.shuffle(region)
+            regions.append(region)
+            used.update(region)
+        if len(regions) == len(sizes):
+            return regions
+    raise ValueError('Cannot place regions of sizes {0} on the hardware'
+                     .format(list(sizes)))
+
+
+class CoPlacement(object):
+    """ Joint placement of K circuits on disjoint regions
+
+    Attributes:
+        hardware (HardwareGraph):
+            Device the circuits are placed on
+        sizes (list):
+            Number of qubits of every circuit
+        n_evaluations (integer):
+            Number of calls of the cost function
+    """
+
+    def __init__(self, hardware, sizes, cost_function, rng=random,
+                 canonicalize=None):
+        """
+        Args:
+            hardware (HardwareGraph): device
+            sizes (list): number of qubits of every circuit
+            cost_function (callable): cost_function(k, region) returns
+                the cost of circuit k placed on the qubits of region,
+                e.g. minus the log of its fidelity
+            rng (random.Random): source of randomness
+            canonicalize (callable, optional): returns the same qubit
+                list for qubit lists of equal cost, e.g.
+                hardware.canonical_mapping when the cost only depends
+                on the couplings. Placements are then evaluated and
+                returned in canonical form
+        """
+        self.hardware = hardware
+        self.sizes = list(sizes)
+        self.cost_function = cost_function
+        self.rng = rng
+        self.canonicalize = canonicalize
+        self.n_evaluations = 0
+        self._costs = {}
+
+    def canonical(self, regions):
+        """Returns the canonical form of a placement. The regions are
+        canonicalized together, so that they stay disjoint."""
+        if self.canonicalize is None:
+            return regions
+        qubits = self.canonicalize([q for region in regions
+                                    for q in region])
+        canonical = []
+        for region in regions:
+            canonical.append(list(qubits[:len(region)]))
+            qubits = qubits[len(region):]
+        return canonical
+
+    def region_cost(self, k, region):
+        """Returns the cost of circuit k on region, computed once per
+        region"""
+        key = (k, tuple(region))
+        if key not in self._costs:
+            self.n_evaluations += 1
+            self._costs[key] = self.cost_function(k, list(region))
+        return self._costs[key]
+
+    def cost(self, regions):
+        """Returns the total cost of a placement, that of its canonical
+        form"""
+        check_disjoint(regions)
+        return sum(self.region_cost(k, region)
+                   for k, region in enumerate(self.canonical(regions)))
+
+    def initial(self):
+        """Returns a random placement"""
+        return random_regions(self.hardware, self.sizes, rng=self.rng)
+
+    def perturb(self, regions):
+        """
+        Returns a neighbouring placement: one region is regrown from one
+        of its qubits, relabelled, or moved to free qubits
+        """
+        k = self.rng.randint(0, len(regions) - 1)
+        others = set(q for j, region in enumerate(regions) if j != k
+                     for q in region)
+        region = list(regions[k])
+        eta = self.rng.uniform(0, 1)
+        if eta < 1. / 3:
+            start = region[self.rng.randint(0, len(region) - 1)]
+            region = self.hardware.connected_subgraph(start, len(region),
+                                                      others)
+        elif eta < 2. / 3:
+            self.rng.shuffle(region)
+        else:
+            free = [int(q) for q in self.hardware.qubit_list
+                    if q not in others and q not in set(region)]
+            if not free:
+                return regions
+            start = free[self.rng.randint(0, len(free) - 1)]
+            region = self.hardware.connected_subgraph(start, len(region),
+                                                      others)
+        if len(region) != len(regions[k]):
+            return regions
+        return regions[:k] + [region] + regions[k + 1:]
+
+    def optimize(self, init=None, options=None):
+        """
+        Anneal the placement
+
+        Args:
+            init (list, optional): initial placement, random by default
+            options (dict, optional): simulated annealing settings as for
+                _annealing.sa, without 'perturb'
+
+        Returns:
+            results (dict): outcome of _annealing.sa, 'xval_opt' being
+                the canonical form of the best placement, the one its
+                cost was computed for
+        """
+        settings = dict(DEFAULT_OPTIONS)
+        settings.update(options or {})
+        settings['perturb'] = self.perturb
+        if init is None:
+            init = self.initial()
+        results = sa(init, self.cost, settings)
+        results['xval_opt'] = self.canonical(results['xval_opt'])
+        return results
+
+
+def merge_programs(programs):
+    """
+    Returns the Quil text running several programs side by side
+
+    Gate definitions and declarations shared by the programs are kept
+    once; the instructions of the programs follow one another.
+
+    Args:
+        programs (list): pyquil Programs or Quil texts acting on
+            disjoint qubits
+    """
+    definitions = []
+    seen = set()
+    body = []
+    for program in programs:
+        text = program if isinstance(program, str) else program.out()
+        block = None
+        for line in text.splitlines():
+            if block is not None and line[:1].isspace():
+                block.append(line)
+                continue
+            if block is not None:
+                key = block[0]
+                if key not in seen:
+                    seen.add(key)
+                    definitions.append('\n'.join(block))
+                block = None
+            if line.startswith('DEFGATE'):
+                block = [line]
+            elif line.startswith('DECLARE'):
+                if line not in seen:
+                    seen.add(line)
+                    definitions.append(line)
+            elif line.strip():
+                body.append(line)
+        if block is not None and block[0] not in seen:
+            seen.add(block[0])
+            definitions.append('\n'.join(block))
+    if definitions:
+        definitions.append('')
+    return '\n'.join(definitions + body) + '\n'
@@ -0,0 +1,135 @@
+"""Tests for _coplacement.py."""
+import random
+import unittest
+
+from _coplacement import (CoPlacement,
+                          check_disjoint,
+                          merge_programs,
+                          random_regions)
+from hardwaregraph import HardwareGraph
+
+
+def build_grid(rows=3, columns=4, bad_edges=()):
+    """ Grid of qubits r * columns + c; two-qubit fidelity 0.9, or 0.5 on
+    bad_edges"""
+    qubits = list(range(rows * columns))
+    edges = []
+    for r in range(rows):
+        for c in range(columns):
+            q = r * columns + c
+            if c + 1 < columns:
+                edges.append((q, q + 1))
+            if r + 1 < rows:
+                edges.append((q, q + columns))
+    fidelity_list = {
+        'single_qubit': {'f1QRB': [0.99] * len(qubits),
+                         'f1RO': [0.95] * len(qubits)},
+        'two-qubit': {'f2CZ': [0.5 if e in bad_edges else 0.9
+                               for e in edges],
+                      'f2CPHASE': [1.] * len(edges)}
+    }
+    return HardwareGraph(qubits, edges, fidelity_list)
+
+
+def is_connected(hardware, region):
+    reached = hardware.connected_subgraph(region[0], len(region),
+                                          set(hardware.qubit_list) -
+                                          set(region))
+    return sorted(reached) == sorted(region)
+
+
+class CoPlacementTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hardware = build_grid(bad_edges=[(1, 2), (5, 6), (9, 10)])
+        self.rng = random.Random(4)
+
+        # chains of CZ gates between consecutive qubits of each region
+        def cost(k, region):
+            cost = 0.
+            for u, v in zip(region[:-1], region[1:]):
+                edge = self.hardware.edge_index(u, v)
+                if edge is None:
+                    return 100.
+                cost += 1. - self.hardware.fidelity_list[
+                    'two-qubit']['f2CZ'][edge]
+            return cost
+        self.cost = cost
+
+    def test_random_regions(self):
+        regions = random_regions(self.hardware, [4, 4, 3], rng=self.rng)
+        self.assertEqual([len(r) for r in regions], [4, 4, 3])
+        check_disjoint(regions)
+        for region in regions:
+            self.assertTrue(is_connected(self.hardware, region))
+        with self.assertRaises(ValueError):
+            random_regions(self.hardware, [7, 7], rng=self.rng)
+
+    def test_check_disjoint(self):
+        with self.assertRaises(ValueError):
+            check_disjoint([[0, 1], [1, 2]])
+
+    def test_perturb_keeps_constraints(self):
+        placement = CoPlacement(self.hardware, [3, 3, 3], self.cost,
+                                self.rng)
+        regions = placement.initial()
+        for _ in range(200):
+            regions = placement.perturb(regions)
+            check_disjoint(regions)
+            self.assertEqual([len(r) for r in regions], [3, 3, 3])
+            for region in regions:
+                self.assertTrue(is_connected(self.hardware, region))
+
+    def test_optimize_avoids_bad_edges(self):
+        random.seed(1)
+        placement = CoPlacement(self.hardware, [3, 3], self.cost, self.rng)
+        result = placement.optimize(options={'verbose': False,
+                                             'maxiter': 1500})
+        self.assertAlmostEqual(result['fval_opt'], 4 * 0.1)
+        check_disjoint(result['xval_opt'])
+        self.assertLess(placement.n_evaluations, result['total_iter'] + 1)
+
+    def test_canonical_regions(self):
+        placement = CoPlacement(
+            self.hardware, [3], self.cost, self.rng,
+            lambda region: self.hardware.canonical_mapping(region, 1e-9))
+        placement.cost([[0, 1, 2]])
+        # mirror images of the same chain
+        placement.cost([[3, 2, 1]])
+        placement.cost([[8, 9, 10]])
+        self.assertEqual(placement.n_evaluations, 1)
+        placement.cost([[0, 1, 5]])
+        self.assertEqual(placement.n_evaluations, 2)
+
+    def test_canonical_placement_cost(self):
+        # labels matter to this cost, so it changes under the symmetries
+        def cost(k, region):
+            return sum(region) + 10 * k
+        placement = CoPlacement(self.hardware, [2, 2], cost, self.rng,
+                                self.hardware.canonical_mapping)
+        self.assertEqual(placement.canonical([[11, 10], [7, 3]]),
+                         [[0, 1], [4, 8]])
+        self.assertEqual(placement.cost([[11, 10], [7, 3]]), 23)
+        result = placement.optimize(options={'verbose': False,
+                                             'maxiter': 300})
+        regions = result['xval_opt']
+        check_disjoint(regions)
+        self.assertEqual(placement.canonical(regions), regions)
+        self.assertEqual(result['fval_opt'],
+                         sum(cost(k, r) for k, r in enumerate(regions)))
+
+    def test_merge_programs(self):
+        first = ('DEFGATE C-IY:\n    1, 0\n    0, 1\n\nH 0\nC-IY 0 1\n'
+                 'MEASURE 1 [1]\n')
+        second = ('DEFGATE C-IY:\n    1, 0\n    0, 1\n\n'
+                  'DEFGATE C-MINUS-IY:\n    1, 0\n    0, 1\n\nC-IY 4 5\n'
+                  'C-MINUS-IY 5 6\n')
+        self.assertEqual(merge_programs([first, second]),
+                         'DEFGATE C-IY:\n    1, 0\n    0, 1\n'
+                         'DEFGATE C-MINUS-IY:\n    1, 0\n    0, 1\n\n'
+                         'H 0\nC-IY 0 1\nMEASURE 1 [1]\nC-IY 4 5\n'
+                         'C-MINUS-IY 5 6\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+""" Stable content hashes for circuits, programs and hardware
+
+Hashes are built with hashlib.blake2b, so they do not change between
+processes and can be used as keys of persistent caches.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import re
+
+import numpy
+
+DIGEST_SIZE = 16
+LAYER_MARKER = numpy.array([-2], dtype=numpy.int32).tobytes()
+
+
+def new_digest(*fields):
+    """
+    Returns a blake2b hash object seeded with some fields
+
+    Args:
+        fields: values whose repr is hashed
+    """
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    digest.update(repr(fields).encode('utf-8'))
+    return digest
+
+
+def template_code(template):
+    """Returns two int32 words identifying a gate template"""
+    code = hashlib.blake2b(repr(tuple(template)).encode('utf-8'),
+                           digest_size=8).digest()
+    return numpy.frombuffer(code, dtype=numpy.int32)
+
+
+def gate_rows_bytes(template, targets, indexes):
+    """
+    Returns the bytes hashed for a run of gates sharing a template
+
+    Each gate contributes its template code, targets and parameter
+    indexes, so the bytes of a run are the concatenation of the bytes of
+    its gates whatever the way gates are grouped in runs.
+
+    Args:
+        template (GateTemplate): definition shared by the gates
+        targets (numpy.ndarray): (n, span) array of qubit indexes
+        indexes (numpy.ndarray): (n, n_parameters) array of parameter
+            indexes
+    """
+    n = len(targets)
+    rows = numpy.hstack([numpy.tile(template_code(template), (n, 1)),
+                         numpy.asarray(targets, dtype=numpy.int32),
+                         numpy.asarray(indexes, dtype=numpy.int32)])
+    return numpy.ascontiguousarray(rows, dtype=numpy.int32).tobytes()
+
+
+def canonical_labels(targets, n_qubits):
+    """
+    Returns the relabeling of qubits by order of first appearance
+
+    Args:
+        targets (numpy.ndarray): (n_gates, width) qubit indexes padded
+            with -1, in circuit order
+        n_qubits (integer): number of qubits of the register
+
+    Returns:
+        labels (numpy.ndarray): new label of every qubit; qubits never
+            targeted keep labels after the targeted ones
+    """
+    flat = targets.ravel()
+    flat = flat[flat >= 0]
+    _, first = numpy.unique(flat, return_index=True)
+    order = flat[numpy.sort(first)]
+    labels = numpy.full(n_qubits, -1, dtype=numpy.int64)
+    labels[order] = numpy.arange(len(order))
+    unused = labels < 0
+    labels[unused] = numpy.arange(len(order), len(order) + unused.sum())
+    return labels
+
+
+def circuit_fingerprint(circuit, relabel_invariant=False):
+    """
+    Returns the content hash of an AbstractCircuit
+
+    Args:
+        circuit (AbstractCircuit)
+        relabel_invariant (bool): give the same hash to circuits which
+            only differ by a relabeling of their qubits
+
+    Returns:
+        fingerprint (string): hexadecimal digest
+    """
+    digest = new_digest('circuit', circuit.n_qubits, circuit.n_blocks,
+                        circuit.shared_parameters)
+    if not relabel_invariant:
+        digest.update(circuit._digest.digest())
+        return digest.hexdigest()
+    gates = circuit.gates
+    labels = numpy.append(canonical_labels(gates.targets, circuit.n_qubits),
+                          -1)
+    codes = numpy.array([template_code(t) for t in gates.table.types]
+                        or numpy.empty((0, 2)), dtype=numpy.int32)
+    digest.update(codes[gates.type_id].tobytes())
+    digest.update(labels[gates.targets].astype(numpy.int32).tobytes())
+    digest.update(gates.indexes.tobytes())
+    digest.update(gates.layer_offsets.tobytes())
+    return digest.hexdigest()
+
+
+_QUBIT_TOKEN = re.compile(r'(?<=\s)(\d+)(?=\s|$)')
+
+
+def program_fingerprint(program, relabel_invariant=False):
+    """
+    Returns the content hash of a pyquil Program (or of its Quil text)
+
+    Args:
+        program (Program or string): program to be hashed
+        relabel_invariant (bool): give the same hash to programs which
+            only differ by a relabeling of their qubits
+
+    Returns:
+        fingerprint (string): hexadecimal digest
+    """
+    text = program if isinstance(program, str) else program.out()
+    if relabel_invariant:
+        labels = {}
+        lines = []
+        for line in text.splitlines():
+            # qubits are the bare integers following a gate name;
+            # DEFGATE bodies are indented and left untouched
+            if line and not line[0].isspace() and \
+                    not line.startswith('DEFGATE'):
+                line = _QUBIT_TOKEN.sub(
+                    lambda match: str(labels.setdefault(match.group(1),
+                                                         len(labels))),
+                    line)
+            lines.append(line)
+        text = '\n'.join(lines)
+    return new_digest('program', text).hexdigest()
+
+
+def element_hash(*fields):
+    """Returns a 64-bit integer hash of some fields"""
+    code = hashlib.blake2b(repr(fields).encode('utf-8'),
+                           digest_size=8).digest()
+    return int.from_bytes(code, 'little')
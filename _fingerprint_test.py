@@ -0,0 +1,42 @@
+"""Tests for _fingerprint.py."""
+import unittest
+
+from _fingerprint import program_fingerprint
+
+PROGRAM = 'H 0\nCNOT 0 1\nRZ(0.5) 1\nMEASURE 1 [1]\n'
+
+
+class ProgramFingerprintTest(unittest.TestCase):
+
+    def test_stable(self):
+        self.assertEqual(program_fingerprint(PROGRAM),
+                         program_fingerprint(str(PROGRAM)))
+        self.assertEqual(len(program_fingerprint(PROGRAM)), 32)
+
+    def test_sensitive_to_changes(self):
+        fingerprint = program_fingerprint(PROGRAM)
+        for changed in ['H 0\nCNOT 1 0\nRZ(0.5) 1\nMEASURE 1 [1]\n',
+                        'H 0\nCNOT 0 1\nRZ(0.6) 1\nMEASURE 1 [1]\n',
+                        'H 0\nCNOT 0 1\nRZ(0.5) 1\n',
+                        'X 0\nCNOT 0 1\nRZ(0.5) 1\nMEASURE 1 [1]\n']:
+            self.assertNotEqual(program_fingerprint(changed), fingerprint)
+
+    def test_relabel_invariant(self):
+        relabeled = 'H 7\nCNOT 7 3\nRZ(0.5) 3\nMEASURE 3 [1]\n'
+        self.assertNotEqual(program_fingerprint(relabeled),
+                            program_fingerprint(PROGRAM))
+        self.assertEqual(program_fingerprint(relabeled, True),
+                         program_fingerprint(PROGRAM, True))
+        # angles and classical addresses are not qubits
+        self.assertNotEqual(
+            program_fingerprint('H 7\nCNOT 7 3\nRZ(0.5) 3\nMEASURE 3 [2]\n',
+                                True),
+            program_fingerprint(PROGRAM, True))
+        self.assertNotEqual(
+            program_fingerprint('H 7\nCNOT 3 7\nRZ(0.5) 3\nMEASURE 3 [1]\n',
+                                True),
+            program_fingerprint(PROGRAM, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+""" Bounded LRU cache of gate operators
+
+Gate operators are keyed by the gate name, the quantized gate parameters
+and the placement of the gate (register size, control and target), so
+repeated angles such as same_angle layers, fixed rotations or parameter
+grids build every distinct operator once.
+
+An n-qubit operator is a dense 2^n x 2^n array, so the cache is bounded
+both by its number of operators and by their total size in bytes.
+"""
+from __future__ import absolute_import
+
+import collections
+
+import numpy
+
+CacheInfo = collections.namedtuple('CacheInfo',
+                                   ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def operator_nbytes(operator):
+    """
+    Return the size in bytes of an operator: a numpy or scipy.sparse
+    array, or a qutip Qobj holding one
+
+    Args:
+        operator: cached operator
+    """
+    data = getattr(operator, 'data', None)
+    if hasattr(data, 'as_ndarray'):
+        # qutip Dense
+        data = data.as_ndarray()
+    elif hasattr(data, 'as_scipy'):
+        # qutip CSR
+        data = data.as_scipy()
+    else:
+        data = operator
+    if hasattr(data, 'indptr'):
+        return data.data.nbytes + data.indices.nbytes + data.indptr.nbytes
+    return getattr(data, 'nbytes', 0)
+
+
+class GateCache(object):
+    """ Least recently used cache of gate operators
+
+    Attributes:
+        maxsize (integer):
+            Maximum number of cached operators, None for no bound and 0
+            to disable caching
+        maxbytes (integer):
+            Maximum total size of the cached operators in bytes, None for
+            no bound. Operators larger than maxbytes are not cached.
+        nbytes (integer):
+            Total size of the cached operators in bytes
+        decimals (integer):
+            Number of decimals kept when quantizing parameters
+        hits (integer):
+            Number of operators found in the cache
+        misses (integer):
+            Number of operators built
+    """
+
+    def __init__(self, maxsize=1024, decimals=12, maxbytes=2 ** 28):
+        """
+        Args:
+            maxsize (integer, optional): maximum number of cached
+                operators
+            decimals (integer, optional): number of decimals kept when
+                quantizing parameters
+            maxbytes (integer, optional): maximum total size of the
+                cached operators, 256 MiB by default
+        """
+        self._check_size(maxsize)
+        self._check_size(maxbytes, 'maxbytes')
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.decimals = decimals
+        self.hits = 0
+        self.misses = 0
+        self._operators = collections.OrderedDict()
+
+    @staticmethod
+    def _check_size(maxsize, name='maxsize'):
+        if maxsize is not None and (not isinstance(maxsize, int) or
+                                    maxsize < 0):
+            raise ValueError('{0} must be None or a non-negative '
+                             'integer.'.format(name))
+
+    def key(self, name, params, *placement):
+        """
+        Return the cache key of a gate operator
+
+        Args:
+            name (string): gate name
+            params (numpy.ndarray): gate parameters
+            placement: register size, control and target of the gate
+        """
+        # adding 0. turns -0. into 0. so both round to the same key
+        params = numpy.round(numpy.asarray(params, dtype=float).ravel(),
+                             self.decimals) + 0.
+        return (name, tuple(params.tolist())) + placement
+
+    def get(self, key, build):
+        """
+        Return the operator of a key, building it on a miss
+
+        The cached operator is shared by all the callers and must not be
+        modified in place.
+
+        Args:
+            key (tuple): key returned by key
+            build (callable): returns the operator when called without
+                arguments
+        """
+        operator = self._operators.get(key)
+        if operator is not None:
+            self.hits += 1
+            self._operators.move_to_end(key)
+            return operator
+        self.misses += 1
+        operator = build()
+        size = operator_nbytes(operator)
+        if self.maxsize != 0 and (self.maxbytes is None or
+                                  size <= self.maxbytes):
+            self._operators[key] = operator
+            self.nbytes += size
+            self._evict()
+        return operator
+
+    def _evict(self):
+        while self._operators and (
+                (self.maxsize is not None and
+                 len(self._operators) > self.maxsize) or
+                (self.maxbytes is not None and self.nbytes > self.maxbytes)):
+            _, operator = self._operators.popitem(last=False)
+            self.nbytes -= operator_nbytes(operator)
+
+    def resize(self, maxsize, maxbytes=None):
+        """Change the maximum number of cached operators, and their
+        maximum total size unless maxbytes is None, evicting the least
+        recently used ones"""
+        self._check_size(maxsize)
+        self._check_size(maxbytes, 'maxbytes')
+        self.maxsize = maxsize
+        if maxbytes is not None:
+            self.maxbytes = maxbytes
+        self._evict()
+
+    def clear(self):
+        """Remove all the operators and reset the counters"""
+        self._operators.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """Return the hit and miss counters and the size of the cache"""
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self._operators))
+
+    def __len__(self):
+        return len(self._operators)
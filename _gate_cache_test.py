@@ -0,0 +1,93 @@
+"""Tests for _gate_cache.py."""
+import unittest
+
+import numpy
+
+from _gate_cache import GateCache, operator_nbytes
+
+
+class GateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = GateCache(maxsize=3)
+        self.builds = []
+
+    def build(self, value):
+        def build():
+            self.builds.append(value)
+            return value
+        return build
+
+    def test_quantized_keys(self):
+        key = self.cache.key('RZ', [0.5 + 1e-15], 2, 0, 1)
+        self.assertEqual(key, self.cache.key('RZ', numpy.array([0.5]),
+                                             2, 0, 1))
+        self.assertEqual(self.cache.key('RZ', [-0.], 1),
+                         self.cache.key('RZ', [0.], 1))
+        self.assertNotEqual(key, self.cache.key('RZ', [0.5], 2, 1, 0))
+
+    def test_least_recently_used_is_evicted(self):
+        for name in ['a', 'b', 'c', 'a', 'd']:
+            self.cache.get((name,), self.build(name))
+        self.assertEqual(self.builds, ['a', 'b', 'c', 'd'])
+        self.cache.get(('a',), self.build('a'))
+        self.cache.get(('b',), self.build('b'))
+        self.assertEqual(self.builds, ['a', 'b', 'c', 'd', 'b'])
+        self.assertEqual(self.cache.info(), (2, 5, 3, 3))
+
+    def test_resize_and_clear(self):
+        for name in ['a', 'b', 'c']:
+            self.cache.get((name,), self.build(name))
+        self.cache.resize(1)
+        self.assertEqual(len(self.cache), 1)
+        self.cache.get(('c',), self.build('c'))
+        self.assertEqual(self.cache.hits, 1)
+        self.cache.clear()
+        self.assertEqual(self.cache.info(), (0, 0, 1, 0))
+        with self.assertRaises(ValueError):
+            self.cache.resize(-1)
+
+    def test_bounded_by_bytes(self):
+        cache = GateCache(maxsize=None, maxbytes=3 * 16 * 16)
+        for n in range(4):
+            cache.get((n,), self.build(numpy.full((4, 4), n, dtype=complex)))
+        # three 256-byte operators fit
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.nbytes, 3 * 256)
+        self.assertEqual(self.cache.maxbytes, 2 ** 28)
+        # an operator larger than the bound is built but not cached
+        cache.get(('large',), self.build(numpy.zeros((8, 8), dtype=complex)))
+        self.assertEqual(len(cache), 3)
+        cache.resize(None, 256)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.nbytes, 256)
+        self.assertEqual(cache.get((3,), self.build(None))[0, 0], 3)
+        cache.clear()
+        self.assertEqual(cache.nbytes, 0)
+        with self.assertRaises(ValueError):
+            GateCache(maxbytes=-1)
+
+    def test_operator_nbytes(self):
+        import qutip
+        import scipy.sparse
+        dense = numpy.eye(4, dtype=complex)
+        self.assertEqual(operator_nbytes(dense), 256)
+        self.assertEqual(operator_nbytes(qutip.Qobj(dense)), 256)
+        sparse = scipy.sparse.csr_matrix(dense)
+        self.assertEqual(operator_nbytes(sparse),
+                         sparse.data.nbytes + sparse.indices.nbytes +
+                         sparse.indptr.nbytes)
+        self.assertEqual(operator_nbytes(qutip.Qobj(dense).to('csr')),
+                         operator_nbytes(
+                             qutip.Qobj(dense).to('csr').data.as_scipy()))
+        self.assertEqual(operator_nbytes('a'), 0)
+
+    def test_unbounded(self):
+        cache = GateCache(maxsize=None)
+        for n in range(2000):
+            cache.get((n,), self.build(n))
+        self.assertEqual(len(cache), 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,206 @@
-
-"""Functions for gates used in programmable circuits."""
+"""Functions for gates used in programmable circuits.
+
+The *_array functions are NumPy kernels returning stacks of gate matrices
+for arrays of angles. The functions returning Qobj are built on top of
+them and only convert to Qobj on return.
+
+The apply_* functions act with a gate on a 2^n statevector, or on a
+(B, 2^n) batch of statevectors, without building the n-qubit operator.
+Qubit 0 is the most significant bit of the basis state index, as in the
+tensor products of the Qobj operators.
+
+The Qobj operators are kept in a bounded LRU cache keyed by gate name,
+quantized parameters and placement, so repeated angles build each
+operator once. Cached operators are shared and must not be modified in
+place.
+"""
 from __future__ import absolute_import
 
 import numpy
 import qutip
 import scipy
 
+from _gate_cache import GateCache
+
+gate_cache = GateCache()
+
+
+def gate_cache_info():
+    """Returns the hits, misses, maximum size and size of the gate
+    operator cache"""
+    return gate_cache.info()
+
+
+def clear_gate_cache():
+    """Empties the gate operator cache and resets its counters"""
+    gate_cache.clear()
+
+
+def set_gate_cache_size(maxsize, maxbytes=None):
+    """Sets the maximum number of cached gate operators
+
+    Args:
+        maxsize (int) : maximum number of operators, None for no bound
+                        and 0 to disable the cache
+        maxbytes (int) : maximum total size of the operators in bytes,
+                         unchanged if None (256 MiB by default)
+    """
+    gate_cache.resize(maxsize, maxbytes)
+
+
+def rx_array(thetas):
+    """Returns a stack of Rx rotations
+
+    Args:
+        thetas (numpy.ndarray[float]) : (N,) array of rotation angles
+
+    Returns:
+        U (numpy.ndarray[complex]) : (N, 2, 2) stack of unitaries
+    """
+    half = numpy.asarray(thetas, dtype=float).reshape(-1) / 2.
+    U = numpy.empty((len(half), 2, 2), dtype=complex)
+    U[:, 0, 0] = U[:, 1, 1] = numpy.cos(half)
+    U[:, 0, 1] = U[:, 1, 0] = -1j * numpy.sin(half)
+    return U
+
+
+def ry_array(thetas):
+    """Returns a stack of Ry rotations
+
+    Args:
+        thetas (numpy.ndarray[float]) : (N,) array of rotation angles
+
+    Returns:
+        U (numpy.ndarray[complex]) : (N, 2, 2) stack of unitaries
+    """
+    half = numpy.asarray(thetas, dtype=float).reshape(-1) / 2.
+    U = numpy.empty((len(half), 2, 2), dtype=complex)
+    U[:, 0, 0] = U[:, 1, 1] = numpy.cos(half)
+    U[:, 0, 1] = -numpy.sin(half)
+    U[:, 1, 0] = numpy.sin(half)
+    return U
+
+
+def rz_array(thetas):
+    """Returns a stack of Rz rotations
+
+    Args:
+        thetas (numpy.ndarray[float]) : (N,) array of rotation angles
+
+    Returns:
+        U (numpy.ndarray[complex]) : (N, 2, 2) stack of unitaries
+    """
+    half = numpy.asarray(thetas, dtype=float).reshape(-1) / 2.
+    U = numpy.zeros((len(half), 2, 2), dtype=complex)
+    U[:, 0, 0] = numpy.exp(-1j * half)
+    U[:, 1, 1] = numpy.exp(1j * half)
+    return U
+
+
+def sq_gate_array(params):
+    """Returns a stack of generalized single qubit gates Rz * Ry * Rz
+
+    The product is evaluated in closed form:
+
+        [[e^{-i(a+c)/2} cos(b/2), -e^{-i(a-c)/2} sin(b/2)],
+         [e^{i(a-c)/2} sin(b/2),   e^{i(a+c)/2} cos(b/2)]]
+
+    Args:
+        params (numpy.ndarray[float]) : (N, 3) array of rotation angles
+            (a, b, c), or a single (3,) triple
+
+    Returns:
+        U (numpy.ndarray[complex]) : (N, 2, 2) stack of unitaries
+    """
+    params = numpy.asarray(params, dtype=float).reshape(-1, 3)
+    plus = numpy.exp(0.5j * (params[:, 0] + params[:, 2]))
+    minus = numpy.exp(0.5j * (params[:, 0] - params[:, 2]))
+    cos = numpy.cos(params[:, 1] / 2.)
+    sin = numpy.sin(params[:, 1] / 2.)
+    U = numpy.empty((len(params), 2, 2), dtype=complex)
+    U[:, 0, 0] = cos / plus
+    U[:, 0, 1] = -sin / minus
+    U[:, 1, 0] = sin * minus
+    U[:, 1, 1] = cos * plus
+    return U
+
+
+def controlled_array(U):
+    """Returns the stack of two-qubit controlled-U blocks diag(I, U)
+
+    The control is the first (most significant) qubit of each block.
+
+    Args:
+        U (numpy.ndarray[complex]) : (N, 2, 2) stack of unitaries
+
+    Returns:
+        CU (numpy.ndarray[complex]) : (N, 4, 4) stack of unitaries
+    """
+    CU = numpy.zeros((len(U), 4, 4), dtype=complex)
+    CU[:, 0, 0] = CU[:, 1, 1] = 1.
+    CU[:, 2:, 2:] = U
+    return CU
+
+
+def controlled_U_array(params):
+    """Returns a stack of controlled generalized single qubit gates
+
+    Args:
+        params (numpy.ndarray[float]) : (N, 3) array of rotation angles
+
+    Returns:
+        CU (numpy.ndarray[complex]) : (N, 4, 4) stack of unitaries
+    """
+    return controlled_array(sq_gate_array(params))
+
+
+def controlled_Rx_array(thetas):
+    """Returns a stack of controlled-Rx blocks for (N,) angles"""
+    return controlled_array(rx_array(thetas))
+
+
+def controlled_Ry_array(thetas):
+    """Returns a stack of controlled-Ry blocks for (N,) angles"""
+    return controlled_array(ry_array(thetas))
+
+
+def controlled_Rz_array(thetas):
+    """Returns a stack of controlled-Rz blocks for (N,) angles"""
+    return controlled_array(rz_array(thetas))
+
+
+def _to_qobj(U, n_qubits):
+    """Wraps an n-qubit operator as a Qobj"""
+    return qutip.Qobj(U, dims=[[2] * n_qubits, [2] * n_qubits])
+
+
+def _kron_all(operators):
+    result = operators[0]
+    for operator in operators[1:]:
+        result = numpy.kron(result, operator)
+    return result
+
+
+def _controlled_operator(U, n_qubits, control, target):
+    """Returns the n-qubit operator of a controlled single qubit gate"""
+    identity = numpy.eye(2, dtype=complex)
+    off = [identity] * n_qubits
+    on = [identity] * n_qubits
+    off[control] = numpy.diag([1., 0.]).astype(complex)
+    on[control] = numpy.diag([0., 1.]).astype(complex)
+    on[target] = U
+    return _kron_all(off) + _kron_all(on)
+
+
+def _cached_controlled(name, kernel, params, n_qubits, control, target):
+    """Returns the cached controlled operator of a gate kernel"""
+    def build():
+        U = _controlled_operator(kernel(params)[0], n_qubits, control,
+                                 target)
+        return _to_qobj(U, n_qubits)
+    key = gate_cache.key(name, params, n_qubits, control, target)
+    return gate_cache.get(key, build)
+
 
 def sq_gate(params):
     """Returns generalized single qubit gate operation
@@ -16,10 +211,9 @@ def sq_gate(params):
     Returns:
         U (Qobj) : unitary for single qubit gate
     """
-    U = (qutip.qip.gates.rz(params[0]) *
-         qutip.qip.gates.ry(params[1]) *
-         qutip.qip.gates.rz(params[2]))
-    return U
+    params = numpy.asarray(params, dtype=float)[:3]
+    return gate_cache.get(gate_cache.key('U', params, 1),
+                          lambda: _to_qobj(sq_gate_array(params)[0], 1))
 
 
 def sq_gate_2all(params, n_qubits, same_angles=False):
@@ -41,18 +235,161 @@ def sq_gate_2all(params, n_qubits, same_angles=False):
         - Single qubit rotations applied to all qubits
             but angles may be different
     """
-    all_rotations = [None] * n_qubits
-    param_index = 0
+    angles = _sq_gate_2all_params(params, n_qubits, same_angles)
+
+    def build():
+        all_rotations = sq_gate_array(angles)
+        return _to_qobj(_kron_all(list(all_rotations)), n_qubits)
+    return gate_cache.get(gate_cache.key('U_ALL', angles, n_qubits), build)
+
+
+def _sq_gate_2all_params(params, n_qubits, same_angles):
+    """Returns the (n_qubits, 3) angles used by sq_gate_2all"""
+    params = numpy.asarray(params, dtype=float)
+    if same_angles:
+        return numpy.tile(params[:3], (n_qubits, 1))
+    return params[:3 * n_qubits].reshape(n_qubits, 3)
+
+
+def _split_axes(state, target, n_qubits):
+    """Returns a (B, 2^target, 2, 2^(n-target-1)) view of statevectors"""
+    state = numpy.asarray(state)
+    if state.shape[-1] != 2 ** n_qubits:
+        raise ValueError('state must have 2^n_qubits amplitudes')
+    return state.reshape(-1, 2 ** target, 2, 2 ** (n_qubits - target - 1))
+
+
+def apply_unitary(state, U, target, n_qubits):
+    """Applies a single qubit unitary to a statevector or batch
+
+    Args:
+        state (numpy.ndarray[complex]) : (2^n,) statevector or (B, 2^n)
+                                            batch of statevectors
+        U (numpy.ndarray[complex]) : (2, 2) unitary, or (B, 2, 2) stack
+                                        with one unitary per statevector
+        target (int) : index of target qubit
+        n_qubits (int) : number of qubits
+
+    Returns:
+        state (numpy.ndarray[complex]) : new array shaped as the input
+    """
+    psi = _split_axes(state, target, n_qubits)
+    U = numpy.asarray(U)
+    if U.ndim == 3:
+        U = U[:, None, :, :, None]
+    else:
+        U = U[:, :, None]
+    zero, one = psi[:, :, 0], psi[:, :, 1]
+    out = numpy.empty(psi.shape, dtype=complex)
+    out[:, :, 0] = U[..., 0, 0, :] * zero + U[..., 0, 1, :] * one
+    out[:, :, 1] = U[..., 1, 0, :] * zero + U[..., 1, 1, :] * one
+    return out.reshape(numpy.shape(state))
+
+
+def apply_controlled_unitary(state, U, control, target, n_qubits):
+    """Applies a controlled single qubit unitary to a statevector or batch
+
+    Only the amplitudes with the control qubit set are touched.
+
+    Args:
+        state (numpy.ndarray[complex]) : (2^n,) statevector or (B, 2^n)
+                                            batch of statevectors
+        U (numpy.ndarray[complex]) : (2, 2) unitary, or (B, 2, 2) stack
+                                        with one unitary per statevector
+        control (int) : index of control qubit
+        target (int) : index of target qubit
+        n_qubits (int) : number of qubits
+
+    Returns:
+        state (numpy.ndarray[complex]) : new array shaped as the input
+    """
+    if control == target:
+        raise ValueError('control and target must be different qubits')
+    out = numpy.array(_split_axes(state, control, n_qubits), dtype=complex)
+    # amplitudes with the control set form an (n - 1)-qubit register
+    on = out[:, :, 1]
+    sub_target = target if target < control else target - 1
+    on[...] = apply_unitary(on.reshape(len(on), -1), U, sub_target,
+                            n_qubits - 1).reshape(on.shape)
+    return out.reshape(numpy.shape(state))
+
+
+def _batched(matrices, params, n_angles):
+    """Returns one matrix, or the whole stack for batched params"""
+    if numpy.ndim(params) < n_angles:
+        return matrices[0]
+    return matrices
+
+
+def apply_sq_gate(state, params, target, n_qubits):
+    """Applies a generalized single qubit gate to a statevector or batch
+
+    Args:
+        state (numpy.ndarray[complex]) : (2^n,) or (B, 2^n) statevectors
+        params (numpy.ndarray[float]) : (3,) rotation angles, or (B, 3)
+                                            angles for each statevector
+        target (int) : index of target qubit
+        n_qubits (int) : number of qubits
+    """
+    params = numpy.asarray(params, dtype=float)
+    return apply_unitary(state, _batched(sq_gate_array(params), params, 2),
+                         target, n_qubits)
+
+
+def apply_sq_gate_2all(state, params, n_qubits, same_angles=False):
+    """Applies generalized single qubit rotations to all qubits
+
+    Args:
+        state (numpy.ndarray[complex]) : (2^n,) or (B, 2^n) statevectors
+        params (numpy.ndarray[float]) : array of rotation angles, as for
+                                            sq_gate_2all
+        n_qubits (int) : number of qubits
+        same_angles (bool) : whether to use same 3 parameters for
+                                all qubits
+    """
+    rotations = sq_gate_array(_sq_gate_2all_params(params, n_qubits,
+                                                   same_angles))
     for i in range(n_qubits):
-        all_rotations[i] = sq_gate(params[param_index:param_index + 3])
+        state = apply_unitary(state, rotations[i], i, n_qubits)
+    return state
 
-        if same_angles:
-            param_index = 0
-        else:
-            param_index += 3
 
-    rotations = qutip.tensor(all_rotations)
-    return rotations
+def apply_controlled_U(state, params, n_qubits, control, target):
+    """Applies controlled-U, U a generalized single qubit gate
+
+    Args:
+        state (numpy.ndarray[complex]) : (2^n,) or (B, 2^n) statevectors
+        params (numpy.ndarray[float]) : (3,) rotation angles, or (B, 3)
+                                            angles for each statevector
+        n_qubits (int) : number of qubits
+        control (int) : index of control qubit
+        target (int) : index of target qubit
+    """
+    params = numpy.asarray(params, dtype=float)
+    return apply_controlled_unitary(
+        state, _batched(sq_gate_array(params), params, 2), control, target,
+        n_qubits)
+
+
+def apply_controlled_Rx(state, params, n_qubits, control, target):
+    """Applies controlled-Rx for an angle, or (B,) angles for a batch"""
+    return apply_controlled_unitary(
+        state, _batched(rx_array(params), params, 1), control, target,
+        n_qubits)
+
+
+def apply_controlled_Ry(state, params, n_qubits, control, target):
+    """Applies controlled-Ry for an angle, or (B,) angles for a batch"""
+    return apply_controlled_unitary(
+        state, _batched(ry_array(params), params, 1), control, target,
+        n_qubits)
+
+
+def apply_controlled_Rz(state, params, n_qubits, control, target):
+    """Applies controlled-Rz for an angle, or (B,) angles for a batch"""
+    return apply_controlled_unitary(
+        state, _batched(rz_array(params), params, 1), control, target,
+        n_qubits)
 
 
 # def single_qubit_yz_rotations(params, n_qubits):
@@ -151,12 +488,9 @@ def controlled_U(params, n_qubits, control, target):
     Returns:
         U (Qobj) : controlled-U operation
     """
-    U = qutip.qip.gates.controlled_gate(sq_gate(params),
-                                        n_qubits,
-                                        control,
-                                        target,
-                                        control_value=1)
-    return U
+    return _cached_controlled('CU', sq_gate_array,
+                              numpy.asarray(params, dtype=float)[:3],
+                              n_qubits, control, target)
 
 def controlled_Rx(params, n_qubits, control, target):
     """Returns controlled-Rx gate operation on n-qubit register
@@ -170,12 +504,9 @@ def controlled_Rx(params, n_qubits, control, target):
     Returns:
         U (Qobj) : controlled-Rx operation
     """
-    U = qutip.qip.gates.controlled_gate(qutip.qip.gates.rx(params),
-                                        n_qubits,
-                                        control,
-                                        target,
-                                        control_value=1)
-    return U
+    return _cached_controlled('CRX', rx_array,
+                              numpy.ravel(params).astype(float)[:1],
+                              n_qubits, control, target)
 
 def controlled_Ry(params, n_qubits, control, target):
     """Returns controlled-Ry gate operation on n-qubit register
@@ -189,12 +520,9 @@ def controlled_Ry(params, n_qubits, control, target):
     Returns:
         U (Qobj) : controlled-Ry operation
     """
-    U = qutip.qip.gates.controlled_gate(qutip.qip.gates.ry(params),
-                                        n_qubits,
-                                        control,
-                                        target,
-                                        control_value=1)
-    return U
+    return _cached_controlled('CRY', ry_array,
+                              numpy.ravel(params).astype(float)[:1],
+                              n_qubits, control, target)
 
 def controlled_Rz(params, n_qubits, control, target):
     """Returns controlled-Rz gate operation on n-qubit register
@@ -208,12 +536,9 @@ def controlled_Rz(params, n_qubits, control, target):
     Returns:
         U (Qobj) : controlled-Rz operation
     """
-    U = qutip.qip.gates.controlled_gate(qutip.qip.gates.rz(params),
-                                        n_qubits,
-                                        control,
-                                        target,
-                                        control_value=1)
-    return U
+    return _cached_controlled('CRZ', rz_array,
+                              numpy.ravel(params).astype(float)[:1],
+                              n_qubits, control, target)
 
 
 
@@ -0,0 +1,228 @@
+"""Tests for _gates.py."""
+import unittest
+
+import numpy
+import scipy.linalg
+
+from _gates import (apply_controlled_Rx,
+                    clear_gate_cache,
+                    gate_cache_info,
+                    apply_controlled_Ry,
+                    apply_controlled_Rz,
+                    apply_controlled_U,
+                    apply_sq_gate,
+                    apply_sq_gate_2all,
+                    apply_unitary,
+                    controlled_array,
+                    controlled_Rx_array,
+                    controlled_Ry_array,
+                    controlled_Rz_array,
+                    controlled_U,
+                    controlled_U_array,
+                    controlled_Rx,
+                    controlled_Ry,
+                    controlled_Rz,
+                    rx_array,
+                    ry_array,
+                    rz_array,
+                    set_gate_cache_size,
+                    sq_gate,
+                    sq_gate_2all,
+                    sq_gate_array)
+
+X = numpy.array([[0, 1], [1, 0]], dtype=complex)
+Y = numpy.array([[0, -1j], [1j, 0]])
+Z = numpy.diag([1., -1.]).astype(complex)
+
+
+def rotation(pauli, theta):
+    return scipy.linalg.expm(-0.5j * theta * pauli)
+
+
+class GatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.angles = numpy.random.RandomState(7).uniform(-4., 4., (6, 3))
+
+    def test_rotation_arrays(self):
+        thetas = self.angles[:, 0]
+        for kernel, pauli in [(rx_array, X), (ry_array, Y), (rz_array, Z)]:
+            stack = kernel(thetas)
+            self.assertEqual(stack.shape, (6, 2, 2))
+            for U, theta in zip(stack, thetas):
+                numpy.testing.assert_allclose(U, rotation(pauli, theta),
+                                              atol=1e-12)
+
+    def test_sq_gate_array(self):
+        stack = sq_gate_array(self.angles)
+        self.assertEqual(stack.shape, (6, 2, 2))
+        for U, (a, b, c) in zip(stack, self.angles):
+            expected = rotation(Z, a).dot(rotation(Y, b)).dot(rotation(Z, c))
+            numpy.testing.assert_allclose(U, expected, atol=1e-12)
+
+    def test_sq_gate_array_single_triple(self):
+        self.assertEqual(sq_gate_array([0.1, 0.2, 0.3]).shape, (1, 2, 2))
+
+    def test_controlled_arrays(self):
+        thetas = self.angles[:, 1]
+        pairs = [(controlled_Rx_array, rx_array),
+                 (controlled_Ry_array, ry_array),
+                 (controlled_Rz_array, rz_array)]
+        for controlled_kernel, kernel in pairs:
+            stack = controlled_kernel(thetas)
+            self.assertEqual(stack.shape, (6, 4, 4))
+            numpy.testing.assert_allclose(stack[:, :2, :2],
+                                          numpy.tile(numpy.eye(2), (6, 1, 1)))
+            numpy.testing.assert_allclose(stack[:, 2:, 2:], kernel(thetas))
+            numpy.testing.assert_allclose(stack[:, :2, 2:], 0.)
+        numpy.testing.assert_allclose(controlled_U_array(self.angles),
+                                      controlled_array(
+                                          sq_gate_array(self.angles)))
+
+    def test_sq_gate_qobj(self):
+        U = sq_gate(self.angles[0])
+        numpy.testing.assert_allclose(U.full(),
+                                      sq_gate_array(self.angles[0])[0])
+
+    def test_sq_gate_2all(self):
+        params = self.angles[:3].ravel()
+        U = sq_gate_2all(params, 3)
+        stack = sq_gate_array(self.angles[:3])
+        expected = numpy.kron(numpy.kron(stack[0], stack[1]), stack[2])
+        self.assertEqual(U.dims, [[2, 2, 2], [2, 2, 2]])
+        numpy.testing.assert_allclose(U.full(), expected)
+        same = sq_gate_2all(params, 2, same_angles=True)
+        numpy.testing.assert_allclose(same.full(),
+                                      numpy.kron(stack[0], stack[0]))
+
+    def test_controlled_gates_qobj(self):
+        U = controlled_U(self.angles[0], 2, 0, 1)
+        numpy.testing.assert_allclose(U.full(),
+                                      controlled_U_array(self.angles[0])[0])
+        # control below the target in a three qubit register
+        U = controlled_Rx(0.3, 3, 2, 0).full()
+        rx = rx_array(0.3)[0]
+        for state in range(8):
+            column = U[:, state]
+            if state % 2 == 0:
+                self.assertAlmostEqual(column[state], 1.)
+            else:
+                target = state >> 2
+                flipped = state ^ 4
+                self.assertAlmostEqual(column[state], rx[target, target])
+                self.assertAlmostEqual(column[flipped],
+                                       rx[1 - target, target])
+
+
+class GateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        clear_gate_cache()
+
+    def tearDown(self):
+        set_gate_cache_size(1024)
+        clear_gate_cache()
+
+    def test_repeated_angles_hit(self):
+        first = controlled_Rz(-0.743043, 3, 0, 2)
+        second = controlled_Rz(numpy.array([-0.743043]), 3, 0, 2)
+        self.assertIs(first, second)
+        self.assertIsNot(controlled_Rz(-0.743043, 3, 2, 0), first)
+        self.assertIsNot(controlled_Ry(-0.743043, 3, 0, 2), first)
+        info = gate_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 3, 3))
+
+    def test_same_angle_layers(self):
+        params = numpy.array([0.1, 0.2, 0.3])
+        for _ in range(5):
+            sq_gate_2all(params, 3, same_angles=True)
+            sq_gate(params)
+        info = gate_cache_info()
+        self.assertEqual((info.hits, info.misses), (8, 2))
+
+    def test_eviction(self):
+        set_gate_cache_size(2)
+        for theta in [0.1, 0.2, 0.1, 0.3, 0.2]:
+            controlled_Rx(theta, 2, 0, 1)
+        info = gate_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 4, 2))
+
+    def test_disabled(self):
+        set_gate_cache_size(0)
+        self.assertIsNot(sq_gate([0.1, 0.2, 0.3]), sq_gate([0.1, 0.2, 0.3]))
+        self.assertEqual(gate_cache_info().currsize, 0)
+
+
+class ApplyGatesTest(unittest.TestCase):
+
+    def setUp(self):
+        random = numpy.random.RandomState(11)
+        self.n_qubits = 4
+        self.states = (random.normal(size=(5, 16)) +
+                       1j * random.normal(size=(5, 16)))
+        self.angles = random.uniform(-4., 4., (5, 3))
+
+    def test_apply_sq_gate(self):
+        for target in range(self.n_qubits):
+            operators = [numpy.eye(2)] * self.n_qubits
+            operators[target] = sq_gate_array(self.angles[0])[0]
+            full = operators[0]
+            for operator in operators[1:]:
+                full = numpy.kron(full, operator)
+            numpy.testing.assert_allclose(
+                apply_sq_gate(self.states[0], self.angles[0], target, 4),
+                full.dot(self.states[0]))
+            numpy.testing.assert_allclose(
+                apply_sq_gate(self.states, self.angles[0], target, 4),
+                self.states.dot(full.T))
+
+    def test_apply_sq_gate_batched_params(self):
+        out = apply_sq_gate(self.states, self.angles, 2, 4)
+        for state, params, result in zip(self.states, self.angles, out):
+            numpy.testing.assert_allclose(
+                result, apply_sq_gate(state, params, 2, 4))
+
+    def test_apply_sq_gate_2all(self):
+        params = self.angles[:4].ravel()
+        for same_angles in [False, True]:
+            full = sq_gate_2all(params, 4, same_angles).full()
+            numpy.testing.assert_allclose(
+                apply_sq_gate_2all(self.states, params, 4, same_angles),
+                self.states.dot(full.T))
+
+    def test_apply_controlled_gates(self):
+        for control, target in [(0, 1), (3, 1), (2, 0), (1, 3)]:
+            full = controlled_U(self.angles[1], 4, control, target).full()
+            numpy.testing.assert_allclose(
+                apply_controlled_U(self.states, self.angles[1], 4, control,
+                                   target),
+                self.states.dot(full.T))
+            pairs = [(apply_controlled_Rx, controlled_Rx),
+                     (apply_controlled_Ry, controlled_Ry),
+                     (apply_controlled_Rz, controlled_Rz)]
+            for apply_gate, gate in pairs:
+                full = gate(0.7, 4, control, target).full()
+                numpy.testing.assert_allclose(
+                    apply_gate(self.states[0], 0.7, 4, control, target),
+                    full.dot(self.states[0]))
+
+    def test_apply_controlled_batched_params(self):
+        thetas = self.angles[:, 0]
+        out = apply_controlled_Ry(self.states, thetas, 4, 1, 2)
+        for state, theta, result in zip(self.states, thetas, out):
+            numpy.testing.assert_allclose(
+                result, apply_controlled_Ry(state, theta, 4, 1, 2))
+
+    def test_apply_does_not_modify_input(self):
+        states = self.states.copy()
+        apply_controlled_Rx(states, 0.3, 4, 0, 1)
+        apply_unitary(states, rx_array(0.3)[0], 0, 4)
+        numpy.testing.assert_array_equal(states, self.states)
+
+    def test_apply_bad_state_size(self):
+        with self.assertRaises(ValueError):
+            apply_sq_gate(self.states, self.angles[0], 0, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
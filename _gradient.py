@@ -0,0 +1,77 @@
+""" Batched parameter-shift gradients of circuit cost functions"""
+from __future__ import absolute_import
+
+import numpy
+
+from _simulator import get_shift_rule
+
+
+def shifted_slots(compiled, slots):
+    """
+    Build the shifted parameter slots of the parameter-shift rule
+
+    Every occurrence of a variational parameter is shifted on its own:
+    a parameter shared by several gates (same_angle=True) is a sum of
+    per-gate terms, and shifting all of its occurrences at once would
+    break the rule.
+
+    Args:
+        compiled (CompiledCircuit): compiled circuit
+        slots (numpy.ndarray): (n_slots,) unshifted angles
+
+    Returns:
+        batch (numpy.ndarray): (M, n_slots) shifted angles
+        coefficients (numpy.ndarray): (M,) coefficients of the rule
+        indexes (numpy.ndarray): (M,) variational parameter index
+            receiving each term
+    """
+    rules = {}
+    columns, shifts, coefficients = [], [], []
+    for slot in numpy.flatnonzero(compiled.slot_variational).tolist():
+        type_id = compiled.slot_type[slot]
+        if type_id not in rules:
+            rules[type_id] = get_shift_rule(compiled.templates[type_id])
+        for coefficient, shift in rules[type_id]:
+            columns.append(slot)
+            shifts.append(shift)
+            coefficients.append(coefficient)
+    columns = numpy.asarray(columns, dtype=numpy.int64)
+    batch = numpy.tile(slots, (len(columns), 1))
+    batch[numpy.arange(len(columns)), columns] += shifts
+    return (batch, numpy.asarray(coefficients),
+            compiled.slot_index[columns])
+
+
+def parameter_shift_gradient(compiled, variables, cost_function,
+                             constants=None, state=None, batch_size=None):
+    """
+    Returns the gradient of a cost function of the final statevector
+
+    All shifted parameter sets are simulated as one batch (or in chunks
+    of batch_size statevectors) and the terms of every occurrence of a
+    parameter are accumulated into its index.
+
+    Args:
+        compiled (CompiledCircuit): compiled circuit
+        variables (numpy.ndarray): (n_variables,) variational parameters
+        cost_function (callable): maps (B, 2^n) statevectors to (B,) costs
+        constants (numpy.ndarray, optional): constant parameters
+        state (numpy.ndarray, optional): initial statevector
+        batch_size (int, optional): maximum number of statevectors
+            simulated at once
+
+    Returns:
+        gradient (numpy.ndarray): (n_variables,) derivatives
+    """
+    slots = compiled.slot_parameters(variables, constants)[0]
+    batch, coefficients, indexes = shifted_slots(compiled, slots)
+    if batch_size is None:
+        batch_size = max(len(batch), 1)
+    values = numpy.empty(len(batch))
+    for start in range(0, len(batch), batch_size):
+        stop = start + batch_size
+        values[start:stop] = cost_function(
+            compiled.run_slots(batch[start:stop], state))
+    gradient = numpy.zeros(len(numpy.atleast_1d(variables)))
+    numpy.add.at(gradient, indexes, coefficients * values)
+    return gradient
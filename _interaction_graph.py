@@ -0,0 +1,152 @@
+""" Weighted graph of the qubit pairs interacting in a circuit"""
+import numpy
+
+
+class InteractionGraph(object):
+    """ Sparse pair -> (count, time) map of interacting logical qubits
+
+    Two qubits interact whenever a gate targets both of them; a gate of
+    span m contributes to each of its m(m-1)/2 pairs. For every pair the
+    graph accumulates the number of gates and the total gate time. It is
+    updated incrementally as gates are appended to a circuit.
+
+    Attributes:
+        n_qubits (integer):
+            Number of qubits in the register
+        n_pairs (integer):
+            Number of distinct interacting pairs
+    """
+
+    def __init__(self, n_qubits, capacity=16):
+        self.n_qubits = n_qubits
+        self.n_pairs = 0
+        self._slots = {}
+        self._pairs = numpy.empty((capacity, 2), dtype=numpy.int32)
+        self._counts = numpy.zeros(capacity, dtype=numpy.int64)
+        self._times = numpy.zeros(capacity, dtype=numpy.float64)
+
+    def _reserve(self, n_pairs):
+        capacity = len(self._counts)
+        if n_pairs <= capacity:
+            return
+        while capacity < n_pairs:
+            capacity *= 2
+        pairs = numpy.empty((capacity, 2), dtype=numpy.int32)
+        pairs[:self.n_pairs] = self._pairs[:self.n_pairs]
+        counts = numpy.zeros(capacity, dtype=numpy.int64)
+        counts[:self.n_pairs] = self._counts[:self.n_pairs]
+        times = numpy.zeros(capacity, dtype=numpy.float64)
+        times[:self.n_pairs] = self._times[:self.n_pairs]
+        self._pairs, self._counts, self._times = pairs, counts, times
+
+    def add_gates(self, targets, time):
+        """
+        Accumulate the interactions of a set of gates
+
+        Args:
+            targets (numpy.ndarray): (n, span) array of qubit indexes
+            time (float or numpy.ndarray): time of the gates
+
+        Raises:
+            ValueError: if a target is not in [0, n_qubits)
+        """
+        targets = numpy.asarray(targets)
+        if targets.size > 0 and (targets.min() < 0 or
+                                 targets.max() >= self.n_qubits):
+            raise ValueError('targets must be qubits of the register')
+        if targets.ndim != 2 or targets.shape[1] < 2 or len(targets) == 0:
+            return
+        first, second = numpy.triu_indices(targets.shape[1], 1)
+        low = numpy.minimum(targets[:, first], targets[:, second])
+        high = numpy.maximum(targets[:, first], targets[:, second])
+        keys = (low.astype(numpy.int64) * self.n_qubits + high).ravel()
+        times = numpy.broadcast_to(numpy.reshape(time, (-1, 1)),
+                                   low.shape).ravel()
+
+        keys, inverse, counts = numpy.unique(keys, return_inverse=True,
+                                             return_counts=True)
+        time_sums = numpy.bincount(inverse.ravel(), weights=times,
+                                   minlength=len(keys))
+
+        slots = numpy.empty(len(keys), dtype=numpy.int64)
+        for n, key in enumerate(keys.tolist()):
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self.n_pairs
+                self._reserve(slot + 1)
+                self._slots[key] = slot
+                self._pairs[slot] = divmod(key, self.n_qubits)
+                self.n_pairs += 1
+            slots[n] = slot
+        self._counts[slots] += counts
+        self._times[slots] += time_sums
+
+    def pairs(self):
+        """Return the (n_pairs, 2) array of interacting pairs (i < j)"""
+        return self._pairs[:self.n_pairs]
+
+    def counts(self):
+        """Return the number of gates acting on each pair"""
+        return self._counts[:self.n_pairs]
+
+    def times(self):
+        """Return the total gate time spent on each pair"""
+        return self._times[:self.n_pairs]
+
+    def get_weight(self, weight='count'):
+        """
+        Return the weights of the pairs
+
+        Args:
+            weight (string): 'count' or 'time'
+        """
+        if weight == 'count':
+            return self.counts()
+        elif weight == 'time':
+            return self.times()
+        raise ValueError("weight must be 'count' or 'time'")
+
+    def adjacency_matrix(self, weight='count'):
+        """
+        Return the dense symmetric (n_qubits, n_qubits) weight matrix
+
+        Args:
+            weight (string): 'count' or 'time'
+        """
+        values = self.get_weight(weight)
+        matrix = numpy.zeros((self.n_qubits, self.n_qubits),
+                             dtype=values.dtype)
+        pairs = self.pairs()
+        matrix[pairs[:, 0], pairs[:, 1]] = values
+        matrix[pairs[:, 1], pairs[:, 0]] = values
+        return matrix
+
+    def sparse_matrix(self, weight='count'):
+        """
+        Return the symmetric weight matrix as a scipy.sparse.csr_matrix
+
+        Args:
+            weight (string): 'count' or 'time'
+        """
+        import scipy.sparse
+        values = self.get_weight(weight)
+        pairs = self.pairs()
+        rows = numpy.concatenate([pairs[:, 0], pairs[:, 1]])
+        columns = numpy.concatenate([pairs[:, 1], pairs[:, 0]])
+        return scipy.sparse.csr_matrix(
+            (numpy.concatenate([values, values]), (rows, columns)),
+            shape=(self.n_qubits, self.n_qubits))
+
+    def degrees(self, weight='count'):
+        """
+        Return the weighted degree of every qubit
+
+        Args:
+            weight (string): 'count' or 'time'
+        """
+        values = self.get_weight(weight)
+        pairs = self.pairs()
+        return (numpy.bincount(pairs[:, 0], weights=values,
+                               minlength=self.n_qubits) +
+                numpy.bincount(pairs[:, 1], weights=values,
+                               minlength=self.n_qubits))
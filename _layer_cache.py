@@ -0,0 +1,234 @@
+""" Layered unitary cache with incremental recomputation
+
+The unitary of a circuit is the product L_{k-1} ... L_1 L_0 of its layer
+unitaries. The cache keeps every layer unitary together with prefix
+products P_i = L_i ... L_0 and suffix products S_i = L_{k-1} ... L_i.
+When parameters change only the layers referencing them are rebuilt,
+and the full unitary is recovered from the still valid prefix and
+suffix products around them. Layers whose parameter slots did not
+change, such as layers without variational parameters, are built once.
+
+Repetitions of the basic block are never materialized. When all the
+repetitions share their parameters the circuit unitary is a matrix power
+of the block unitary. Otherwise only the parameter slots of every
+repetition are kept, together with the products of the repetitions
+before and after the last one whose parameters changed (the pivot):
+changing the parameters of the pivot again only rebuilds its changed
+layers, while changing those of another repetition folds all the
+repetitions again, each through the same layer cache. The memory used
+does not grow with the number of repetitions.
+"""
+from __future__ import absolute_import
+
+import numpy
+
+from _simulator import CompiledCircuit
+
+
+class LayeredUnitaryCache(object):
+    """ Cache of the layer unitaries and partial products of a circuit
+
+    Attributes:
+        n_layers (integer):
+            Number of layers of the circuit
+        n_rebuilt (integer):
+            Number of layer unitaries built so far
+    """
+
+    def __init__(self, circuit, constants=None, n_blocks=None):
+        """
+        Args:
+            circuit (AbstractCircuit): circuit whose unitary is cached
+            constants (numpy.ndarray, optional): constant parameters
+            n_blocks (integer, optional): number of repetitions of the
+                basic block, defaults to circuit.n_blocks
+        """
+        self.compiled = CompiledCircuit(circuit, n_blocks)
+        self.n_blocks = self.compiled.n_blocks
+        self.shared_parameters = circuit.shared_parameters
+        self.n_qubits = circuit.n_qubits
+        self.dimension = 2 ** circuit.n_qubits
+        self.constants = constants
+        offsets = circuit.gates.layer_offsets
+        self.n_layers = len(offsets) - 1
+        self._layer_operations = [self.compiled.operations[start:stop]
+                                  for start, stop in
+                                  zip(offsets[:-1], offsets[1:])]
+
+        # layer of every parameter slot of the block
+        operations = self.compiled.operations
+        self._slot_layer = numpy.zeros(self.compiled.block_slots,
+                                       dtype=numpy.int64)
+        for layer in range(self.n_layers):
+            if offsets[layer] == offsets[layer + 1]:
+                continue
+            start = operations[offsets[layer]][2]
+            stop = operations[offsets[layer + 1] - 1][3]
+            self._slot_layer[start:stop] = layer
+
+        self._layers = [None] * self.n_layers
+        self._prefix = [None] * self.n_layers
+        self._suffix = [None] * self.n_layers
+        self._prefix_valid = 0
+        self._suffix_valid = self.n_layers
+        self._slots = None
+        self._block_unitary = None
+        self._shared_block = None
+        self._block_slots = None
+        self._pivot = None
+        self._before = None
+        self._after = None
+        self._unitary = None
+        self.n_rebuilt = 0
+
+    def _build_layer(self, layer, slots):
+        """Return the unitary of a layer for given parameter slots"""
+        # rows of the identity are the basis states; evolving them gives
+        # the rows of the transposed unitary
+        state = numpy.eye(self.dimension, dtype=complex)
+        for kernel, targets, start, stop in self._layer_operations[layer]:
+            angles = numpy.broadcast_to(slots[start:stop],
+                                        (1, stop - start))
+            state = kernel(state, angles, targets, self.n_qubits)
+        self.n_rebuilt += 1
+        return state.T
+
+    def _changed_layers(self, slots):
+        """Return the sorted layers whose unitary must be rebuilt"""
+        if self._slots is None:
+            return list(range(self.n_layers))
+        changed = numpy.flatnonzero(slots != self._slots)
+        return numpy.unique(self._slot_layer[changed]).tolist()
+
+    def _prefix_product(self, layer):
+        """Return P_layer, extending the valid prefix products"""
+        if layer < 0:
+            return None
+        for i in range(self._prefix_valid, layer + 1):
+            if i == 0:
+                self._prefix[i] = self._layers[0]
+            else:
+                self._prefix[i] = self._layers[i].dot(self._prefix[i - 1])
+        self._prefix_valid = max(self._prefix_valid, layer + 1)
+        return self._prefix[layer]
+
+    def _suffix_product(self, layer):
+        """Return S_layer, extending the valid suffix products"""
+        if layer >= self.n_layers:
+            return None
+        for i in range(self._suffix_valid - 1, layer - 1, -1):
+            if i == self.n_layers - 1:
+                self._suffix[i] = self._layers[i]
+            else:
+                self._suffix[i] = self._suffix[i + 1].dot(self._layers[i])
+        self._suffix_valid = min(self._suffix_valid, layer)
+        return self._suffix[layer]
+
+    def block_unitary(self, slots):
+        """
+        Return the unitary of the basic block, rebuilding only the
+        layers whose parameter slots changed since the last call
+
+        Args:
+            slots (numpy.ndarray): (block_slots,) angles of the block
+
+        Returns:
+            U (numpy.ndarray): (2^n, 2^n) unitary of the block
+        """
+        layers = self._changed_layers(slots)
+        if not layers and self._block_unitary is not None:
+            return self._block_unitary
+        for layer in layers:
+            self._layers[layer] = self._build_layer(layer, slots)
+        self._slots = slots
+
+        if self.n_layers == 0:
+            self._block_unitary = numpy.eye(self.dimension, dtype=complex)
+            return self._block_unitary
+        first = layers[0] if layers else self.n_layers
+        last = layers[-1] if layers else -1
+        self._prefix_valid = min(self._prefix_valid, first)
+        self._suffix_valid = max(self._suffix_valid, last + 1)
+
+        # U = S_{last+1} L_last ... L_first P_{first-1}
+        unitary = self._prefix_product(first - 1)
+        for layer in range(first, last + 1):
+            if unitary is None:
+                unitary = self._layers[layer]
+            else:
+                unitary = self._layers[layer].dot(unitary)
+        suffix = self._suffix_product(last + 1)
+        if suffix is not None:
+            unitary = suffix.dot(unitary)
+        self._block_unitary = unitary
+        return unitary
+
+    def unitary(self, parameters):
+        """
+        Return the circuit unitary, rebuilding only what changed
+
+        Args:
+            parameters (numpy.ndarray): variational parameters
+
+        Returns:
+            U (numpy.ndarray): (2^n, 2^n) unitary of the circuit
+        """
+        slots = self.compiled.slot_parameters(parameters, self.constants)[0]
+        size = self.compiled.block_slots
+        if self.n_blocks == 1 or self.shared_parameters:
+            block = self.block_unitary(slots[:size])
+            if self.n_blocks == 1:
+                return block
+            if block is not self._shared_block:
+                self._shared_block = block
+                self._unitary = numpy.linalg.matrix_power(block,
+                                                          self.n_blocks)
+            return self._unitary
+
+        block_slots = slots[:self.n_blocks * size].reshape(self.n_blocks,
+                                                             size)
+        if self._block_slots is None:
+            changed = [self.n_blocks - 1]
+        else:
+            changed = numpy.flatnonzero(
+                (block_slots != self._block_slots).any(axis=1)).tolist()
+            if not changed:
+                return self._unitary
+        if changed != [self._pivot]:
+            # new pivot: fold the repetitions before and after it, the
+            # pivot last so that the layer cache holds its layers
+            pivot = changed[-1]
+            self._before = None
+            for b in range(pivot):
+                block = self.block_unitary(block_slots[b])
+                self._before = block if self._before is None else \
+                    block.dot(self._before)
+            self._after = None
+            for b in range(pivot + 1, self.n_blocks):
+                block = self.block_unitary(block_slots[b])
+                self._after = block if self._after is None else \
+                    block.dot(self._after)
+            self._pivot = pivot
+        # U = A B_pivot P
+        unitary = self.block_unitary(block_slots[self._pivot])
+        if self._before is not None:
+            unitary = unitary.dot(self._before)
+        if self._after is not None:
+            unitary = self._after.dot(unitary)
+        self._block_slots = block_slots.copy()
+        self._unitary = unitary
+        return unitary
+
+    def state(self, parameters, initial=None):
+        """
+        Return the output statevector of the circuit
+
+        Args:
+            parameters (numpy.ndarray): variational parameters
+            initial (numpy.ndarray, optional): initial statevector.
+                Defaults to |0...0>.
+        """
+        unitary = self.unitary(parameters)
+        if initial is None:
+            return unitary[:, 0].copy()
+        return unitary.dot(initial)
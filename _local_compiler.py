@@ -0,0 +1,257 @@
+""" Local stand-in for the remote compiler, routing Quil on a HardwareGraph
+
+Programs are read from their Quil text. Every two-qubit gate acting on
+uncoupled qubits is made executable by swapping one of its qubits along
+a shortest path of the hardware until both are coupled (greedy SWAP
+insertion). The jobs expose the statistics of the remote compiler jobs:
+gate_depth, gate_volume, topological_swaps, multiqubit_gate_depth and
+program_fidelity. Gates are not translated into native gates; a SWAP
+counts as three two-qubit gates.
+"""
+from __future__ import absolute_import
+
+import itertools
+import re
+
+import numpy
+
+_GATE = re.compile(r'^([A-Za-z][\w\-]*)(\(.*\))?((?:\s+\d+)+)$')
+_MEASURE = re.compile(r'^MEASURE\s+(\d+)(\s+.*)?$')
+
+SWAP_GATES = 3
+
+
+def parse_quil(text):
+    """
+    Returns the instructions of a Quil program
+
+    Gate definitions are skipped. Lines which are neither gates nor
+    measurements are kept as they are.
+
+    Args:
+        text (string): Quil text
+
+    Returns:
+        instructions (list): (name, parameters, qubits) tuples, with
+            name 'MEASURE' and the classical target as parameters for
+            measurements, and name None and the line as parameters for
+            other lines
+    """
+    instructions = []
+    in_definition = False
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        if line[0].isspace():
+            if in_definition:
+                continue
+            line = line.strip()
+        in_definition = line.startswith('DEFGATE')
+        if in_definition:
+            continue
+        match = _MEASURE.match(line)
+        if match:
+            instructions.append(('MEASURE', match.group(2) or '',
+                                 (int(match.group(1)),)))
+            continue
+        match = _GATE.match(line)
+        if match:
+            instructions.append((match.group(1), match.group(2) or '',
+                                 tuple(int(q) for q in
+                                       match.group(3).split())))
+        else:
+            instructions.append((None, line, ()))
+    return instructions
+
+
+def format_quil(instructions):
+    """Returns the Quil text of instructions returned by parse_quil"""
+    lines = []
+    for name, parameters, qubits in instructions:
+        if name is None:
+            lines.append(parameters)
+        elif name == 'MEASURE':
+            lines.append('MEASURE {0}{1}'.format(qubits[0], parameters))
+        else:
+            lines.append('{0}{1} {2}'.format(name, parameters,
+                                             ' '.join(str(q) for q in qubits)))
+    return '\n'.join(lines) + '\n'
+
+
+def route(instructions, hardware, occupied=(), return_layout=False):
+    """
+    Insert SWAP gates so that every two-qubit gate acts on coupled qubits
+
+    Program qubits start on the hardware qubits of the same label. The
+    first qubit of an uncoupled pair is swapped along a shortest path
+    towards the second one.
+
+    Args:
+        instructions (list): instructions returned by parse_quil
+        hardware (HardwareGraph): device
+        occupied (iterable): other qubits holding a state, moved by the
+            SWAP gates like the program qubits
+        return_layout (bool): also return the final layout
+
+    Returns:
+        routed (list): instructions on hardware qubits
+        n_swaps (integer): number of SWAP gates inserted
+        layout (dict): if return_layout, the hardware qubit every
+            program and occupied qubit ends on
+    """
+    distances = hardware.distance_matrix()
+    position = {}
+    for qubits in [qs for _, _, qs in instructions] + [tuple(occupied)]:
+        for qubit in qubits:
+            if qubit not in position:
+                try:
+                    hardware.qubit_index(qubit)
+                except KeyError:
+                    raise ValueError('Qubit {0} is not on the hardware'
+                                     .format(qubit))
+                position[qubit] = qubit
+    occupant = dict((p, q) for q, p in position.items())
+
+    def distance(u, v):
+        return distances[hardware.qubit_index(u), hardware.qubit_index(v)]
+
+    routed = []
+    n_swaps = 0
+    for name, parameters, qubits in instructions:
+        physical = [position[q] for q in qubits]
+        if len(physical) > 2:
+            raise ValueError('Cannot route {0}-qubit gate {1}'
+                             .format(len(physical), name))
+        if len(physical) == 2:
+            u, v = physical
+            if distance(u, v) == numpy.inf:
+                raise ValueError('Qubits {0} and {1} are not connected'
+                                 .format(u, v))
+            while distance(u, v) > 1:
+                step = min(w for w in hardware.neighbors(u)
+                           if distance(w, v) == distance(u, v) - 1)
+                routed.append(('SWAP', '', (u, step)))
+                n_swaps += 1
+                moved = occupant.pop(step, None)
+                occupant[step] = occupant.pop(u)
+                position[occupant[step]] = step
+                if moved is not None:
+                    occupant[u] = moved
+                    position[moved] = u
+                u = step
+            physical = [u, v]
+        routed.append((name, parameters, tuple(physical)))
+    if return_layout:
+        return routed, n_swaps, position
+    return routed, n_swaps
+
+
+def _gate_levels(instructions, multiqubit_only=False):
+    """Returns the depth of instructions scheduled as soon as possible"""
+    levels = {}
+    depth = 0
+    for name, _, qubits in instructions:
+        if name in (None, 'MEASURE'):
+            continue
+        if multiqubit_only and len(qubits) < 2:
+            continue
+        repeat = SWAP_GATES if name == 'SWAP' else 1
+        level = max(levels.get(q, 0) for q in qubits) + repeat
+        for q in qubits:
+            levels[q] = level
+        depth = max(depth, level)
+    return depth
+
+
+class LocalCompileJob(object):
+    """ Result of a local compilation, mirroring the remote job API"""
+
+    def __init__(self, job_id, instructions, hardware):
+        """
+        Args:
+            job_id (integer): identifier of the job
+            instructions (list): instructions of the source program
+            hardware (HardwareGraph): device
+        """
+        self.job_id = job_id
+        self.hardware = hardware
+        self.instructions, self.n_swaps = route(instructions, hardware)
+
+    def is_done(self):
+        return True
+
+    def compiled_quil(self):
+        """Returns the Quil text of the routed program"""
+        return format_quil(self.instructions)
+
+    def gate_depth(self):
+        return _gate_levels(self.instructions)
+
+    def multiqubit_gate_depth(self):
+        return _gate_levels(self.instructions, True)
+
+    def gate_volume(self):
+        return sum(SWAP_GATES if name == 'SWAP' else 1
+                   for name, _, _ in self.instructions
+                   if name not in (None, 'MEASURE'))
+
+    def topological_swaps(self):
+        return self.n_swaps
+
+    def program_fidelity(self):
+        """
+        Returns the product of the fidelities of the gates and
+        measurements of the routed program
+        """
+        single = self.hardware.fidelity_list['single_qubit']
+        double = self.hardware.fidelity_list['two-qubit']['f2CZ']
+        fidelity = 1.
+        for name, _, qubits in self.instructions:
+            if name is None:
+                continue
+            if name == 'MEASURE':
+                index = self.hardware.qubit_index(qubits[0])
+                fidelity *= single['f1RO'][index]
+            elif len(qubits) == 1:
+                index = self.hardware.qubit_index(qubits[0])
+                fidelity *= single['f1QRB'][index]
+            else:
+                edge = double[self.hardware.edge_index(*qubits)]
+                fidelity *= edge ** (SWAP_GATES if name == 'SWAP' else 1)
+        return fidelity
+
+
+class LocalCompiler(object):
+    """ Offline replacement of CompilerConnection for a HardwareGraph"""
+
+    def __init__(self, hardware):
+        """
+        Args:
+            hardware (HardwareGraph): device programs are routed on
+        """
+        self.hardware = hardware
+        self._jobs = {}
+        self._ids = itertools.count()
+
+    def compile(self, program):
+        """
+        Route a program and return its job
+
+        Args:
+            program (Program or string): pyquil Program or Quil text
+        """
+        text = program if isinstance(program, str) else program.out()
+        job_id = next(self._ids)
+        return LocalCompileJob(job_id, parse_quil(text), self.hardware)
+
+    def compile_async(self, program):
+        """Route a program and return the identifier of its job"""
+        job = self.compile(program)
+        self._jobs[job.job_id] = job
+        return job.job_id
+
+    def get_job(self, job_id):
+        return self._jobs[job_id]
+
+    def wait_for_job(self, job_id, ping_time=None, status_time=None):
+        return self._jobs.pop(job_id)
@@ -0,0 +1,98 @@
+"""Tests for _local_compiler.py."""
+import unittest
+
+from _local_compiler import (LocalCompiler,
+                             format_quil,
+                             parse_quil,
+                             route)
+from hardwaregraph import HardwareGraph
+
+PROGRAM = """DEFGATE CRY(%theta):
+    1, 0, 0, 0
+    0, 1, 0, 0
+    0, 0, cos(%theta/2), -sin(%theta/2)
+    0, 0, sin(%theta/2), cos(%theta/2)
+
+H 0
+CRY(4.0) 0 1
+CNOT 0 3
+RZ(-0.743043) 3
+CNOT 1 3
+MEASURE 3 [3]
+"""
+
+
+def build_line(n_qubits=5, f1QRB=0.99, f1RO=0.95, f2CZ=0.9):
+    """ Qubits 0 - 1 - ... - n-1 on a line"""
+    fidelity_list = {
+        'single_qubit': {'f1QRB': [f1QRB] * n_qubits,
+                         'f1RO': [f1RO] * n_qubits},
+        'two-qubit': {'f2CZ': [f2CZ] * (n_qubits - 1),
+                      'f2CPHASE': [1.] * (n_qubits - 1)}
+    }
+    return HardwareGraph(list(range(n_qubits)),
+                         [(q, q + 1) for q in range(n_qubits - 1)],
+                         fidelity_list)
+
+
+class LocalCompilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hardware = build_line()
+
+    def test_parse_quil(self):
+        instructions = parse_quil(PROGRAM)
+        self.assertEqual(instructions[:2], [('H', '', (0,)),
+                                            ('CRY', '(4.0)', (0, 1))])
+        self.assertEqual(instructions[-1], ('MEASURE', ' [3]', (3,)))
+        self.assertEqual(len(instructions), 6)
+        self.assertEqual(format_quil(instructions[-3:]),
+                         'RZ(-0.743043) 3\nCNOT 1 3\nMEASURE 3 [3]\n')
+
+    def test_route(self):
+        routed, n_swaps = route(parse_quil(PROGRAM), self.hardware)
+        # 0 travels to 2 to meet 3, pushing qubit 1 back to 0, which
+        # then travels to 2 in turn
+        self.assertEqual(n_swaps, 4)
+        self.assertEqual(routed[2:4], [('SWAP', '', (0, 1)),
+                                       ('SWAP', '', (1, 2))])
+        self.assertEqual(routed[4], ('CNOT', '', (2, 3)))
+        self.assertEqual(routed[6:9], [('SWAP', '', (0, 1)),
+                                       ('SWAP', '', (1, 2)),
+                                       ('CNOT', '', (2, 3))])
+        self.assertEqual(routed[9], ('MEASURE', ' [3]', (3,)))
+        for name, _, qubits in routed:
+            if len(qubits) == 2:
+                self.assertEqual(abs(qubits[0] - qubits[1]), 1)
+
+    def test_route_layout(self):
+        routed, n_swaps, layout = route(parse_quil(PROGRAM), self.hardware,
+                                        occupied=[2], return_layout=True)
+        self.assertEqual(n_swaps, 4)
+        # the state of qubit 2 is pushed back to 0 by qubits 0 and 1
+        self.assertEqual(layout, {0: 1, 1: 2, 2: 0, 3: 3})
+
+    def test_job_statistics(self):
+        compiler = LocalCompiler(self.hardware)
+        job = compiler.wait_for_job(compiler.compile_async(PROGRAM))
+        self.assertEqual(job.topological_swaps(), 4)
+        self.assertEqual(job.gate_volume(), 5 + 4 * 3)
+        self.assertEqual(job.multiqubit_gate_depth(), 14)
+        self.assertEqual(job.gate_depth(), 15)
+        self.assertAlmostEqual(job.program_fidelity(),
+                               0.99 ** 2 * 0.9 ** 15 * 0.95)
+        self.assertTrue(job.compiled_quil().startswith('H 0\nCRY(4.0) 0 1\n'))
+
+    def test_unknown_qubit(self):
+        with self.assertRaises(ValueError):
+            LocalCompiler(self.hardware).compile('H 7\n')
+
+    def test_disconnected_qubits(self):
+        hardware = build_line()
+        hardware.adjacency_list = [(0, 1), (2, 3), (3, 4)]
+        with self.assertRaises(ValueError):
+            LocalCompiler(hardware).compile('CNOT 0 4\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+""" Quil text of the quantum neuron circuit of qneuron
+
+The neuron of a qubit layout is written once, with the six gate angles
+left as format fields; binding a weight/bias pair only formats the
+angles into the text. This module builds text only, so it does not need
+pyquil; qneuron adds the gate definitions and turns the text into
+Programs.
+"""
+from __future__ import absolute_import
+
+import numpy
+
+# Angles of the neuron gates as linear combinations of (w0, w1, beta),
+# with the Quil expression of each one in a parametric program
+NEURON_ANGLES = (('4*%w0', (4., 0., 0.)),
+                 ('4*%w1', (0., 4., 0.)),
+                 ('%beta', (0., 0., 1.)),
+                 ('-%beta', (0., 0., -1.)),
+                 ('-4*%w1', (0., -4., 0.)),
+                 ('-4*%w0', (-4., 0., 0.)))
+
+
+class NeuronTemplate(object):
+    """ Quil text of the quantum neuron circuit for a fixed qubit layout
+
+    Attributes:
+        qubits (list):
+            Inputs, training, ancilla and output qubits
+        text (string):
+            Quil text with the fields {0} to {5} of NEURON_ANGLES
+        coefficients (numpy.ndarray):
+            (3, 6) angles of the gates per unit of w0, w1 and beta
+    """
+
+    def __init__(self, inputs, training, ancilla, output, measure=False,
+                 header=''):
+        """
+        Args:
+            inputs (list): the two input qubits
+            training (integer): training qubit
+            ancilla (list): the three ancilla qubits
+            output (integer): output qubit
+            measure (bool): append a measurement of every qubit
+            header (string): Quil text put before the gates, e.g. the
+                definitions of the CRY, C-MINUS-IY and C-IY gates
+        """
+        i0, i1 = inputs
+        a0, a1, a2 = ancilla
+
+        # {0}..{5} index NEURON_ANGLES
+        def doublery(a):
+            return ['CRY({{0}}) {0} {1}'.format(i0, a),
+                    'CRY({{1}}) {0} {1}'.format(i1, a),
+                    'RY({{2}}) {0}'.format(a)]
+
+        def doubleryinv(a):
+            return ['RY({{3}}) {0}'.format(a),
+                    'CRY({{4}}) {0} {1}'.format(i1, a),
+                    'CRY({{5}}) {0} {1}'.format(i0, a)]
+        lines = ['H {0}'.format(i0), 'H {0}'.format(i1),
+                 'CNOT {0} {1}'.format(i0, training),
+                 'CNOT {0} {1}'.format(i1, training)]
+        lines += doublery(a0) + ['C-MINUS-IY {0} {1}'.format(a0, a2)] + \
+            doubleryinv(a0)
+        lines += ['C-MINUS-IY {0} {1}'.format(a2, output)]
+        lines += doubleryinv(a1) + ['C-IY {0} {1}'.format(a1, a2)] + \
+            doublery(a1)
+        self.qubits = list(inputs) + [training] + list(ancilla) + [output]
+        if measure:
+            lines += ['MEASURE {0} [{0}]'.format(q) for q in self.qubits]
+        header = header.replace('{', '{{').replace('}', '}}')
+        self.text = header + '\n'.join(lines) + '\n'
+        self.coefficients = numpy.array([c for _, c in NEURON_ANGLES]).T
+
+    def parameter_table(self, weights, biases):
+        """
+        Returns the (N, 4) parameters w0, w1, b and beta of N neurons
+
+        Args:
+            weights (numpy.ndarray): (N, 2) weights
+            biases (numpy.ndarray): (N,) biases
+        """
+        weights = numpy.atleast_2d(numpy.asarray(weights, dtype=float))
+        biases = numpy.atleast_1d(numpy.asarray(biases, dtype=float))
+        beta = numpy.pi / 4. + biases - weights[:, 0] - weights[:, 1]
+        return numpy.column_stack([weights[:, 0], weights[:, 1], biases,
+                                   beta])
+
+    def angles(self, table):
+        """Returns the (N, 6) gate angles of a parameter table"""
+        return numpy.asarray(table)[:, [0, 1, 3]].dot(self.coefficients)
+
+    def bind_text(self, w, b):
+        """Returns the Quil text of the neuron for a weight/bias pair"""
+        return self.text.format(*self.angles(
+            self.parameter_table([w], [b]))[0].tolist())
+
+    def bind_many_text(self, weights, biases):
+        """
+        Returns the Quil texts of many weight/bias pairs
+
+        Args:
+            weights (numpy.ndarray): (N, 2) weights
+            biases (numpy.ndarray): (N,) biases
+        """
+        angles = self.angles(self.parameter_table(weights, biases))
+        return [self.text.format(*row) for row in angles.tolist()]
+
+    def parametric_text(self):
+        """
+        Returns the Quil text of the neuron with the symbolic parameters
+        %w0, %w1 and %beta, to be paired with parameter_table
+        """
+        return self.text.format(*[e for e, _ in NEURON_ANGLES])
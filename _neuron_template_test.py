@@ -0,0 +1,104 @@
+"""Tests for _neuron_template.py."""
+import re
+import unittest
+
+import numpy
+
+from _neuron_template import NEURON_ANGLES, NeuronTemplate
+
+
+def baseline_neuron(w, b, inputs, training, ancilla, output):
+    """ Gates of the neuron in the order of the original make_neuron, as
+    (name, angle, qubits)"""
+    beta = numpy.pi / 4. + b - w[0] - w[1]
+
+    def doublery(q0, q1, q2):
+        return [('CRY', 4 * w[0], (q0, q2)), ('CRY', 4 * w[1], (q1, q2)),
+                ('RY', beta, (q2,))]
+
+    def doubleryinv(q0, q1, q2):
+        return [('RY', -beta, (q2,)), ('CRY', -4 * w[1], (q1, q2)),
+                ('CRY', -4 * w[0], (q0, q2))]
+    gates = [('H', None, (inputs[0],)), ('H', None, (inputs[1],)),
+             ('CNOT', None, (inputs[0], training)),
+             ('CNOT', None, (inputs[1], training))]
+    gates += doublery(inputs[0], inputs[1], ancilla[0])
+    gates += [('C-MINUS-IY', None, (ancilla[0], ancilla[2]))]
+    gates += doubleryinv(inputs[0], inputs[1], ancilla[0])
+    gates += [('C-MINUS-IY', None, (ancilla[2], output))]
+    gates += doubleryinv(inputs[0], inputs[1], ancilla[1])
+    gates += [('C-IY', None, (ancilla[1], ancilla[2]))]
+    gates += doublery(inputs[0], inputs[1], ancilla[1])
+    return gates
+
+
+def parse_gates(text):
+    """Returns the (name, angle, qubits) of the gate lines of Quil text"""
+    gates = []
+    for line in text.splitlines():
+        match = re.match(r'^([A-Z-]+)(?:\((.*)\))? ([\d ]+)$', line)
+        if match is None:
+            continue
+        name, angle, qubits = match.groups()
+        gates.append((name, None if angle is None else float(angle),
+                      tuple(int(q) for q in qubits.split())))
+    return gates
+
+
+class NeuronTemplateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.layout = ([0, 1], 2, [4, 5, 6], 7)
+        self.template = NeuronTemplate(*self.layout)
+
+    def assertSameGates(self, gates, expected):
+        self.assertEqual([(n, q) for n, _, q in gates],
+                         [(n, q) for n, _, q in expected])
+        for (_, angle, _), (_, expected_angle, _) in zip(gates, expected):
+            if expected_angle is None:
+                self.assertIsNone(angle)
+            else:
+                self.assertAlmostEqual(angle, expected_angle, places=12)
+
+    def test_matches_baseline(self):
+        for w, b in [([0, 1], numpy.pi / 3.), ([0.25, -0.7], 0.1)]:
+            self.assertSameGates(parse_gates(self.template.bind_text(w, b)),
+                                 baseline_neuron(w, b, *self.layout))
+
+    def test_bind_many(self):
+        weights = [[0, 1], [0.25, -0.7], [1.5, 0.]]
+        biases = [numpy.pi / 3., 0.1, -0.2]
+        self.assertEqual(self.template.bind_many_text(weights, biases),
+                         [self.template.bind_text(w, b)
+                          for w, b in zip(weights, biases)])
+
+    def test_parameter_table(self):
+        table = self.template.parameter_table([[0.25, -0.7]], [0.1])
+        numpy.testing.assert_allclose(
+            table, [[0.25, -0.7, 0.1, numpy.pi / 4. + 0.1 - 0.25 + 0.7]])
+        numpy.testing.assert_allclose(
+            self.template.angles(table)[0],
+            [1., -2.8, table[0, 3], -table[0, 3], 2.8, -1.])
+
+    def test_parametric_text(self):
+        text = self.template.parametric_text()
+        expressions = [line.split('(')[1].split(')')[0]
+                       for line in text.splitlines() if '(' in line]
+        self.assertEqual(expressions,
+                         [e for e, _ in NEURON_ANGLES] +
+                         [e for e, _ in NEURON_ANGLES[3:]] +
+                         [e for e, _ in NEURON_ANGLES[:3]])
+
+    def test_header_and_measure(self):
+        header = 'DEFGATE CRY(%theta):\n    {not a field}\n\n'
+        template = NeuronTemplate(*self.layout, measure=True, header=header)
+        text = template.bind_text([0, 1], 0.)
+        self.assertTrue(text.startswith(header))
+        self.assertEqual(text.splitlines()[-7:],
+                         ['MEASURE {0} [{0}]'.format(q)
+                          for q in [0, 1, 2, 4, 5, 6, 7]])
+        self.assertEqual(template.qubits, [0, 1, 2, 4, 5, 6, 7])
+
+
+if __name__ == '__main__':
+    unittest.main()
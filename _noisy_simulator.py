@@ -0,0 +1,271 @@
+""" Monte-Carlo trajectory simulation of circuits mapped on hardware
+
+A circuit whose logical qubit i is placed on the physical qubit
+mapping[i] is simulated with the error rates of the HardwareGraph:
+
+- after every single qubit gate a random Pauli error hits the qubit
+  with probability 3/2 (1 - f1QRB), the depolarizing channel whose
+  average gate fidelity is f1QRB;
+- after every two-qubit gate a random non-identity two-qubit Pauli
+  error hits the pair with probability 5/4 (1 - f2CZ);
+- every measured bit is flipped with probability 1 - f1RO.
+
+All the trajectories are evolved together as a (T, 2^n) statevector
+array, only the qubits of the circuit being simulated. Chunks of
+trajectories can be spread over a process pool. Gate durations and
+decoherence are not modelled.
+"""
+from __future__ import absolute_import
+
+import concurrent.futures
+import io
+
+import numpy
+
+from _abstract_circuit import AbstractCircuit
+from _gates import apply_unitary
+from _simulator import PAULIS, CompiledCircuit, SimulatorError
+
+# I, X, Y and Z; 1-3 index the single qubit errors
+PAULI_STACK = numpy.array([PAULIS[p] for p in 'IXYZ'])
+
+
+def gate_error_rates(hardware, compiled, mapping):
+    """
+    Returns the Pauli error probability of every operation of a
+    compiled circuit placed on hardware
+
+    Args:
+        hardware (HardwareGraph): device and its fidelities
+        compiled (CompiledCircuit): compiled circuit
+        mapping (list): physical qubit of every logical qubit
+
+    Returns:
+        errors (numpy.ndarray): (n_operations,) error probabilities
+    """
+    single = hardware.fidelity_list['single_qubit']['f1QRB']
+    double = hardware.fidelity_list['two-qubit']['f2CZ']
+    errors = numpy.empty(len(compiled.operations))
+    for n, (_, targets, _, _) in enumerate(compiled.operations):
+        qubits = [mapping[t] for t in targets]
+        if len(qubits) == 1:
+            fidelity = single[hardware.qubit_index(qubits[0])]
+            errors[n] = 1.5 * (1. - fidelity)
+        elif len(qubits) == 2:
+            edge = hardware.edge_index(qubits[0], qubits[1])
+            if edge is None:
+                raise SimulatorError('Qubits {0} and {1} are not coupled'
+                                     .format(qubits[0], qubits[1]))
+            errors[n] = 1.25 * (1. - double[edge])
+        else:
+            raise SimulatorError('No error model for {0}-qubit gates'
+                                 .format(len(qubits)))
+    return numpy.clip(errors, 0., 1.)
+
+
+def readout_error_rates(hardware, mapping):
+    """Returns the bit flip probability of every logical qubit"""
+    readout = hardware.fidelity_list['single_qubit']['f1RO']
+    return numpy.clip([1. - readout[hardware.qubit_index(q)]
+                       for q in mapping], 0., 1.)
+
+
+def apply_readout_errors(probabilities, flips):
+    """
+    Returns the distribution of measured bit strings
+
+    Args:
+        probabilities (numpy.ndarray): (2^n,) distribution of the basis
+            states
+        flips (numpy.ndarray): (n,) bit flip probability of every qubit
+    """
+    n_qubits = len(flips)
+    probabilities = probabilities.reshape((2,) * n_qubits)
+    for qubit, flip in enumerate(flips):
+        confusion = numpy.array([[1. - flip, flip], [flip, 1. - flip]])
+        probabilities = numpy.moveaxis(
+            numpy.tensordot(confusion, probabilities, axes=([1], [qubit])),
+            0, qubit)
+    return probabilities.ravel()
+
+
+class NoisySimulator(object):
+    """ Trajectory simulator of a circuit placed on hardware qubits
+
+    Attributes:
+        compiled (CompiledCircuit):
+            Compiled circuit
+        errors (numpy.ndarray):
+            Pauli error probability of every operation of the block
+        flips (numpy.ndarray):
+            Readout bit flip probability of every logical qubit
+        ideal (numpy.ndarray):
+            Noiseless output statevector
+    """
+
+    def __init__(self, hardware, circuit, mapping, variables=None,
+                 constants=None):
+        """
+        Args:
+            hardware (HardwareGraph): device and its fidelities
+            circuit (AbstractCircuit): circuit on logical qubits
+            mapping (list): physical qubit of every logical qubit
+            variables (numpy.ndarray, optional): variational parameters,
+                defaults to zeros
+            constants (numpy.ndarray, optional): constant parameters,
+                defaults to zeros
+        """
+        if len(mapping) != circuit.n_qubits:
+            raise SimulatorError('The mapping must place every qubit')
+        if len(set(mapping)) != len(mapping):
+            raise SimulatorError('The mapping places two qubits together')
+        self.compiled = CompiledCircuit(circuit)
+        self.n_qubits = circuit.n_qubits
+        if variables is None:
+            variables = numpy.zeros(self.compiled.n_variables)
+        self.slots = self.compiled.slot_parameters(variables, constants)
+        self.errors = gate_error_rates(hardware, self.compiled, mapping)
+        self.flips = readout_error_rates(hardware, mapping)
+        self.ideal = self.compiled.run_slots(self.slots)[0]
+
+    def _inject_errors(self, state, error, targets, random):
+        """Applies random Pauli errors to some trajectories"""
+        hit = numpy.flatnonzero(random.random_sample(len(state)) < error)
+        if len(hit) == 0:
+            return state
+        if not state.flags.writeable:
+            state = state.copy()
+        if len(targets) == 1:
+            paulis = random.randint(1, 4, (len(hit), 1))
+        else:
+            codes = random.randint(1, 16, len(hit))
+            paulis = numpy.stack([codes // 4, codes % 4], axis=1)
+        for column, target in enumerate(targets):
+            state[hit] = apply_unitary(state[hit],
+                                       PAULI_STACK[paulis[:, column]],
+                                       target, self.n_qubits)
+        return state
+
+    def run(self, n_trajectories, seed=None):
+        """
+        Evolve a batch of noisy trajectories
+
+        Args:
+            n_trajectories (integer): number of trajectories
+            seed (integer, optional): seed of the random errors
+
+        Returns:
+            fidelities (numpy.ndarray): (T,) overlap of every trajectory
+                with the ideal output
+            probabilities (numpy.ndarray): (2^n,) sum over trajectories
+                of the basis state probabilities, before readout
+        """
+        random = numpy.random.RandomState(seed)
+        compiled = self.compiled
+        state = compiled.initial_state(n_trajectories)
+        for block in range(compiled.n_blocks):
+            offset = block * compiled.block_slots
+            for (kernel, targets, start, stop), error in \
+                    zip(compiled.operations, self.errors):
+                state = kernel(state, self.slots[:, offset + start:
+                                                 offset + stop],
+                               targets, self.n_qubits)
+                if error > 0.:
+                    state = self._inject_errors(state, error, targets,
+                                                random)
+        fidelities = numpy.abs(state.dot(self.ideal.conj())) ** 2
+        probabilities = (numpy.abs(state) ** 2).sum(axis=0)
+        return fidelities, probabilities
+
+    def summarize(self, fidelities, probabilities):
+        """
+        Returns the fidelity estimates of a set of trajectories
+
+        Args:
+            fidelities (numpy.ndarray): overlaps returned by run
+            probabilities (numpy.ndarray): summed probabilities returned
+                by run
+
+        Returns:
+            result (dict):
+                fidelity: classical fidelity of the measured bit string
+                    distribution, readout errors included, with the
+                    ideal one
+                state_fidelity: mean overlap of the trajectories with the
+                    ideal output state
+                state_fidelity_error: standard error of state_fidelity
+                n_trajectories: number of trajectories
+        """
+        n_trajectories = len(fidelities)
+        measured = apply_readout_errors(probabilities / n_trajectories,
+                                        self.flips)
+        ideal = numpy.abs(self.ideal) ** 2
+        error = 0.
+        if n_trajectories > 1:
+            error = fidelities.std(ddof=1) / numpy.sqrt(n_trajectories)
+        return {
+            'fidelity': float(numpy.sum(numpy.sqrt(measured * ideal)) ** 2),
+            'state_fidelity': float(fidelities.mean()),
+            'state_fidelity_error': float(error),
+            'n_trajectories': n_trajectories
+        }
+
+
+def _run_chunk(circuit_bytes, hardware, mapping, variables, constants,
+               n_trajectories, seed):
+    """Runs a chunk of trajectories in a worker process"""
+    circuit = AbstractCircuit.load(io.BytesIO(circuit_bytes))
+    simulator = NoisySimulator(hardware, circuit, mapping, variables,
+                               constants)
+    return simulator.run(n_trajectories, seed)
+
+
+def estimate_fidelity(hardware, circuit, mapping, variables=None,
+                      constants=None, n_trajectories=1000, seed=None,
+                      n_workers=None, chunk_size=None):
+    """
+    Estimate the output fidelity of a circuit placed on hardware qubits
+
+    Args:
+        hardware (HardwareGraph): device and its fidelities
+        circuit (AbstractCircuit): circuit on logical qubits
+        mapping (list): physical qubit of every logical qubit
+        variables (numpy.ndarray, optional): variational parameters
+        constants (numpy.ndarray, optional): constant parameters
+        n_trajectories (integer): number of trajectories
+        seed (integer, optional): seed of the random errors
+        n_workers (integer, optional): number of worker processes. By
+            default all the trajectories run in this process.
+        chunk_size (integer, optional): maximum number of trajectories
+            evolved at once, bounding the (chunk_size, 2^n) array
+
+    Returns:
+        result (dict): see NoisySimulator.summarize
+    """
+    simulator = NoisySimulator(hardware, circuit, mapping, variables,
+                               constants)
+    if chunk_size is None:
+        chunk_size = n_trajectories
+        if n_workers:
+            chunk_size = -(-n_trajectories // n_workers)
+    chunk_size = max(chunk_size, 1)
+    sizes = [min(chunk_size, n_trajectories - start)
+             for start in range(0, n_trajectories, chunk_size)]
+    seeds = numpy.random.SeedSequence(seed).generate_state(len(sizes))
+
+    if n_workers:
+        stream = io.BytesIO()
+        circuit.save(stream)
+        with concurrent.futures.ProcessPoolExecutor(n_workers) as pool:
+            futures = [pool.submit(_run_chunk, stream.getvalue(), hardware,
+                                   list(mapping), variables, constants,
+                                   size, int(chunk_seed))
+                       for size, chunk_seed in zip(sizes, seeds)]
+            results = [future.result() for future in futures]
+    else:
+        results = [simulator.run(size, int(chunk_seed))
+                   for size, chunk_seed in zip(sizes, seeds)]
+
+    fidelities = numpy.concatenate([r[0] for r in results])
+    probabilities = numpy.sum([r[1] for r in results], axis=0)
+    return simulator.summarize(fidelities, probabilities)
@@ -0,0 +1,101 @@
+"""Tests for _noisy_simulator.py."""
+import unittest
+
+import numpy
+
+from _abstract_circuit import AbstractCircuit
+from _abstract_gate import AbstractGate
+from _noisy_simulator import (NoisySimulator,
+                              apply_readout_errors,
+                              estimate_fidelity)
+from _simulator import SimulatorError
+from hardwaregraph import HardwareGraph
+
+
+def build_hardware(f1QRB=0.99, f1RO=0.95, f2CZ=0.9):
+    """ Square of four qubits labelled 0, 2, 5 and 7"""
+    fidelity_list = {
+        'single_qubit': {'f1QRB': [f1QRB] * 4, 'f1RO': [f1RO] * 4},
+        'two-qubit': {'f2CZ': [f2CZ] * 4, 'f2CPHASE': [1.] * 4}
+    }
+    return HardwareGraph([0, 2, 5, 7], [(0, 2), (2, 5), (5, 7), (7, 0)],
+                         fidelity_list)
+
+
+def build_bell_circuit():
+    circuit = AbstractCircuit(3)
+    circuit.add_gate_as_layer(AbstractGate('H', 1), [0])
+    circuit.add_gate_as_layer(AbstractGate('CNOT', 2), [0, 1])
+    circuit.add_gate_as_layer(AbstractGate('CNOT', 2), [1, 2])
+    circuit.add_gate_as_layer(AbstractGate('RZ', 1, 10.0, 1, False), [2])
+    return circuit
+
+
+class NoisySimulatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.circuit = build_bell_circuit()
+        self.constants = [-0.743043]
+
+    def test_error_rates(self):
+        simulator = NoisySimulator(build_hardware(), self.circuit, [7, 0, 2],
+                                   constants=self.constants)
+        numpy.testing.assert_allclose(simulator.errors,
+                                      [0.015, 0.125, 0.125, 0.015])
+        numpy.testing.assert_allclose(simulator.flips, [0.05] * 3)
+
+    def test_uncoupled_qubits(self):
+        with self.assertRaises(SimulatorError):
+            NoisySimulator(build_hardware(), self.circuit, [0, 2, 7])
+
+    def test_noiseless(self):
+        hardware = build_hardware(1., 1., 1.)
+        result = estimate_fidelity(hardware, self.circuit, [0, 2, 5],
+                                   constants=self.constants,
+                                   n_trajectories=20, seed=1)
+        self.assertAlmostEqual(result['fidelity'], 1.)
+        self.assertAlmostEqual(result['state_fidelity'], 1.)
+        self.assertEqual(result['n_trajectories'], 20)
+
+    def test_depolarizing_estimate(self):
+        hardware = build_hardware(0.99, 1., 0.9)
+        result = estimate_fidelity(hardware, self.circuit, [0, 2, 5],
+                                   constants=self.constants,
+                                   n_trajectories=4000, seed=3,
+                                   chunk_size=1000)
+        # single qubit errors make the output orthogonal to the GHZ
+        # state, as do most two-qubit errors (ZZ leaves it intact)
+        no_error = 0.985 ** 2 * 0.875 ** 2
+        self.assertGreater(result['state_fidelity'], no_error - 0.02)
+        self.assertLess(result['state_fidelity'], no_error + 0.06)
+        self.assertLess(result['state_fidelity'], result['fidelity'])
+
+    def test_seeded_runs_repeat(self):
+        hardware = build_hardware()
+        first = estimate_fidelity(hardware, self.circuit, [0, 2, 5],
+                                  constants=self.constants,
+                                  n_trajectories=50, seed=7)
+        second = estimate_fidelity(hardware, self.circuit, [0, 2, 5],
+                                   constants=self.constants,
+                                   n_trajectories=50, seed=7)
+        self.assertEqual(first, second)
+
+    def test_process_pool(self):
+        hardware = build_hardware()
+        result = estimate_fidelity(hardware, self.circuit, [0, 2, 5],
+                                   constants=self.constants,
+                                   n_trajectories=40, seed=7, n_workers=2)
+        self.assertEqual(result['n_trajectories'], 40)
+        self.assertTrue(0. < result['fidelity'] <= 1.)
+
+    def test_readout_errors(self):
+        probabilities = numpy.zeros(4)
+        probabilities[0b10] = 1.
+        measured = apply_readout_errors(probabilities, [0.1, 0.2])
+        numpy.testing.assert_allclose(measured,
+                                      [0.1 * 0.8, 0.1 * 0.2, 0.9 * 0.8,
+                                       0.9 * 0.2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,251 @@
+""" Constructive initial placements of a circuit on a device
+
+The interactions of a circuit are summarized by the weight matrix of
+its InteractionGraph, w[i, j] counting the two-qubit gates between the
+logical qubits i and j. The cost of a mapping adds, for every pair, its
+weight times the cost of the cheapest path between the two physical
+qubits (minus the log of the two-qubit fidelities along the path), and
+for every qubit minus the log of its single qubit fidelities:
+
+- greedy_placement puts the most connected logical qubit on the most
+  reliable, best connected physical qubit, then places in turn the
+  logical qubit interacting most with the placed ones where it adds the
+  least cost;
+- spectral_placement orders the logical and physical qubits by the
+  Fiedler vectors of the Laplacians of the two graphs and keeps the
+  cheapest alignment of the two orders.
+
+Both return a mapping list, to be used as the initial guess of an
+annealing. move_delta gives the change of cost of the moves of _tabu.
+"""
+from __future__ import absolute_import
+
+import numpy
+
+from _interaction_graph import InteractionGraph
+from _local_compiler import parse_quil
+
+
+def program_interactions(text, qubits=None):
+    """
+    Returns the interaction weights of a Quil program
+
+    Args:
+        text (string): Quil text
+        qubits (list, optional): order of the logical qubits, sorted
+            labels by default
+
+    Returns:
+        qubits (list): labels of the logical qubits
+        weights (numpy.ndarray): (n, n) number of gates between every
+            pair of logical qubits
+    """
+    instructions = parse_quil(text)
+    if qubits is None:
+        qubits = sorted(set(q for _, _, qs in instructions for q in qs))
+    index = dict((q, i) for i, q in enumerate(qubits))
+    graph = InteractionGraph(len(qubits))
+    targets = [[index[q] for q in qs] for _, _, qs in instructions
+               if len(qs) == 2]
+    if targets:
+        graph.add_gates(numpy.array(targets), 1.)
+    return list(qubits), graph.adjacency_matrix()
+
+
+def qubit_costs(hardware):
+    """Returns minus the log of the single qubit fidelities of every
+    qubit of qubit_list"""
+    cost = numpy.zeros(hardware.nqubits)
+    for values in hardware.fidelity_list['single_qubit'].values():
+        cost -= numpy.log(numpy.clip(numpy.asarray(values, dtype=float),
+                                     1e-12, 1.))
+    return cost
+
+
+def path_costs(hardware):
+    """
+    Returns the (n, n) cost of the cheapest path between every pair of
+    qubits, indexed by position in qubit_list, the cost of a coupling
+    being minus the log of its f2CZ fidelity
+    """
+    n = hardware.nqubits
+    costs = numpy.full((n, n), numpy.inf)
+    numpy.fill_diagonal(costs, 0.)
+    fidelities = hardware.fidelity_list['two-qubit']['f2CZ']
+    for (u, v), f in zip(hardware.adjacency_list, fidelities):
+        i, j = hardware.qubit_index(u), hardware.qubit_index(v)
+        costs[i, j] = costs[j, i] = min(costs[i, j],
+                                        -numpy.log(max(f, 1e-12)))
+    # Floyd-Warshall
+    for k in range(n):
+        costs = numpy.minimum(costs, costs[:, k, None] + costs[None, k, :])
+    return costs
+
+
+def interaction_cost(weights, costs):
+    """Returns the sum of the weights times the path costs. Pairs without
+    interaction cost nothing, even between disconnected qubits whose
+    path cost is infinite."""
+    weights = numpy.asarray(weights, dtype=float)
+    return float(numpy.sum(weights * numpy.where(weights > 0, costs, 0.)))
+
+
+def placement_cost(hardware, weights, mapping):
+    """Returns the estimated cost of a mapping, lower is better. It is
+    infinite when interacting qubits are placed on disconnected parts of
+    the hardware."""
+    indexes = numpy.array([hardware.qubit_index(q) for q in mapping])
+    costs = path_costs(hardware)[numpy.ix_(indexes, indexes)]
+    interactions = interaction_cost(numpy.triu(weights, 1), costs)
+    return float(interactions + qubit_costs(hardware)[indexes].sum())
+
+
+def move_delta(hardware, weights):
+    """
+    Returns the incremental cost model of the moves of _tabu
+
+    Args:
+        hardware (HardwareGraph): device
+        weights (numpy.ndarray): (n, n) interaction weights
+
+    Returns:
+        delta (callable): delta(mapping, move) is the change of
+            placement_cost caused by a move, computed in O(n), 0 between
+            two infinite costs
+    """
+    weights = numpy.asarray(weights, dtype=float)
+    costs = path_costs(hardware)
+    single = qubit_costs(hardware)
+
+    def change(before, after):
+        return after - before if after != before else 0.
+
+    def delta(mapping, move):
+        indexes = numpy.array([hardware.qubit_index(q) for q in mapping])
+        if move[0] == 'swap':
+            _, i, j = move
+            others = numpy.array([k for k in range(len(mapping))
+                                  if k != i and k != j], dtype=int)
+            a, b = indexes[i], indexes[j]
+            o = indexes[others]
+            # the cost of the pair (i, j) itself does not change
+            return change(
+                interaction_cost(weights[i, others], costs[a, o]) +
+                interaction_cost(weights[j, others], costs[b, o]),
+                interaction_cost(weights[i, others], costs[b, o]) +
+                interaction_cost(weights[j, others], costs[a, o]))
+        _, i, p = move
+        others = numpy.array([k for k in range(len(mapping)) if k != i],
+                             dtype=int)
+        a, b = indexes[i], hardware.qubit_index(p)
+        o = indexes[others]
+        return change(
+            interaction_cost(weights[i, others], costs[a, o]) + single[a],
+            interaction_cost(weights[i, others], costs[b, o]) + single[b])
+    return delta
+
+
+def greedy_placement(hardware, weights):
+    """
+    Greedy placement of the logical qubits
+
+    Args:
+        hardware (HardwareGraph): device
+        weights (numpy.ndarray): (n, n) interaction weights
+
+    Returns:
+        mapping (list): physical qubit of every logical qubit, all in one
+            connected part of the hardware when one is large enough
+    """
+    weights = numpy.asarray(weights, dtype=float)
+    n = len(weights)
+    if n > hardware.nqubits:
+        raise ValueError('The hardware has too few qubits')
+    costs = path_costs(hardware)
+    single = qubit_costs(hardware)
+    # size of the connected part of every physical qubit
+    sizes = numpy.isfinite(costs).sum(axis=1)
+    # reliability of the couplings of every physical qubit
+    connectivity = numpy.zeros(hardware.nqubits)
+    for (u, v), f in zip(hardware.adjacency_list,
+                         hardware.fidelity_list['two-qubit']['f2CZ']):
+        connectivity[hardware.qubit_index(u)] += f
+        connectivity[hardware.qubit_index(v)] += f
+    degrees = weights.sum(axis=1)
+
+    position = {}
+    free = set(range(hardware.nqubits))
+    while len(position) < n:
+        unplaced = [i for i in range(n) if i not in position]
+        placed = sorted(position)
+        # the logical qubit most tied to the placed ones
+        i = max(unplaced, key=lambda i: (weights[i, placed].sum(),
+                                         degrees[i], -i))
+        if not placed:
+            candidates = [p for p in free if sizes[p] >= n] or free
+            scores = dict((p, (-connectivity[p] * numpy.exp(-single[p]),
+                               p)) for p in candidates)
+        else:
+            partners = [position[j] for j in placed]
+            # stay in the connected part of the placed qubits
+            candidates = [p for p in free
+                          if numpy.isfinite(costs[p, partners[0]])] or free
+            scores = dict((p, (interaction_cost(weights[i, placed],
+                                                costs[p, partners]) +
+                               single[p], costs[p, partners].min(), p))
+                          for p in candidates)
+        p = min(candidates, key=lambda p: scores[p])
+        position[i] = p
+        free.discard(p)
+    return [int(hardware.qubit_list[position[i]]) for i in range(n)]
+
+
+def fiedler_vector(weights):
+    """Returns the eigenvector of the second smallest eigenvalue of the
+    Laplacian of a weight matrix"""
+    weights = numpy.asarray(weights, dtype=float)
+    laplacian = numpy.diag(weights.sum(axis=1)) - weights
+    _, vectors = numpy.linalg.eigh(laplacian)
+    if len(weights) < 2:
+        return numpy.zeros(len(weights))
+    return vectors[:, 1]
+
+
+def spectral_placement(hardware, weights):
+    """
+    Spectral placement of the logical qubits
+
+    Args:
+        hardware (HardwareGraph): device
+        weights (numpy.ndarray): (n, n) interaction weights
+
+    Returns:
+        mapping (list): physical qubit of every logical qubit, the
+            greedy placement when every window has an infinite cost
+    """
+    weights = numpy.asarray(weights, dtype=float)
+    n = len(weights)
+    if n > hardware.nqubits:
+        raise ValueError('The hardware has too few qubits')
+    couplings = numpy.zeros((hardware.nqubits, hardware.nqubits))
+    for (u, v), f in zip(hardware.adjacency_list,
+                         hardware.fidelity_list['two-qubit']['f2CZ']):
+        i, j = hardware.qubit_index(u), hardware.qubit_index(v)
+        couplings[i, j] = couplings[j, i] = f
+    logical = numpy.argsort(fiedler_vector(weights), kind='stable')
+    physical = numpy.argsort(fiedler_vector(couplings), kind='stable')
+
+    best = None
+    # eigenvectors are defined up to their sign, so both directions of
+    # the physical order are tried, with every window of n qubits
+    for order in (physical, physical[::-1]):
+        for start in range(hardware.nqubits - n + 1):
+            mapping = [None] * n
+            for i, p in zip(logical, order[start:start + n]):
+                mapping[i] = int(hardware.qubit_list[p])
+            cost = placement_cost(hardware, weights, mapping)
+            if numpy.isfinite(cost) and (best is None or cost < best[0]):
+                best = (cost, mapping)
+    if best is None:
+        return greedy_placement(hardware, weights)
+    return best[1]
@@ -0,0 +1,110 @@
+"""Tests for _placement.py."""
+import itertools
+import math
+import random
+import unittest
+
+import numpy
+
+from _coplacement_test import build_grid
+from hardwaregraph_test import build_graph
+from _placement import (fiedler_vector,
+                        greedy_placement,
+                        move_delta,
+                        path_costs,
+                        placement_cost,
+                        program_interactions,
+                        spectral_placement)
+
+# a chain of five qubits, the first pair interacting twice
+PROGRAM = 'CNOT 0 1\nCNOT 1 2\nCNOT 2 3\nCNOT 0 1\nCNOT 3 4\nH 4\n'
+
+
+class PlacementTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hardware = build_grid(bad_edges=[(1, 2), (5, 6)])
+        self.qubits, self.weights = program_interactions(PROGRAM)
+        # five couplings of fidelity 0.9 and five qubits
+        self.best = -5 * math.log(0.9) - 5 * math.log(0.99 * 0.95)
+
+    def test_program_interactions(self):
+        self.assertEqual(self.qubits, [0, 1, 2, 3, 4])
+        self.assertEqual(self.weights[0, 1], 2)
+        self.assertEqual(self.weights[1, 0], 2)
+        self.assertEqual(self.weights.sum(), 2 * 5)
+        qubits, weights = program_interactions('CNOT 7 3\n', [3, 7])
+        self.assertEqual(qubits, [3, 7])
+        numpy.testing.assert_array_equal(weights, [[0, 1], [1, 0]])
+
+    def test_path_costs(self):
+        costs = path_costs(self.hardware)
+        self.assertAlmostEqual(costs[0, 1], -math.log(0.9))
+        # around the poor couplings (1, 2) and (5, 6), by 9 and 10
+        self.assertAlmostEqual(costs[1, 2], -5 * math.log(0.9))
+        self.assertEqual(costs[3, 3], 0.)
+
+    def test_placement_cost(self):
+        self.assertAlmostEqual(
+            placement_cost(self.hardware, self.weights, [4, 0, 1, 5, 9]),
+            self.best)
+        self.assertAlmostEqual(
+            placement_cost(self.hardware, self.weights, [0, 1, 2, 3, 7]),
+            # the detour around (1, 2) costs four more couplings
+            self.best - 4 * math.log(0.9))
+
+    def check_mapping(self, mapping):
+        self.assertEqual(len(mapping), 5)
+        self.assertEqual(len(set(mapping)), 5)
+        self.assertTrue(set(mapping) <= set(range(12)))
+
+    def test_greedy(self):
+        mapping = greedy_placement(self.hardware, self.weights)
+        self.check_mapping(mapping)
+        # the busiest pair sits on a good coupling
+        self.assertIsNotNone(self.hardware.edge_index(*mapping[:2]))
+        self.assertNotIn(tuple(sorted(mapping[:2])), [(1, 2), (5, 6)])
+        rng = random.Random(0)
+        costs = [placement_cost(self.hardware, self.weights,
+                                rng.sample(range(12), 5))
+                 for _ in range(100)]
+        self.assertLess(placement_cost(self.hardware, self.weights,
+                                       mapping), numpy.median(costs))
+
+    def test_spectral(self):
+        mapping = spectral_placement(self.hardware, self.weights)
+        self.check_mapping(mapping)
+        self.assertAlmostEqual(
+            placement_cost(self.hardware, self.weights, mapping), self.best)
+
+    def test_disconnected_hardware(self):
+        # a coupling 0-1 apart from the line 2-3-4-5-6
+        hardware = build_graph(7, [(0, 1), (2, 3), (3, 4), (4, 5), (5, 6)])
+        chain = numpy.diag(numpy.ones(2), 1)
+        weights = chain + chain.T
+        for method in (greedy_placement, spectral_placement):
+            mapping = method(hardware, weights)
+            self.assertTrue(numpy.isfinite(
+                placement_cost(hardware, weights, mapping)))
+        self.assertEqual(greedy_placement(hardware, weights), [2, 3, 4])
+        self.assertEqual(placement_cost(hardware, weights, [2, 3, 0]),
+                         numpy.inf)
+        delta = move_delta(hardware, weights)
+        self.assertEqual(delta([2, 3, 4], ('move', 2, 0)), numpy.inf)
+        self.assertEqual(delta([2, 3, 0], ('swap', 0, 2)), 0.)
+
+    def test_fiedler_vector(self):
+        # a path is ordered along the path
+        path = numpy.diag(numpy.ones(4), 1)
+        order = numpy.argsort(fiedler_vector(path + path.T))
+        self.assertIn(list(order), [[0, 1, 2, 3, 4], [4, 3, 2, 1, 0]])
+
+    def test_too_many_qubits(self):
+        weights = numpy.ones((13, 13))
+        for method in (greedy_placement, spectral_placement):
+            with self.assertRaises(ValueError):
+                method(self.hardware, weights)
+
+
+if __name__ == '__main__':
+    unittest.main()
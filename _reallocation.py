@@ -0,0 +1,175 @@
+""" Warm-start re-allocation after a change of calibration
+
+When the fidelities of a few qubits or couplings change, the previous
+best mapping is usually still close to the best one. Instead of
+annealing again from a random guess, the search restarts from the
+previous mapping at a low temperature and only moves the logical qubits
+placed on a changed qubit or coupling. A full search is only run when
+the previous mapping places a qubit which is no longer on the hardware,
+e.g. a qubit marked dead by the new calibration.
+"""
+from __future__ import absolute_import
+
+import random
+
+from _annealing import sa
+from _coplacement import CoPlacement
+
+WARM_OPTIONS = {
+    'init_T': 0.1,
+    'time_const': 10,
+    'step_perT': 5,
+    'final_T': 0.001,
+    'maxiter': 300,
+    'verbose': False,
+}
+
+
+def _changed(old_values, new_values, tolerance):
+    return any(abs(old_values[name] - new_values[name]) > tolerance
+               for name in old_values)
+
+
+def calibration_changes(old, new, tolerance=0.):
+    """
+    Returns the qubits and couplings whose calibration changed
+
+    Args:
+        old (HardwareGraph): previous calibration
+        new (HardwareGraph): new calibration
+        tolerance (float): smallest change of fidelity reported
+
+    Returns:
+        qubits (set): qubits whose fidelities changed or which are not
+            on the new hardware
+        edges (set): couplings, as sorted pairs, whose fidelities
+            changed or which are not on the new hardware
+    """
+    def qubit_values(hardware, q):
+        i = hardware.qubit_index(q)
+        return dict((name, values[i]) for name, values in
+                    hardware.fidelity_list['single_qubit'].items())
+
+    def edge_values(hardware, u, v):
+        i = hardware.edge_index(u, v)
+        return dict((name, values[i]) for name, values in
+                    hardware.fidelity_list['two-qubit'].items())
+
+    new_qubits = set(int(q) for q in new.qubit_list)
+    qubits = set()
+    for q in old.qubit_list:
+        q = int(q)
+        if q not in new_qubits or _changed(qubit_values(old, q),
+                                           qubit_values(new, q), tolerance):
+            qubits.add(q)
+    edges = set()
+    for u, v in old.adjacency_list:
+        u, v = int(u), int(v)
+        if new.edge_index(u, v) is None or _changed(
+                edge_values(old, u, v), edge_values(new, u, v), tolerance):
+            edges.add((min(u, v), max(u, v)))
+    return qubits, edges
+
+
+def is_valid(hardware, mapping):
+    """Returns whether a mapping places distinct qubits of the hardware"""
+    qubits = set(int(q) for q in hardware.qubit_list)
+    return len(set(mapping)) == len(mapping) and \
+        all(int(q) in qubits for q in mapping)
+
+
+def affected_qubits(mapping, qubits=(), edges=()):
+    """
+    Returns the logical qubits placed on a changed qubit or on an end of
+    a changed coupling
+
+    Args:
+        mapping (list): physical qubit of every logical qubit
+        qubits (iterable): changed qubits
+        edges (iterable): changed couplings
+    """
+    touched = set(int(q) for q in qubits)
+    for u, v in edges:
+        touched.update((int(u), int(v)))
+    return [i for i, q in enumerate(mapping) if int(q) in touched]
+
+
+def local_perturbation(hardware, affected, rng=random):
+    """
+    Returns a perturbation moving one affected logical qubit next to the
+    mapping, or swapping it with another affected logical qubit. The
+    other logical qubits stay in place.
+
+    Args:
+        hardware (HardwareGraph): device
+        affected (list): logical qubits which can move
+        rng (random.Random): source of randomness
+    """
+    def perturb(mapping):
+        mapping = list(mapping)
+        i = affected[rng.randint(0, len(affected) - 1)]
+        placed = dict((q, j) for j, q in enumerate(mapping))
+        targets = set(mapping[j] for j in affected if j != i)
+        for q in mapping:
+            targets.update(p for p in hardware.neighbors(q)
+                           if p not in placed)
+        if not targets:
+            return mapping
+        p = sorted(targets)[rng.randint(0, len(targets) - 1)]
+        if p in placed:
+            mapping[placed[p]] = mapping[i]
+        mapping[i] = p
+        return mapping
+    return perturb
+
+
+def reallocate(hardware, previous, obj_function, qubits=(), edges=(),
+               options=None, full_options=None, rng=random):
+    """
+    Re-allocate a circuit on a recalibrated device
+
+    Args:
+        hardware (HardwareGraph): device with the new calibration
+        previous (list): previous best mapping
+        obj_function (callable): objective of a mapping, to be minimized
+        qubits (iterable): qubits whose calibration changed
+        edges (iterable): couplings whose calibration changed
+        options (dict, optional): settings of the warm annealing, see
+            WARM_OPTIONS and _annealing.sa
+        full_options (dict, optional): settings of the full search, see
+            _coplacement.CoPlacement.optimize
+        rng (random.Random): source of randomness
+
+    Returns:
+        results (dict): outcome of _annealing.sa, with 'mode' set to
+            'unchanged' when no logical qubit is affected, 'warm' for a
+            search from previous and 'full' for a search from scratch
+    """
+    if not is_valid(hardware, previous):
+        placement = CoPlacement(hardware, [len(previous)],
+                                lambda k, mapping: obj_function(mapping),
+                                rng)
+        results = placement.optimize(options=full_options)
+        # a single region: return flat mappings as the other modes do
+        results['xval_opt'] = results['xval_opt'][0]
+        results['history_xval'] = [regions[0] for regions in
+                                   results['history_xval']]
+        results['mode'] = 'full'
+        return results
+    affected = affected_qubits(previous, qubits, edges)
+    if not affected:
+        fval = obj_function(list(previous))
+        return {
+            'fval_opt': fval,
+            'xval_opt': list(previous),
+            'total_iter': 0,
+            'history_xval': [list(previous)],
+            'history_fval': [fval],
+            'mode': 'unchanged'
+        }
+    settings = dict(WARM_OPTIONS)
+    settings.update(options or {})
+    settings['perturb'] = local_perturbation(hardware, affected, rng)
+    results = sa(list(previous), obj_function, settings)
+    results['mode'] = 'warm'
+    return results
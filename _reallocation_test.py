@@ -0,0 +1,119 @@
+"""Tests for _reallocation.py."""
+import math
+import random
+import unittest
+
+from _coplacement_test import build_grid
+from _reallocation import (affected_qubits,
+                           calibration_changes,
+                           is_valid,
+                           local_perturbation,
+                           reallocate)
+from hardwaregraph import HardwareGraph
+
+
+def without_qubits(hardware, dead):
+    """ Copy of a hardware with some qubits removed"""
+    keep = [i for i, q in enumerate(hardware.qubit_list) if q not in dead]
+    edges = [i for i, (u, v) in enumerate(hardware.adjacency_list)
+             if u not in dead and v not in dead]
+    fidelity_list = {
+        'single_qubit': dict(
+            (name, [values[i] for i in keep]) for name, values in
+            hardware.fidelity_list['single_qubit'].items()),
+        'two-qubit': dict(
+            (name, [values[i] for i in edges]) for name, values in
+            hardware.fidelity_list['two-qubit'].items())
+    }
+    return HardwareGraph([hardware.qubit_list[i] for i in keep],
+                         [hardware.adjacency_list[i] for i in edges],
+                         fidelity_list)
+
+
+class ReallocationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.old = build_grid()
+        self.new = build_grid(bad_edges=[(1, 2)])
+        self.rng = random.Random(2)
+        self.n_calls = 0
+
+    def objective(self, hardware):
+        """Minus the log fidelity of a chain of CZ gates"""
+        def cost(mapping):
+            self.n_calls += 1
+            total = 0.
+            for u, v in zip(mapping[:-1], mapping[1:]):
+                edge = hardware.edge_index(u, v)
+                if edge is None:
+                    return 100.
+                total -= math.log(
+                    hardware.fidelity_list['two-qubit']['f2CZ'][edge])
+            return total
+        return cost
+
+    def test_calibration_changes(self):
+        self.assertEqual(calibration_changes(self.old, self.new),
+                         (set(), set([(1, 2)])))
+        self.assertEqual(calibration_changes(self.old, self.new, 0.5),
+                         (set(), set()))
+        self.new.set_fidelity('single_qubit', 'f1RO', 3, 0.8)
+        dead = without_qubits(self.new, [5])
+        qubits, edges = calibration_changes(self.old, dead)
+        self.assertEqual(qubits, set([3, 5]))
+        self.assertEqual(edges, set([(1, 2), (1, 5), (4, 5), (5, 6),
+                                     (5, 9)]))
+
+    def test_affected_qubits(self):
+        self.assertEqual(affected_qubits([0, 1, 2, 6], [6], [(1, 2)]),
+                         [1, 2, 3])
+        self.assertTrue(is_valid(self.old, [0, 1, 2]))
+        self.assertFalse(is_valid(self.old, [0, 1, 1]))
+        self.assertFalse(is_valid(without_qubits(self.old, [1]),
+                                  [0, 1, 2]))
+
+    def test_local_perturbation(self):
+        perturb = local_perturbation(self.old, [1, 2], self.rng)
+        mapping = [0, 1, 2, 6]
+        for _ in range(100):
+            mapping = perturb(mapping)
+            self.assertEqual(mapping[0], 0)
+            self.assertEqual(mapping[3], 6)
+            self.assertEqual(len(set(mapping)), 4)
+
+    def test_warm_start(self):
+        random.seed(3)
+        previous = [0, 1, 2]
+        qubits, edges = calibration_changes(self.old, self.new)
+        result = reallocate(self.new, previous, self.objective(self.new),
+                            qubits, edges, rng=self.rng)
+        self.assertEqual(result['mode'], 'warm')
+        self.assertEqual(result['xval_opt'][0], 0)
+        self.assertAlmostEqual(result['fval_opt'], -2 * math.log(0.9))
+        self.assertLessEqual(self.n_calls, 301)
+
+    def test_unchanged(self):
+        result = reallocate(self.old, [0, 1, 2], self.objective(self.old))
+        self.assertEqual(result['mode'], 'unchanged')
+        self.assertEqual(result['xval_opt'], [0, 1, 2])
+        self.assertEqual(self.n_calls, 1)
+
+    def test_dead_qubit(self):
+        random.seed(3)
+        dead = without_qubits(self.old, [1])
+        qubits, edges = calibration_changes(self.old, dead)
+        result = reallocate(dead, [0, 1, 2], self.objective(dead),
+                            qubits, edges, rng=self.rng,
+                            full_options={'verbose': False,
+                                          'maxiter': 500})
+        self.assertEqual(result['mode'], 'full')
+        self.assertNotIn(1, result['xval_opt'])
+        self.assertIn(result['xval_opt'], result['history_xval'])
+        self.assertTrue(all(len(mapping) == 3 and
+                            all(isinstance(q, int) for q in mapping)
+                            for mapping in result['history_xval']))
+        self.assertAlmostEqual(result['fval_opt'], -2 * math.log(0.9))
+
+
+if __name__ == '__main__':
+    unittest.main()
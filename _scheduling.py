@@ -0,0 +1,134 @@
+""" Critical-path timing and ASAP/ALAP scheduling of circuits
+
+The schedules are computed on the gate arrays of a GateStorage. Gates
+are processed layer by layer: when the gates of a layer act on disjoint
+qubits, which is the case for every layer built by AbstractCircuit, the
+whole layer is scheduled with a few array operations.
+"""
+import numpy
+
+
+def _schedule(gates, n_qubits, reverse=False):
+    """
+    Compute the earliest level and start time of every gate
+
+    Args:
+        gates (GateStorage): gates of the circuit
+        n_qubits (integer): number of qubits in the register
+        reverse (bool): schedule the gates from last to first
+
+    Returns:
+        levels (numpy.ndarray): level of each gate
+        starts (numpy.ndarray): start time of each gate
+        qubit_levels (numpy.ndarray): number of levels used per qubit
+        qubit_times (numpy.ndarray): busy time of each qubit
+    """
+    targets = gates.targets
+    durations = gates.time
+    offsets = gates.layer_offsets
+    levels = numpy.zeros(gates.n_gates, dtype=numpy.int64)
+    starts = numpy.zeros(gates.n_gates, dtype=numpy.float64)
+    # the extra last entry absorbs the -1 padding of the targets
+    frontier = numpy.zeros(n_qubits + 1, dtype=numpy.int64)
+    finish = numpy.zeros(n_qubits + 1, dtype=numpy.float64)
+
+    layers = range(gates.n_layers)
+    if reverse:
+        layers = reversed(layers)
+    for layer in layers:
+        start, stop = offsets[layer], offsets[layer + 1]
+        layer_targets = targets[start:stop]
+        used = layer_targets[layer_targets >= 0]
+        if len(numpy.unique(used)) == len(used):
+            rows = [slice(start, stop)]
+        else:
+            rows = range(start, stop)
+            if reverse:
+                rows = reversed(rows)
+            rows = [slice(row, row + 1) for row in rows]
+        for row in rows:
+            row_targets = targets[row]
+            level = frontier[row_targets].max(axis=1)
+            time = finish[row_targets].max(axis=1)
+            levels[row] = level
+            starts[row] = time
+            frontier[row_targets] = (level + 1)[:, None]
+            finish[row_targets] = (time + durations[row])[:, None]
+            frontier[-1] = 0
+            finish[-1] = 0.0
+    return levels, starts, frontier[:-1], finish[:-1]
+
+
+def critical_path(circuit):
+    """
+    Returns the per-qubit critical-path durations of a circuit
+
+    The duration of a qubit is the time at which its last gate finishes
+    when every gate starts as soon as all its qubits are free.
+
+    Args:
+        circuit (AbstractCircuit)
+
+    Returns:
+        qubit_times (numpy.ndarray): duration for every qubit
+        total_time (float): duration of the whole circuit
+    """
+    _, _, _, qubit_times = _schedule(circuit.gates, circuit.n_qubits)
+    total_time = float(qubit_times.max()) if len(qubit_times) else 0.0
+    return qubit_times, total_time
+
+
+def asap_levels(circuit):
+    """
+    Returns the as-soon-as-possible level of every gate of a circuit
+
+    Args:
+        circuit (AbstractCircuit)
+    """
+    levels, _, _, _ = _schedule(circuit.gates, circuit.n_qubits)
+    return levels
+
+
+def alap_levels(circuit):
+    """
+    Returns the as-late-as-possible level of every gate of a circuit
+
+    Args:
+        circuit (AbstractCircuit)
+    """
+    levels, _, qubit_levels, _ = _schedule(circuit.gates, circuit.n_qubits,
+                                           reverse=True)
+    depth = qubit_levels.max() if len(qubit_levels) else 0
+    return depth - 1 - levels
+
+
+def compact(circuit, mode='asap'):
+    """
+    Returns a copy of a circuit re-layered by ASAP or ALAP scheduling
+
+    The gates acting on a qubit keep their order, and the gates of each
+    new layer act on disjoint qubits. Layers are as few as the longest
+    chain of gates sharing qubits allows.
+
+    Args:
+        circuit (AbstractCircuit)
+        mode (string): 'asap' or 'alap'
+    """
+    if mode == 'asap':
+        levels = asap_levels(circuit)
+    elif mode == 'alap':
+        levels = alap_levels(circuit)
+    else:
+        raise ValueError("mode must be 'asap' or 'alap'")
+    gates = circuit.gates
+    order = numpy.argsort(levels, kind='stable')
+    layer_offsets = numpy.concatenate(
+        [[0], numpy.cumsum(numpy.bincount(levels))])
+    return type(circuit).from_arrays(circuit.n_qubits, gates.table.types,
+                                     gates.type_id[order],
+                                     gates.targets[order],
+                                     gates.indexes[order],
+                                     layer_offsets,
+                                     n_blocks=circuit.n_blocks,
+                                     shared_parameters=(
+                                         circuit.shared_parameters))
@@ -0,0 +1,376 @@
+""" Statevector simulation of AbstractCircuits
+
+An AbstractCircuit is compiled once into a flat list of kernel calls.
+Every gate reads its angles from a vector of parameter slots, one slot
+per gate parameter, gathered from the variational and constant parameter
+vectors of the circuit with precomputed index arrays. Running the
+compiled circuit on a (B, n_variables) array of parameter vectors
+evolves a (B, 2^n) batch of statevectors at once.
+"""
+from __future__ import absolute_import
+
+import numpy
+
+from _gates import (apply_controlled_unitary,
+                    apply_unitary,
+                    rx_array,
+                    ry_array,
+                    rz_array,
+                    sq_gate_array)
+
+
+class SimulatorError(Exception):
+    pass
+
+
+PAULIS = {
+    'I': numpy.eye(2, dtype=complex),
+    'X': numpy.array([[0., 1.], [1., 0.]], dtype=complex),
+    'Y': numpy.array([[0., -1j], [1j, 0.]], dtype=complex),
+    'Z': numpy.diag([1., -1.]).astype(complex)
+}
+
+HADAMARD = numpy.array([[1., 1.], [1., -1.]], dtype=complex) / numpy.sqrt(2.)
+
+
+def _single_matrix(matrices):
+    """Share the matrix between statevectors when all rows agree"""
+    if len(matrices) == 1:
+        return matrices[0]
+    return matrices
+
+
+def apply_pauli_string(state, paulis, targets, n_qubits):
+    """Applies a product of Pauli matrices to statevectors
+
+    Args:
+        state (numpy.ndarray[complex]) : (B, 2^n) statevectors
+        paulis (string) : one of 'IXYZ' per target, e.g. 'XZ'
+        targets (tuple) : qubits the Pauli matrices act upon
+        n_qubits (int) : number of qubits
+    """
+    for pauli, target in zip(paulis, targets):
+        if pauli != 'I':
+            state = apply_unitary(state, PAULIS[pauli], target, n_qubits)
+    return state
+
+
+def _pauli_kernel(paulis):
+    """Returns the kernel of the exponential exp(-i theta P / 2) of a
+    Pauli string P, or of P itself for gates without parameters"""
+    def kernel(state, params, targets, n_qubits):
+        flipped = apply_pauli_string(state, paulis, targets, n_qubits)
+        if params.shape[1] == 0:
+            return flipped
+        half = params[:, :1] / 2.
+        return numpy.cos(half) * state - 1j * numpy.sin(half) * flipped
+    return kernel
+
+
+def _rotation_kernel(array_kernel):
+    def kernel(state, params, targets, n_qubits):
+        return apply_unitary(state, _single_matrix(array_kernel(params[:, 0])),
+                             targets[0], n_qubits)
+    return kernel
+
+
+def _controlled_rotation_kernel(array_kernel):
+    def kernel(state, params, targets, n_qubits):
+        return apply_controlled_unitary(
+            state, _single_matrix(array_kernel(params[:, 0])), targets[0],
+            targets[1], n_qubits)
+    return kernel
+
+
+def _sq_kernel(state, params, targets, n_qubits):
+    return apply_unitary(state, _single_matrix(sq_gate_array(params)),
+                         targets[0], n_qubits)
+
+
+def _controlled_sq_kernel(state, params, targets, n_qubits):
+    return apply_controlled_unitary(
+        state, _single_matrix(sq_gate_array(params)), targets[0],
+        targets[1], n_qubits)
+
+
+def _hadamard_kernel(state, params, targets, n_qubits):
+    return apply_unitary(state, HADAMARD, targets[0], n_qubits)
+
+
+def _cnot_kernel(state, params, targets, n_qubits):
+    return apply_controlled_unitary(state, PAULIS['X'], targets[0],
+                                    targets[1], n_qubits)
+
+
+def _cz_kernel(state, params, targets, n_qubits):
+    return apply_controlled_unitary(state, PAULIS['Z'], targets[0],
+                                    targets[1], n_qubits)
+
+
+# Kernels take (B, 2^n) statevectors, (B, n_parameters) angles, the gate
+# targets and the number of qubits and return the new statevectors.
+# Gates named by a string of Pauli matrices, e.g. 'XX', do not need to
+# be registered.
+GATE_KERNELS = {
+    'RX': _rotation_kernel(rx_array),
+    'RY': _rotation_kernel(ry_array),
+    'RZ': _rotation_kernel(rz_array),
+    'U': _sq_kernel,
+    'CU': _controlled_sq_kernel,
+    'CRX': _controlled_rotation_kernel(rx_array),
+    'CRY': _controlled_rotation_kernel(ry_array),
+    'CRZ': _controlled_rotation_kernel(rz_array),
+    'H': _hadamard_kernel,
+    'CNOT': _cnot_kernel,
+    'CZ': _cz_kernel,
+}
+
+
+# Parameter-shift rules, as lists of (coefficient, shift) pairs such that
+# df/dtheta = sum(coefficient * f(theta + shift)). Rotations generated by
+# operators with eigenvalues +-1/2 use the two-term rule; controlled
+# rotations, whose generators also have eigenvalue 0, the four-term one.
+TWO_TERM_RULE = ((0.5, numpy.pi / 2.), (-0.5, -numpy.pi / 2.))
+_PLUS = (numpy.sqrt(2.) + 1.) / (4. * numpy.sqrt(2.))
+_MINUS = (numpy.sqrt(2.) - 1.) / (4. * numpy.sqrt(2.))
+FOUR_TERM_RULE = ((_PLUS, numpy.pi / 2.), (-_PLUS, -numpy.pi / 2.),
+                  (-_MINUS, 3. * numpy.pi / 2.), (_MINUS, -3. * numpy.pi / 2.))
+
+SHIFT_RULES = {
+    'RX': TWO_TERM_RULE,
+    'RY': TWO_TERM_RULE,
+    'RZ': TWO_TERM_RULE,
+    'U': TWO_TERM_RULE,
+    'CU': FOUR_TERM_RULE,
+    'CRX': FOUR_TERM_RULE,
+    'CRY': FOUR_TERM_RULE,
+    'CRZ': FOUR_TERM_RULE,
+}
+
+
+def register_kernel(name, kernel, shift_rule=None):
+    """
+    Register the kernel simulating the gates of a given name
+
+    Args:
+        name (string): gate name
+        kernel (callable): kernel(state, params, targets, n_qubits)
+            returning the new (B, 2^n) statevectors
+        shift_rule (tuple, optional): (coefficient, shift) pairs of the
+            parameter-shift rule of every gate parameter
+    """
+    GATE_KERNELS[name] = kernel
+    if shift_rule is not None:
+        SHIFT_RULES[name] = shift_rule
+
+
+def get_kernel(template):
+    """
+    Return the kernel simulating a gate template
+
+    Args:
+        template (GateTemplate): gate definition
+    """
+    if template.name in GATE_KERNELS:
+        return GATE_KERNELS[template.name]
+    if (len(template.name) == template.span and
+            all(p in PAULIS for p in template.name) and
+            template.n_parameters <= 1):
+        return _pauli_kernel(template.name)
+    raise SimulatorError('No kernel for gate {0}'.format(template.name))
+
+
+def get_shift_rule(template):
+    """
+    Return the parameter-shift rule of the parameters of a gate template
+
+    Args:
+        template (GateTemplate): gate definition
+    """
+    if template.name in SHIFT_RULES:
+        return SHIFT_RULES[template.name]
+    if (len(template.name) == template.span and
+            all(p in PAULIS for p in template.name)):
+        return TWO_TERM_RULE
+    raise SimulatorError('No shift rule for gate {0}'.format(template.name))
+
+
+class CompiledCircuit(object):
+    """ AbstractCircuit compiled into a flat list of kernel calls
+
+    Only the basic block is compiled. Its repetitions are simulated by
+    applying the block operations again, with the parameter slots of
+    repetition b taken from the indexes of the block shifted by the
+    parameter offsets of b.
+
+    Attributes:
+        n_qubits (integer):
+            Number of qubits in the circuit register
+        n_blocks (integer):
+            Number of repetitions of the block
+        operations (list):
+            (kernel, targets, start, stop) tuples, the gate angles being
+            the parameter slots start to stop of every repetition
+        block_slots (integer):
+            Number of parameter slots of one repetition
+        slot_index (numpy.ndarray):
+            index in the variational or constant parameter vector of
+            every parameter slot, repetition after repetition
+        slot_variational (numpy.ndarray):
+            whether every parameter slot is variational
+        slot_type (numpy.ndarray):
+            gate type id of every parameter slot
+    """
+
+    def __init__(self, circuit, n_blocks=None):
+        """
+        Compile an AbstractCircuit
+
+        Args:
+            circuit (AbstractCircuit): circuit to be simulated
+            n_blocks (integer, optional): number of repetitions of the
+                basic block, defaults to circuit.n_blocks
+        """
+        gates = circuit.gates
+        if n_blocks is None:
+            n_blocks = circuit.n_blocks
+        self.templates = list(gates.table.types)
+        self.n_qubits = circuit.n_qubits
+        self.n_blocks = n_blocks
+        self.shared_parameters = circuit.shared_parameters
+        self.n_variables = circuit.get_n_total_parameters(True, n_blocks)
+        self.n_constants = circuit.get_n_total_parameters(False, n_blocks)
+        kernels = [get_kernel(template) for template in gates.table.types]
+        spans = [template.span for template in gates.table.types]
+        n_parameters = numpy.array([template.n_parameters for template in
+                                    gates.table.types], dtype=numpy.int64)
+
+        # parameter slots of every gate are consecutive
+        gate_slots = n_parameters[gates.type_id]
+        stops = numpy.cumsum(gate_slots)
+        starts = stops - gate_slots
+        mask = (numpy.arange(gates.indexes.shape[1])[None, :] <
+                gate_slots[:, None])
+        block_index = gates.indexes[mask].astype(numpy.int64)
+        block_variational = numpy.repeat(gates.is_variational, gate_slots)
+        self.block_slots = len(block_index)
+
+        # slots of repetition b index the parameters shifted by offset b
+        offsets = numpy.where(block_variational[None, :],
+                              circuit.get_block_offsets(True,
+                                                        n_blocks)[:, None],
+                              circuit.get_block_offsets(False,
+                                                        n_blocks)[:, None])
+        self.slot_index = (block_index[None, :] + offsets).ravel()
+        self.slot_variational = numpy.tile(block_variational, n_blocks)
+        self.slot_type = numpy.tile(numpy.repeat(gates.type_id, gate_slots),
+                                    n_blocks)
+        self.n_slots = len(self.slot_index)
+
+        self.operations = []
+        targets = gates.targets.tolist()
+        for row, type_id in enumerate(gates.type_id.tolist()):
+            self.operations.append((kernels[type_id],
+                                    tuple(targets[row][:spans[type_id]]),
+                                    int(starts[row]), int(stops[row])))
+
+    def slot_parameters(self, variables, constants=None):
+        """
+        Gather the parameter slots from the circuit parameter vectors
+
+        Args:
+            variables (numpy.ndarray): (n_variables,) parameter vector or
+                (B, n_variables) batch of parameter vectors
+            constants (numpy.ndarray, optional): (n_constants,) constant
+                parameters, or (B, n_constants). Defaults to zeros.
+
+        Returns:
+            slots (numpy.ndarray): (B, n_slots) angles
+        """
+        variables = numpy.atleast_2d(numpy.asarray(variables, dtype=float))
+        if constants is None:
+            constants = numpy.zeros(self.n_constants)
+        constants = numpy.atleast_2d(numpy.asarray(constants, dtype=float))
+        if (variables.shape[1] < self.n_variables or
+                constants.shape[1] < self.n_constants):
+            raise SimulatorError('Not enough parameters for the circuit')
+        n_batch = max(len(variables), len(constants))
+        slots = numpy.empty((n_batch, self.n_slots))
+        variational = self.slot_variational
+        slots[:, variational] = variables[:, self.slot_index[variational]]
+        slots[:, ~variational] = constants[:, self.slot_index[~variational]]
+        return slots
+
+    def initial_state(self, n_batch=1):
+        """Return n_batch copies of the |0...0> statevector"""
+        state = numpy.zeros((n_batch, 2 ** self.n_qubits), dtype=complex)
+        state[:, 0] = 1.
+        return state
+
+    def run_slots(self, slots, state=None):
+        """
+        Evolve statevectors with given parameter slots
+
+        Args:
+            slots (numpy.ndarray): (B, n_slots) angles
+            state (numpy.ndarray, optional): (2^n,) or (B, 2^n) initial
+                statevectors. Defaults to |0...0>. Many statevectors
+                can share a single set of parameter slots.
+
+        Returns:
+            state (numpy.ndarray): (B, 2^n) final statevectors
+        """
+        n_batch = len(slots)
+        if state is None:
+            state = self.initial_state(n_batch)
+        else:
+            state = numpy.atleast_2d(numpy.asarray(state, dtype=complex))
+            # a single parameter set is shared by all the statevectors
+            if len(state) == 1 and n_batch > 1:
+                state = numpy.broadcast_to(state,
+                                           (n_batch, state.shape[1]))
+            elif len(state) != n_batch and n_batch > 1:
+                raise SimulatorError('Batches of states and parameters '
+                                     'must have the same size')
+        for block in range(self.n_blocks):
+            offset = block * self.block_slots
+            for kernel, targets, start, stop in self.operations:
+                state = kernel(state, slots[:, offset + start:offset + stop],
+                               targets, self.n_qubits)
+        return state
+
+    def run(self, variables, constants=None, state=None):
+        """
+        Simulate the circuit for a parameter vector or a batch of them
+
+        Args:
+            variables (numpy.ndarray): (n_variables,) parameter vector or
+                (B, n_variables) batch of parameter vectors
+            constants (numpy.ndarray, optional): constant parameters
+            state (numpy.ndarray, optional): initial statevector(s).
+                Defaults to |0...0>.
+
+        Returns:
+            state (numpy.ndarray): (2^n,) final statevector, or (B, 2^n)
+                for a batch of parameter vectors
+        """
+        slots = self.slot_parameters(variables, constants)
+        final = self.run_slots(slots, state)
+        if numpy.ndim(variables) < 2 and numpy.ndim(constants) < 2 and \
+                (state is None or numpy.ndim(state) < 2):
+            return final[0]
+        return final
+
+
+def simulate(circuit, variables, constants=None, state=None):
+    """
+    Simulate an AbstractCircuit on a statevector
+
+    Args:
+        circuit (AbstractCircuit): circuit to be simulated
+        variables (numpy.ndarray): (n_variables,) parameter vector or
+            (B, n_variables) batch of parameter vectors
+        constants (numpy.ndarray, optional): constant parameters
+        state (numpy.ndarray, optional): initial statevector(s)
+    """
+    return CompiledCircuit(circuit).run(variables, constants, state)
@@ -0,0 +1,155 @@
+"""Tests for _simulator.py."""
+import unittest
+
+import numpy
+import scipy.linalg
+
+from _abstract_circuit import AbstractCircuit
+from _abstract_gate import AbstractGate
+from _gates import controlled_Ry, sq_gate_2all
+from _simulator import (CompiledCircuit,
+                        SimulatorError,
+                        register_kernel,
+                        simulate)
+
+X = numpy.array([[0, 1], [1, 0]], dtype=complex)
+Z = numpy.diag([1., -1.]).astype(complex)
+
+
+def pauli_operator(paulis, n_qubits):
+    """Dense operator of a Pauli string given as {qubit: matrix}"""
+    operator = numpy.eye(1)
+    for qubit in range(n_qubits):
+        operator = numpy.kron(operator, paulis.get(qubit, numpy.eye(2)))
+    return operator
+
+
+def build_test_circuit(n_qubits):
+    """ Circuit with a layer of generalized rotations, even and odd
+    layers of ZZ exponentials and a constant controlled-Ry"""
+    circuit = AbstractCircuit(n_qubits)
+    circuit.add_adyacent_gates_layer(AbstractGate('U', 1, 10.0, 3, True))
+    zz_gate = AbstractGate('ZZ', 2, 40.0, 1, True)
+    circuit.add_adyacent_gates_layer(zz_gate, True)
+    circuit.add_adyacent_gates_layer(zz_gate, False, True)
+    circuit.add_gate_as_layer(AbstractGate('CRY', 2, 40.0, 1, False),
+                              [n_qubits - 1, 0])
+    return circuit
+
+
+def dense_unitary(circuit, variables, constants):
+    """Reference unitary of build_test_circuit built from dense operators"""
+    n = circuit.n_qubits
+    U = sq_gate_2all(variables[:3 * n], n).full()
+    for layer in circuit.basic_block[1:3]:
+        for gate in layer:
+            theta = variables[gate.get_indexes()[0]]
+            zz = pauli_operator({q: Z for q in gate.get_targets()}, n)
+            U = scipy.linalg.expm(-0.5j * theta * zz).dot(U)
+    U = controlled_Ry(constants[0], n, n - 1, 0).full().dot(U)
+    return U
+
+
+class SimulatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.circuit = build_test_circuit(4)
+        random = numpy.random.RandomState(3)
+        self.n_variables = self.circuit.get_n_parameters(True)
+        self.variables = random.uniform(-3., 3., (5, self.n_variables))
+        self.constants = numpy.array([0.4])
+
+    def test_compiled_slots(self):
+        compiled = CompiledCircuit(self.circuit)
+        self.assertEqual(self.n_variables, 14)
+        self.assertEqual(compiled.n_slots, 12 + 2 + 1 + 1)
+        self.assertEqual(compiled.slot_index.tolist(),
+                         list(range(12)) + [12, 12, 13, 0])
+        self.assertEqual(compiled.slot_variational.tolist(),
+                         [True] * 15 + [False])
+        self.assertEqual(len(compiled.operations), 8)
+
+    def test_simulate_matches_dense_unitary(self):
+        state = simulate(self.circuit, self.variables[0], self.constants)
+        U = dense_unitary(self.circuit, self.variables[0], self.constants)
+        self.assertEqual(state.shape, (16,))
+        numpy.testing.assert_allclose(state, U[:, 0], atol=1e-12)
+
+    def test_simulate_batch(self):
+        compiled = CompiledCircuit(self.circuit)
+        states = compiled.run(self.variables, self.constants)
+        self.assertEqual(states.shape, (5, 16))
+        for variables, state in zip(self.variables, states):
+            numpy.testing.assert_allclose(
+                state, compiled.run(variables, self.constants), atol=1e-12)
+
+    def test_simulate_initial_state(self):
+        initial = numpy.zeros(16, dtype=complex)
+        initial[5] = 1.
+        state = simulate(self.circuit, self.variables[1], self.constants,
+                         initial)
+        U = dense_unitary(self.circuit, self.variables[1], self.constants)
+        numpy.testing.assert_allclose(state, U[:, 5], atol=1e-12)
+
+    def test_repeated_blocks(self):
+        circuit = build_test_circuit(4)
+        circuit.n_blocks = 3
+        compiled = CompiledCircuit(circuit)
+        self.assertEqual(compiled.n_variables, 3 * self.n_variables)
+        self.assertEqual(compiled.n_constants, 3)
+        self.assertEqual(len(compiled.operations), 8)
+        variables = self.variables[:3].ravel()
+        constants = numpy.array([0.4, -0.2, 1.1])
+        state = compiled.run(variables, constants)
+        expected = None
+        for block in range(3):
+            expected = simulate(self.circuit, self.variables[block],
+                                constants[block:block + 1], expected)
+        numpy.testing.assert_allclose(state, expected, atol=1e-12)
+
+    def test_repeated_blocks_shared_parameters(self):
+        circuit = AbstractCircuit(4, 3, shared_parameters=True)
+        circuit.add_adyacent_gates_layer(AbstractGate('U', 1, 10.0, 3, True))
+        circuit.add_adyacent_gates_layer(AbstractGate('ZZ', 2, 40.0, 1,
+                                                      True), True)
+        compiled = CompiledCircuit(circuit)
+        self.assertEqual(compiled.n_variables, 13)
+        state = compiled.run(self.variables[0, :13])
+        single = CompiledCircuit(circuit, n_blocks=1)
+        expected = None
+        for block in range(3):
+            expected = single.run(self.variables[0, :13], state=expected)
+        numpy.testing.assert_allclose(state, expected, atol=1e-12)
+
+    def test_fixed_gates(self):
+        circuit = AbstractCircuit(2)
+        circuit.add_gate_as_layer(AbstractGate('H', 1), [0])
+        circuit.add_gate_as_layer(AbstractGate('CNOT', 2), [0, 1])
+        circuit.add_gate_as_layer(AbstractGate('X', 1), [1])
+        state = simulate(circuit, [])
+        numpy.testing.assert_allclose(state,
+                                      numpy.array([0, 1, 1, 0]) /
+                                      numpy.sqrt(2.), atol=1e-12)
+
+    def test_registered_kernel(self):
+        def swap_kernel(state, params, targets, n_qubits):
+            return state[:, [0, 2, 1, 3]]
+        register_kernel('TEST-SWAP', swap_kernel)
+        circuit = AbstractCircuit(2)
+        circuit.add_gate_as_layer(AbstractGate('X', 1), [1])
+        circuit.add_gate_as_layer(AbstractGate('TEST-SWAP', 2), [0, 1])
+        numpy.testing.assert_allclose(simulate(circuit, []), [0, 0, 1, 0])
+
+    def test_unknown_gate(self):
+        circuit = AbstractCircuit(2)
+        circuit.add_gate_as_layer(AbstractGate('FOO', 1, 0.0, 1, True), [1])
+        with self.assertRaises(SimulatorError):
+            CompiledCircuit(circuit)
+
+    def test_missing_parameters(self):
+        with self.assertRaises(SimulatorError):
+            simulate(self.circuit, self.variables[0, :3], self.constants)
+
+
+if __name__ == '__main__':
+    unittest.main()
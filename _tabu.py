@@ -0,0 +1,212 @@
+""" Tabu search over qubit mappings
+
+A drop-in alternative to _annealing.sa for expensive objectives: every
+iteration moves to the best admissible neighbour of the current
+mapping, where a neighbour is tabu when its mapping was visited
+recently or when it sends a logical qubit back to a hardware qubit it
+left recently. A tabu neighbour is still admissible when it beats the
+best mapping found so far (aspiration). The value of every mapping is
+kept, so no mapping is evaluated twice.
+
+Neighbours swap the hardware qubits of two logical qubits, or relocate
+a logical qubit to a free hardware qubit next to the mapping. When an
+incremental cost model is given (e.g. _placement.move_delta), it ranks
+all the neighbours and only the most promising ones are evaluated with
+the objective function; otherwise a random sample is.
+"""
+from __future__ import absolute_import
+
+import collections
+import random
+
+DEFAULT_OPTIONS = {
+    'maxiter': 200,
+    'sample_size': 10,
+    'tenure': 7,
+    'tabu_size': 50,
+    'verbose': False,
+}
+
+
+def apply_move(mapping, move):
+    """
+    Returns the mapping after a move
+
+    Args:
+        mapping (list): physical qubit of every logical qubit
+        move (tuple): ('swap', i, j) exchanges the hardware qubits of
+            the logical qubits i and j, ('relocate', i, p) moves the
+            logical qubit i to the hardware qubit p
+    """
+    mapping = list(mapping)
+    if move[0] == 'swap':
+        _, i, j = move
+        mapping[i], mapping[j] = mapping[j], mapping[i]
+    else:
+        _, i, p = move
+        mapping[i] = p
+    return mapping
+
+
+def swap_relocate(hardware):
+    """
+    Returns the neighbourhood of the swap and relocate moves on a device
+
+    Args:
+        hardware (HardwareGraph): device
+
+    Returns:
+        neighborhood (callable): returns the list of the moves of a
+            mapping
+    """
+    def neighborhood(mapping):
+        n = len(mapping)
+        moves = [('swap', i, j) for i in range(n) for j in range(i + 1, n)]
+        placed = set(int(q) for q in mapping)
+        free = set()
+        for q in placed:
+            free.update(p for p in hardware.neighbors(q) if p not in placed)
+        moves += [('relocate', i, p) for i in range(n)
+                  for p in sorted(free)]
+        return moves
+    return neighborhood
+
+
+def tabu_search(init_guess, obj_function, options):
+    """
+    Args:
+        init_guess: initial guess for the qubit mapping.
+        obj_function: Objective function
+        options: a dictionary containing optimization settings.
+            'neighborhood': function returning the moves of a mapping,
+                e.g. swap_relocate(hardware)
+            'maxiter': maximum number of iterations
+            'max_evaluations': maximum number of calls of obj_function
+                (optional)
+            'sample_size': number of neighbours evaluated per iteration
+            'tenure': number of iterations a logical qubit cannot go
+                back to a hardware qubit it left
+            'tabu_size': number of recent mappings which are tabu
+            'delta': (optional) delta(mapping, move) estimates the
+                change of the objective of a move, to rank the
+                neighbours
+            'rng': (optional) random.Random sampling the neighbours
+            'verbose': print the function values (default False)
+            Missing settings take the values of DEFAULT_OPTIONS.
+    Returns:
+        results: a dictionary containing the outcome of optimization
+            'fval_opt': optimized function value
+            'xval_opt': optimized input
+            'total_iter': total number of iterations
+            'history_xval': accepted input at every step
+            'history_fval': accepted function value at every step
+            'n_evaluations': number of calls of obj_function
+    """
+    settings = dict(DEFAULT_OPTIONS)
+    settings.update(options)
+    neighborhood = settings['neighborhood']
+    delta = settings.get('delta')
+    rng = settings.get('rng', random)
+    max_evaluations = settings.get('max_evaluations')
+    verbose = settings['verbose']
+
+    values = {}
+
+    def evaluate(mapping):
+        key = tuple(mapping)
+        if key not in values:
+            try:
+                values[key] = obj_function(list(mapping))
+            except (AttributeError, ValueError):
+                # (Error from quilc received and handled) the mapping is
+                # never proposed again
+                values[key] = None
+        return values[key]
+
+    xval_current = list(init_guess)
+    fval_current = evaluate(xval_current)
+    if fval_current is None:
+        raise ValueError('The initial guess cannot be evaluated')
+    xval_opt, fval_opt = xval_current, fval_current
+    history_xval = [xval_current]
+    history_fval = [fval_current]
+
+    recent = collections.deque([tuple(xval_current)])
+    recent_set = set(recent)
+    # (logical qubit, hardware qubit) -> last tabu iteration
+    tabu_until = {}
+
+    if verbose:
+        print("Iter\tFval")
+    iter_count = 0
+    while iter_count < settings['maxiter']:
+        if max_evaluations is not None and len(values) >= max_evaluations:
+            break
+        moves = neighborhood(xval_current)
+        if not moves:
+            break
+        if delta is not None:
+            moves = sorted(moves, key=lambda move: delta(xval_current, move))
+        else:
+            moves = rng.sample(moves, len(moves))
+
+        best = None
+        n_evaluated = 0
+        for move in moves:
+            if n_evaluated == settings['sample_size']:
+                break
+            candidate = apply_move(xval_current, move)
+            key = tuple(candidate)
+            new_evaluation = key not in values
+            if new_evaluation and max_evaluations is not None and \
+                    len(values) >= max_evaluations:
+                break
+            fval = evaluate(candidate)
+            n_evaluated += new_evaluation
+            if fval is None:
+                continue
+            tabu = key in recent_set or any(
+                tabu_until.get((i, candidate[i]), -1) >= iter_count
+                for i in range(len(candidate))
+                if candidate[i] != xval_current[i])
+            # aspiration: a tabu move is taken when it beats the best
+            if tabu and fval >= fval_opt:
+                continue
+            if best is None or fval < best[0]:
+                best = (fval, candidate)
+        if best is None:
+            # every neighbour sampled is tabu: let the oldest ones go
+            if recent:
+                recent_set.discard(recent.popleft())
+            tabu_until.clear()
+            iter_count = iter_count + 1
+            history_xval.append(xval_current)
+            history_fval.append(fval_current)
+            continue
+
+        fval_proposed, xval_proposed = best
+        for i, (old, new) in enumerate(zip(xval_current, xval_proposed)):
+            if old != new:
+                tabu_until[(i, old)] = iter_count + settings['tenure']
+        recent.append(tuple(xval_proposed))
+        recent_set.add(tuple(xval_proposed))
+        while len(recent) > settings['tabu_size']:
+            recent_set.discard(recent.popleft())
+
+        xval_current, fval_current = xval_proposed, fval_proposed
+        if fval_current < fval_opt:
+            xval_opt, fval_opt = xval_current, fval_current
+        if verbose:
+            print("%d\t%s" % (iter_count, fval_current))
+        iter_count = iter_count + 1
+        history_xval.append(xval_current)
+        history_fval.append(fval_current)
+
+    return {
+        'fval_opt': fval_opt,
+        'xval_opt': xval_opt,
+        'total_iter': iter_count,
+        'history_xval': history_xval,
+        'history_fval': history_fval,
+        'n_evaluations': len(values)
+    }
@@ -0,0 +1,92 @@
+"""Tests for _tabu.py."""
+import random
+import unittest
+
+from _annealing import sa
+from _coplacement_test import build_grid
+from _placement import move_delta, placement_cost, program_interactions
+from _placement_test import PROGRAM
+from _tabu import apply_move, swap_relocate, tabu_search
+
+
+class TabuSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hardware = build_grid(bad_edges=[(1, 2), (5, 6)])
+        _, self.weights = program_interactions(PROGRAM)
+        self.calls = []
+
+        def objective(mapping):
+            self.calls.append(tuple(mapping))
+            return placement_cost(self.hardware, self.weights, mapping)
+        self.objective = objective
+        self.best = placement_cost(self.hardware, self.weights,
+                                   [4, 0, 1, 5, 9])
+        self.options = {'neighborhood': swap_relocate(self.hardware),
+                        'rng': random.Random(0)}
+
+    def test_moves(self):
+        self.assertEqual(apply_move([0, 1, 2], ('swap', 0, 2)), [2, 1, 0])
+        self.assertEqual(apply_move([0, 1, 2], ('relocate', 1, 5)),
+                         [0, 5, 2])
+        moves = swap_relocate(self.hardware)([0, 1])
+        self.assertIn(('swap', 0, 1), moves)
+        # free neighbours of 0 and 1 are 2, 4 and 5
+        self.assertEqual(len(moves), 1 + 2 * 3)
+
+    def test_results_like_sa(self):
+        result = tabu_search([0, 1, 2, 3, 7], self.objective, self.options)
+        random.seed(0)
+        annealed = sa([0, 1, 2, 3, 7], self.objective,
+                      {'init_T': 1, 'time_const': 25, 'step_perT': 10,
+                       'final_T': 0.01, 'maxiter': 10,
+                       'perturb': lambda x: x, 'verbose': False})
+        self.assertTrue(set(annealed) <= set(result))
+        self.assertAlmostEqual(result['fval_opt'], self.best)
+        self.assertEqual(len(result['history_xval']),
+                         result['total_iter'] + 1)
+        self.assertEqual(result['fval_opt'],
+                         min(result['history_fval']))
+
+    def test_no_repeated_evaluations(self):
+        self.calls = []
+        result = tabu_search([0, 1, 2, 3, 7], self.objective, self.options)
+        self.assertEqual(len(self.calls), len(set(self.calls)))
+        self.assertEqual(result['n_evaluations'], len(self.calls))
+
+    def test_max_evaluations(self):
+        options = dict(self.options, max_evaluations=25)
+        result = tabu_search([0, 1, 2, 3, 7], self.objective, options)
+        self.assertLessEqual(len(self.calls), 25)
+        self.assertEqual(result['n_evaluations'], len(self.calls))
+
+    def test_delta(self):
+        options = dict(self.options, max_evaluations=100, sample_size=3,
+                       delta=move_delta(self.hardware, self.weights))
+        result = tabu_search([0, 1, 2, 3, 7], self.objective, options)
+        self.assertAlmostEqual(result['fval_opt'], self.best)
+        self.assertLessEqual(result['n_evaluations'], 100)
+
+    def test_revisits_are_tabu(self):
+        # a recent mapping cannot beat the best one, so aspiration never
+        # takes the search back to it
+        result = tabu_search([0, 1, 2, 3, 7], self.objective,
+                             dict(self.options, maxiter=30, tabu_size=30))
+        history = [tuple(x) for x in result['history_xval']]
+        self.assertEqual(len(set(history)), len(history))
+
+    def test_failed_evaluations(self):
+        def objective(mapping):
+            if 5 in mapping:
+                raise ValueError('cannot compile')
+            return self.objective(mapping)
+        result = tabu_search([0, 1, 2, 3, 7], objective,
+                             dict(self.options, maxiter=50))
+        for mapping in result['history_xval']:
+            self.assertNotIn(5, mapping)
+        with self.assertRaises(ValueError):
+            tabu_search([5, 1], objective, self.options)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,360 @@
+""" SWAP sequences between qubit mappings, and per-segment allocation
+
+A mapping sends every program qubit to a hardware qubit. Moving the
+program qubits from one mapping to another is the token swapping
+problem on the coupling graph of the HardwareGraph: find a short
+sequence of SWAP gates on coupled qubits after which every token sits on
+its target. Hardware qubits holding no program qubit are free and end
+anywhere.
+
+Two approximations are computed and the cheaper one is returned:
+
+- greedy: the SWAP bringing the most tokens closer to their targets is
+  applied, the least costly one among equals; when none does, a token
+  is walked to its target along a shortest path;
+- tree: on a spanning tree of the most reliable couplings, the token of
+  a leaf is brought to it along the tree and the leaf is removed, which
+  always finishes in at most n(n-1)/2 SWAP gates.
+
+The cost of a SWAP is SWAP_GATES times minus the log of the fidelity of
+its coupling, so the sequence with the least cost has the best fidelity.
+
+allocate_segments cuts the allocation of a long circuit: every segment
+gets its own mapping when the SWAP gates of the transition are fewer
+than the routing SWAP gates saved, counted in two-qubit gates.
+"""
+from __future__ import absolute_import
+
+import numpy
+
+from _local_compiler import SWAP_GATES, parse_quil, route
+
+
+def swap_weights(hardware):
+    """Returns the cost of a SWAP gate on every coupling of
+    adjacency_list"""
+    fidelities = numpy.clip(
+        numpy.asarray(hardware.fidelity_list['two-qubit']['f2CZ'],
+                      dtype=float), 1e-12, 1.)
+    return -SWAP_GATES * numpy.log(fidelities)
+
+
+def swap_cost(hardware, swaps):
+    """Returns the total cost of a SWAP sequence"""
+    weights = swap_weights(hardware)
+    return float(sum(weights[hardware.edge_index(u, v)] for u, v in swaps))
+
+
+def apply_swaps(mapping, swaps):
+    """Returns the mapping after a sequence of SWAP gates"""
+    occupant = dict((p, q) for q, p in mapping.items())
+    for u, v in swaps:
+        a, b = occupant.pop(u, None), occupant.pop(v, None)
+        if a is not None:
+            occupant[v] = a
+        if b is not None:
+            occupant[u] = b
+    return dict((q, p) for p, q in occupant.items())
+
+
+def _check_mappings(hardware, source, target):
+    if set(source) != set(target):
+        raise ValueError('Both mappings must place the same qubits')
+    for mapping in (source, target):
+        if len(set(mapping.values())) != len(mapping):
+            raise ValueError('A mapping places two qubits together')
+    distances = hardware.distance_matrix()
+    for q in source:
+        d = distances[hardware.qubit_index(source[q]),
+                      hardware.qubit_index(target[q])]
+        if d == numpy.inf:
+            raise ValueError('Qubit {0} cannot move from {1} to {2}'
+                             .format(q, source[q], target[q]))
+
+
+def greedy_swaps(hardware, source, target, max_swaps=None):
+    """
+    Greedy SWAP sequence from source to target
+
+    Args:
+        hardware (HardwareGraph): device
+        source (dict): initial hardware qubit of every program qubit
+        target (dict): final hardware qubit of every program qubit
+        max_swaps (integer, optional): give up after that many SWAP
+            gates, 2 n^2 by default
+
+    Returns:
+        swaps (list): (u, v) couplings swapped in order, or None when
+            the search gave up
+    """
+    distances = hardware.distance_matrix()
+    weights = swap_weights(hardware)
+    if max_swaps is None:
+        max_swaps = 2 * hardware.nqubits ** 2
+
+    def distance(u, v):
+        return distances[hardware.qubit_index(u), hardware.qubit_index(v)]
+
+    position = dict(source)
+    occupant = dict((p, q) for q, p in position.items())
+
+    def gain(u, v):
+        total = 0
+        for here, there in ((u, v), (v, u)):
+            q = occupant.get(here)
+            if q is not None:
+                total += distance(here, target[q]) - \
+                    distance(there, target[q])
+        return total
+
+    swaps = []
+    while True:
+        pending = sorted(q for q in position if position[q] != target[q])
+        if not pending:
+            return swaps
+        if len(swaps) >= max_swaps:
+            return None
+        best = None
+        for edge, (u, v) in enumerate(hardware.adjacency_list):
+            g = gain(u, v)
+            if g > 0 and (best is None or
+                          (-g, weights[edge]) < (-best[0], weights[best[1]])):
+                best = (g, edge)
+        if best is not None:
+            path = [int(u) for u in hardware.adjacency_list[best[1]]]
+        else:
+            # no SWAP helps: walk one token to its target along the
+            # cheapest of the shortest paths
+            q = pending[0]
+            path = [position[q]]
+            while path[-1] != target[q]:
+                u = path[-1]
+                path.append(min(
+                    (w for w in hardware.neighbors(u)
+                     if distance(w, target[q]) < distance(u, target[q])),
+                    key=lambda w: (weights[hardware.edge_index(u, w)], w)))
+        for u, v in zip(path[:-1], path[1:]):
+            a, b = occupant.pop(u, None), occupant.pop(v, None)
+            if a is not None:
+                occupant[v] = a
+                position[a] = v
+            if b is not None:
+                occupant[u] = b
+                position[b] = u
+            swaps.append((u, v))
+
+
+def spanning_forest(hardware):
+    """
+    Returns the minimum spanning forest of the couplings weighted by
+    their SWAP cost, as the set of neighbours of every qubit
+    """
+    weights = swap_weights(hardware)
+    tree = dict((int(q), set()) for q in hardware.qubit_list)
+    visited = set()
+    for root in sorted(tree):
+        if root in visited:
+            continue
+        # Prim's algorithm from every qubit not reached yet
+        visited.add(root)
+        frontier = set((root, v) for v in hardware.neighbors(root))
+        while frontier:
+            frontier = set((u, v) for u, v in frontier if v not in visited)
+            if not frontier:
+                break
+            u, v = min(frontier, key=lambda e: (
+                weights[hardware.edge_index(*e)], e))
+            tree[u].add(v)
+            tree[v].add(u)
+            visited.add(v)
+            frontier.update((v, w) for w in hardware.neighbors(v))
+    return tree
+
+
+def _tree_path(tree, start, stop, alive):
+    """Returns the path from start to stop in a tree"""
+    parent = {start: None}
+    stack = [start]
+    while stack:
+        u = stack.pop()
+        for v in tree[u]:
+            if v in alive and v not in parent:
+                parent[v] = u
+                stack.append(v)
+    path = [stop]
+    while path[-1] != start:
+        path.append(parent[path[-1]])
+    return path[::-1]
+
+
+def tree_swaps(hardware, source, target):
+    """
+    SWAP sequence from source to target along a spanning tree
+
+    Args:
+        hardware (HardwareGraph): device
+        source (dict): initial hardware qubit of every program qubit
+        target (dict): final hardware qubit of every program qubit
+
+    Returns:
+        swaps (list): (u, v) couplings swapped in order
+    """
+    tree = spanning_forest(hardware)
+    alive = set(tree)
+    occupant = dict((p, q) for q, p in source.items())
+    wanted = dict((p, q) for q, p in target.items())
+    swaps = []
+    while alive:
+        leaf = min(q for q in alive
+                   if len([v for v in tree[q] if v in alive]) <= 1)
+        # the token wanted on the leaf, or None if it must be left free
+        token = wanted.get(leaf)
+        if occupant.get(leaf) != token:
+            start = next(p for p in _reachable(tree, leaf, alive)
+                         if occupant.get(p) == token)
+            path = _tree_path(tree, start, leaf, alive)
+            for u, v in zip(path[:-1], path[1:]):
+                a, b = occupant.pop(u, None), occupant.pop(v, None)
+                if a is not None:
+                    occupant[v] = a
+                if b is not None:
+                    occupant[u] = b
+                swaps.append((u, v))
+        alive.discard(leaf)
+    return swaps
+
+
+def _reachable(tree, start, alive):
+    """Returns the qubits of the tree of start, nearest first"""
+    order = [start]
+    seen = set(order)
+    for u in order:
+        for v in sorted(tree[u]):
+            if v in alive and v not in seen:
+                seen.add(v)
+                order.append(v)
+    return order
+
+
+def token_swaps(hardware, source, target):
+    """
+    Short SWAP sequence moving every program qubit from its source to
+    its target hardware qubit
+
+    Args:
+        hardware (HardwareGraph): device
+        source (dict): initial hardware qubit of every program qubit
+        target (dict): final hardware qubit of every program qubit
+
+    Returns:
+        swaps (list): (u, v) couplings swapped in order, the cheaper of
+            the greedy and tree sequences
+    """
+    _check_mappings(hardware, source, target)
+    candidates = [tree_swaps(hardware, source, target)]
+    greedy = greedy_swaps(hardware, source, target)
+    if greedy is not None:
+        candidates.insert(0, greedy)
+    return min(candidates, key=lambda swaps: (swap_cost(hardware, swaps),
+                                              len(swaps)))
+
+
+def two_qubit_gates(instructions):
+    """Returns the number of two-qubit gates, a SWAP counting as
+    SWAP_GATES"""
+    return sum(SWAP_GATES if name == 'SWAP' else 1
+               for name, _, qubits in instructions if len(qubits) == 2)
+
+
+def route_segment(hardware, instructions, mapping):
+    """
+    Route a segment from a mapping
+
+    Args:
+        hardware (HardwareGraph): device
+        instructions (list): instructions returned by parse_quil
+        mapping (dict): hardware qubit of every program qubit
+
+    Returns:
+        n_gates (integer): two-qubit gates of the routed segment
+        mapping (dict): hardware qubit of every program qubit at the
+            end of the segment
+    """
+    placed = [(name, parameters, tuple(mapping[q] for q in qubits))
+              for name, parameters, qubits in instructions]
+    routed, _, layout = route(placed, hardware, mapping.values(), True)
+    return two_qubit_gates(routed), dict((q, layout[p])
+                                         for q, p in mapping.items())
+
+
+def complete_mapping(hardware, mapping, previous):
+    """
+    Returns mapping completed with the program qubits of previous it
+    does not place, which keep their hardware qubit when it is free and
+    move to the nearest free one otherwise
+    """
+    distances = hardware.distance_matrix()
+    completed = dict(mapping)
+    used = set(completed.values())
+    for q in sorted(previous):
+        if q in completed:
+            continue
+        p = previous[q]
+        if p in used:
+            i = hardware.qubit_index(p)
+            free = [int(r) for r in hardware.qubit_list if r not in used]
+            if not free:
+                raise ValueError('The hardware has too few qubits')
+            p = min(free, key=lambda r: (
+                distances[i, hardware.qubit_index(r)], r))
+        completed[q] = p
+        used.add(p)
+    return completed
+
+
+def allocate_segments(hardware, segments, allocate, initial=None):
+    """
+    Allocate every segment of a circuit, moving the program qubits
+    between segments when it saves two-qubit gates
+
+    Args:
+        hardware (HardwareGraph): device
+        segments (list): Quil texts of the successive segments
+        allocate (callable): returns the mapping of the qubits of a
+            Quil text, e.g. the 'mapping' of
+            _allocation_service.DeviceState.allocate
+        initial (dict, optional): mapping of all the program qubits
+            kept when reallocating saves nothing, by default the
+            allocation of the whole circuit
+
+    Returns:
+        plan (list): one dictionary per segment
+            'mapping': mapping the segment starts from
+            'swaps': SWAP gates moving to it from the end of the
+                previous segment
+            'two_qubit_gates': two-qubit gates of the routed segment
+            'reallocated': whether the segment got its own mapping
+    """
+    if initial is None:
+        initial = allocate(''.join(text if text.endswith('\n')
+                                   else text + '\n' for text in segments))
+    current = dict(initial)
+    plan = []
+    for n, text in enumerate(segments):
+        instructions = parse_quil(text)
+        n_gates, end = route_segment(hardware, instructions, current)
+        step = {'mapping': current, 'swaps': [], 'two_qubit_gates': n_gates,
+                'reallocated': False}
+        candidate = complete_mapping(hardware, allocate(text), current)
+        if candidate != current:
+            # the first segment is placed for free
+            swaps = token_swaps(hardware, current, candidate) if n else []
+            moved_gates, moved_end = route_segment(hardware, instructions,
+                                                   candidate)
+            if SWAP_GATES * len(swaps) + moved_gates < n_gates:
+                step = {'mapping': candidate, 'swaps': swaps,
+                        'two_qubit_gates': moved_gates, 'reallocated': True}
+                end = moved_end
+        plan.append(step)
+        current = end
+    return plan
@@ -0,0 +1,125 @@
+"""Tests for _token_swapping.py."""
+import itertools
+import random
+import unittest
+
+from _local_compiler import parse_quil
+from _local_compiler_test import build_line
+from _token_swapping import (allocate_segments,
+                             apply_swaps,
+                             complete_mapping,
+                             greedy_swaps,
+                             route_segment,
+                             swap_cost,
+                             token_swaps,
+                             tree_swaps)
+from hardwaregraph import HardwareGraph
+
+
+def build_grid(f2CZ):
+    """ 3x3 grid with given two-qubit fidelities"""
+    edges = [(3 * r + c, 3 * r + c + 1) for r in range(3) for c in range(2)]
+    edges += [(3 * r + c, 3 * r + c + 3) for r in range(2) for c in range(3)]
+    fidelity_list = {
+        'single_qubit': {'f1QRB': [0.99] * 9, 'f1RO': [0.95] * 9},
+        'two-qubit': {'f2CZ': list(f2CZ), 'f2CPHASE': [1.] * len(edges)}
+    }
+    return HardwareGraph(list(range(9)), edges, fidelity_list)
+
+
+def brute_force_allocate(hardware):
+    """Allocator trying every placement on the hardware"""
+    def allocate(text):
+        instructions = parse_quil(text)
+        qubits = sorted(set(q for _, _, qs in instructions for q in qs))
+        placements = itertools.permutations(
+            [int(q) for q in hardware.qubit_list], len(qubits))
+        return min((dict(zip(qubits, p)) for p in placements),
+                   key=lambda m: route_segment(hardware, instructions,
+                                               m)[0])
+    return allocate
+
+
+class TokenSwappingTest(unittest.TestCase):
+
+    def test_line(self):
+        line = build_line(4)
+        self.assertEqual(token_swaps(line, {0: 0, 1: 1}, {0: 1, 1: 0}),
+                         [(0, 1)])
+        # qubit 1 steps aside for qubit 0 and comes back
+        swaps = token_swaps(line, {0: 0, 1: 1}, {0: 2, 1: 1})
+        self.assertEqual(len(swaps), 3)
+        self.assertEqual(apply_swaps({0: 0, 1: 1}, swaps), {0: 2, 1: 1})
+
+    def test_random_mappings(self):
+        rng = random.Random(5)
+        grid = build_grid([rng.uniform(0.8, 0.99) for _ in range(12)])
+        for _ in range(200):
+            n = rng.randint(1, 9)
+            source = dict(zip(range(n), rng.sample(range(9), n)))
+            target = dict(zip(range(n), rng.sample(range(9), n)))
+            for method in (greedy_swaps, tree_swaps, token_swaps):
+                swaps = method(grid, source, target)
+                self.assertEqual(apply_swaps(source, swaps), target)
+                for u, v in swaps:
+                    self.assertIsNotNone(grid.edge_index(u, v))
+            # at most n(n-1)/2 SWAP gates on a tree of n qubits
+            self.assertLessEqual(len(tree_swaps(grid, source, target)), 36)
+
+    def test_fidelity_aware(self):
+        # the top row is poor, so 0 reaches 2 through the middle row
+        # and the best sequence avoids the poor couplings
+        f2CZ = [0.5, 0.5] + [0.99] * 10
+        grid = build_grid(f2CZ)
+        swaps = token_swaps(grid, {0: 0}, {0: 2})
+        self.assertEqual([tuple(sorted(swap)) for swap in swaps],
+                         [(0, 3), (3, 4), (4, 5), (2, 5)])
+        self.assertLess(swap_cost(grid, swaps),
+                        swap_cost(grid, [(0, 1), (1, 2)]))
+
+    def test_invalid(self):
+        line = build_line(4)
+        with self.assertRaises(ValueError):
+            token_swaps(line, {0: 0, 1: 1}, {0: 1})
+        with self.assertRaises(ValueError):
+            token_swaps(line, {0: 0, 1: 1}, {0: 1, 1: 1})
+
+
+class AllocateSegmentsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.line = build_line(4)
+        self.allocate = brute_force_allocate(self.line)
+
+    def test_complete_mapping(self):
+        self.assertEqual(complete_mapping(self.line, {0: 1, 2: 2},
+                                          {0: 0, 1: 1, 2: 2}),
+                         {0: 1, 1: 0, 2: 2})
+
+    def test_reallocation(self):
+        first = 'CNOT 0 1\nCNOT 1 2\n' * 3
+        # qubit 2 talks to both others, so it is better in the middle
+        second = 'CNOT 1 2\nCNOT 0 2\n' * 3
+        initial = {0: 0, 1: 1, 2: 2}
+        plan = allocate_segments(self.line, [first, second], self.allocate,
+                                 initial)
+        self.assertFalse(plan[0]['reallocated'])
+        self.assertEqual(plan[0]['two_qubit_gates'], 6)
+        self.assertTrue(plan[1]['reallocated'])
+        self.assertEqual(plan[1]['two_qubit_gates'], 6)
+        self.assertEqual(len(plan[1]['swaps']), 1)
+        self.assertEqual(apply_swaps(initial, plan[1]['swaps']),
+                         plan[1]['mapping'])
+        kept, _ = route_segment(self.line, parse_quil(second), initial)
+        self.assertGreater(kept, 6 + 3)
+
+    def test_no_reallocation(self):
+        text = 'CNOT 0 1\nCNOT 1 2\n'
+        plan = allocate_segments(self.line, [text, text], self.allocate)
+        self.assertEqual([step['reallocated'] for step in plan],
+                         [False, False])
+        self.assertEqual(plan[0]['mapping'], plan[1]['mapping'])
+
+
+if __name__ == '__main__':
+    unittest.main()
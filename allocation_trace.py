@@ -0,0 +1,224 @@
+# Headless recording of allocation convergence traces
+
+"""Recorder and summarizer for allocation convergence traces.
+
+A trace is a directory of ``.npy`` chunks. Each chunk is a structured array
+with one row per objective evaluation holding the evaluation index, the wall
+time since the recorder was created, the fidelity (or cost) returned by the
+evaluation, the best value seen so far and an id for the embedding that was
+evaluated. Rows are buffered in a fixed size array and written out chunk by
+chunk, so the memory footprint of a run does not grow with its length.
+"""
+
+import glob
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+
+
+TRACE_DTYPE = np.dtype([('evaluation', np.int64),
+                        ('wall_time', np.float64),
+                        ('fidelity', np.float64),
+                        ('best', np.float64),
+                        ('embedding_id', np.uint32)])
+
+CHUNK_PATTERN = 'chunk_{0:05d}.npy'
+
+
+def embedding_id(embedding):
+    """Returns a stable 32-bit id for an embedding
+
+    Args:
+        embedding (list): list of physical qubit labels
+
+    Returns:
+        id (int): CRC32 of the qubit labels. Unlike hash() it does not
+            change between processes, so ids can be compared across runs.
+    """
+    if embedding is None:
+        return 0
+    labels = np.asarray(embedding, dtype=np.int64)
+    return zlib.crc32(labels.tobytes()) & 0xffffffff
+
+
+def _chunk_files(directory):
+    return sorted(glob.glob(os.path.join(directory, 'chunk_*.npy')))
+
+
+class TraceRecorder(object):
+    """Writes the convergence trace of one allocation run to disk.
+
+    Attributes:
+        directory (string): directory holding the trace chunks
+        n_evaluations (integer): number of evaluations recorded so far
+        best (float): best value recorded so far
+    """
+
+    def __init__(self, directory, chunk_size=4096, maximize=True,
+                 overwrite=False):
+        """
+        Args:
+            directory (string): directory where chunks are written. It is
+                created if it does not exist.
+            chunk_size (integer): number of rows buffered before a chunk
+                is written
+            maximize (bool): whether larger values are better (fidelities)
+                or smaller ones are (costs such as swaps + depth)
+            overwrite (bool): remove chunks of a previous trace found in
+                directory instead of raising
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer.')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        old_chunks = _chunk_files(directory)
+        if old_chunks:
+            if not overwrite:
+                raise ValueError('{0} already contains a trace.'.format(
+                    directory))
+            for path in old_chunks:
+                os.remove(path)
+        self.directory = directory
+        self.maximize = maximize
+        self.n_evaluations = 0
+        self.best = -np.inf if maximize else np.inf
+        self._buffer = np.empty(chunk_size, dtype=TRACE_DTYPE)
+        self._n_buffered = 0
+        self._n_chunks = 0
+        self._start = time.time()
+
+    def record(self, fidelity, embedding=None):
+        """
+        Record the outcome of one objective evaluation
+
+        Args:
+            fidelity (float): value returned by the evaluation
+            embedding (list, optional): embedding that was evaluated
+
+        Returns:
+            best (float): best value recorded so far
+        """
+        if self.maximize:
+            self.best = max(self.best, fidelity)
+        else:
+            self.best = min(self.best, fidelity)
+        row = self._buffer[self._n_buffered]
+        row['evaluation'] = self.n_evaluations
+        row['wall_time'] = time.time() - self._start
+        row['fidelity'] = fidelity
+        row['best'] = self.best
+        row['embedding_id'] = embedding_id(embedding)
+        self._n_buffered += 1
+        self.n_evaluations += 1
+        if self._n_buffered == len(self._buffer):
+            self.flush()
+        return self.best
+
+    def flush(self):
+        """Write the buffered rows as a new chunk"""
+        if self._n_buffered == 0:
+            return
+        path = os.path.join(self.directory,
+                            CHUNK_PATTERN.format(self._n_chunks))
+        np.save(path, self._buffer[:self._n_buffered])
+        self._n_chunks += 1
+        self._n_buffered = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_trace(directory):
+    """Returns the full trace stored in a directory
+
+    Args:
+        directory (string): directory written by a TraceRecorder
+
+    Returns:
+        trace (numpy.ndarray): structured array with TRACE_DTYPE rows
+    """
+    chunks = [np.load(path) for path in _chunk_files(directory)]
+    if not chunks:
+        return np.empty(0, dtype=TRACE_DTYPE)
+    return np.concatenate(chunks)
+
+
+def _trace_length(directory):
+    return sum(len(np.load(path, mmap_mode='r'))
+               for path in _chunk_files(directory))
+
+
+def summarize_traces(directories, length=None):
+    """Averages the best-so-far curves of many trials
+
+    Traces shorter than the summary length are padded with their final
+    best value, which is what the run would have reported had it kept
+    going without improvement. Only one trace is loaded at a time.
+
+    Args:
+        directories (list): trace directories, one per trial
+        length (integer, optional): number of evaluations to summarize.
+            Defaults to the length of the longest trace.
+
+    Returns:
+        summary (dict):
+            'evaluation': evaluation indexes
+            'mean_best': mean of best-so-far over trials
+            'std_best': standard deviation of best-so-far over trials
+            'min_best', 'max_best': envelope of best-so-far
+            'mean_wall_time': mean wall time per trial
+            'n_trials': number of non-empty traces
+    """
+    if length is None:
+        length = max([_trace_length(d) for d in directories] + [0])
+    total = np.zeros(length)
+    total_sq = np.zeros(length)
+    lowest = np.full(length, np.inf)
+    highest = np.full(length, -np.inf)
+    wall_times = []
+    for directory in directories:
+        trace = load_trace(directory)
+        if len(trace) == 0:
+            continue
+        best = trace['best'][:length]
+        if len(best) < length:
+            best = np.concatenate([best,
+                                   np.full(length - len(best), best[-1])])
+        total += best
+        total_sq += best * best
+        np.minimum(lowest, best, out=lowest)
+        np.maximum(highest, best, out=highest)
+        wall_times.append(trace['wall_time'][-1])
+    n_trials = len(wall_times)
+    mean = total / max(n_trials, 1)
+    variance = np.maximum(total_sq / max(n_trials, 1) - mean * mean, 0.)
+    return {
+        'evaluation': np.arange(length),
+        'mean_best': mean,
+        'std_best': np.sqrt(variance),
+        'min_best': lowest,
+        'max_best': highest,
+        'mean_wall_time': np.mean(wall_times) if wall_times else 0.,
+        'n_trials': n_trials
+    }
+
+
+if __name__ == "__main__":
+    # Print the averaged convergence of the traces given on the command line
+    summary = summarize_traces(sys.argv[1:])
+    step = max(len(summary['evaluation']) // 20, 1)
+    print("Trials: {0}\tMean wall time: {1:.2f}s".format(
+        summary['n_trials'], summary['mean_wall_time']))
+    print("Eval\tMean\tStd")
+    for i in range(0, len(summary['evaluation']), step):
+        print("{0}\t{1:.4f}\t{2:.4f}".format(i, summary['mean_best'][i],
+                                             summary['std_best'][i]))
@@ -0,0 +1,122 @@
+"""Tests for allocation_trace.py."""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from allocation_trace import (TRACE_DTYPE, TraceRecorder, embedding_id,
+                              load_trace, summarize_traces)
+
+
+class TraceRecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def trace(self, name, values, **kwargs):
+        directory = os.path.join(self.root, name)
+        with TraceRecorder(directory, **kwargs) as recorder:
+            for value in values:
+                recorder.record(value, [0, 1])
+        return directory
+
+    def chunks(self, directory):
+        return sorted(name for name in os.listdir(directory)
+                      if name.startswith('chunk_'))
+
+    def test_flushes_full_chunks(self):
+        directory = os.path.join(self.root, 'trace')
+        recorder = TraceRecorder(directory, chunk_size=3)
+        for value in [.1, .3, .2, .5]:
+            recorder.record(value)
+        # the fourth row is still buffered
+        self.assertEqual(self.chunks(directory), ['chunk_00000.npy'])
+        recorder.close()
+        self.assertEqual(self.chunks(directory),
+                         ['chunk_00000.npy', 'chunk_00001.npy'])
+        self.assertEqual(recorder.n_evaluations, 4)
+
+    def test_load_trace(self):
+        directory = self.trace('trace', [.1, .3, .2, .5], chunk_size=3)
+        trace = load_trace(directory)
+        self.assertEqual(trace.dtype, TRACE_DTYPE)
+        np.testing.assert_array_equal(trace['evaluation'], [0, 1, 2, 3])
+        np.testing.assert_allclose(trace['fidelity'], [.1, .3, .2, .5])
+        np.testing.assert_allclose(trace['best'], [.1, .3, .3, .5])
+        self.assertTrue(np.all(trace['embedding_id'] == embedding_id([0, 1])))
+        self.assertTrue(np.all(np.diff(trace['wall_time']) >= 0))
+
+    def test_minimize(self):
+        trace = load_trace(self.trace('trace', [5, 3, 4], maximize=False))
+        np.testing.assert_allclose(trace['best'], [5, 3, 3])
+
+    def test_empty_trace(self):
+        directory = self.trace('trace', [])
+        self.assertEqual(self.chunks(directory), [])
+        self.assertEqual(len(load_trace(directory)), 0)
+
+    def test_overwrite(self):
+        directory = self.trace('trace', [.1, .2, .3], chunk_size=1)
+        with self.assertRaises(ValueError):
+            TraceRecorder(directory)
+        self.trace('trace', [.9], overwrite=True)
+        self.assertEqual(self.chunks(directory), ['chunk_00000.npy'])
+        np.testing.assert_allclose(load_trace(directory)['fidelity'], [.9])
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            TraceRecorder(os.path.join(self.root, 'trace'), chunk_size=0)
+
+    def test_embedding_id(self):
+        self.assertEqual(embedding_id(None), 0)
+        self.assertEqual(embedding_id([3, 1]), embedding_id((3, 1)))
+        self.assertNotEqual(embedding_id([3, 1]), embedding_id([1, 3]))
+
+
+class SummarizeTracesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def trace(self, name, values):
+        directory = os.path.join(self.root, name)
+        with TraceRecorder(directory, chunk_size=2) as recorder:
+            for value in values:
+                recorder.record(value)
+        return directory
+
+    def test_pads_short_traces(self):
+        directories = [self.trace('a', [.2, .6, .4, .8]),
+                       self.trace('b', [.4])]
+        summary = summarize_traces(directories)
+        self.assertEqual(summary['n_trials'], 2)
+        np.testing.assert_array_equal(summary['evaluation'], [0, 1, 2, 3])
+        # b keeps its final best value .4
+        np.testing.assert_allclose(summary['mean_best'], [.3, .5, .5, .6])
+        np.testing.assert_allclose(summary['std_best'], [.1, .1, .1, .2])
+        np.testing.assert_allclose(summary['min_best'], [.2, .4, .4, .4])
+        np.testing.assert_allclose(summary['max_best'], [.4, .6, .6, .8])
+
+    def test_length(self):
+        directories = [self.trace('a', [.2, .6, .4, .8]),
+                       self.trace('b', [.4])]
+        summary = summarize_traces(directories, length=2)
+        np.testing.assert_allclose(summary['mean_best'], [.3, .5])
+
+    def test_skips_empty_traces(self):
+        directories = [self.trace('a', [.2, .6]), self.trace('b', [])]
+        summary = summarize_traces(directories)
+        self.assertEqual(summary['n_trials'], 1)
+        np.testing.assert_allclose(summary['mean_best'], [.2, .6])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,23 @@
-from pyquil.api import QVMConnection, CompilerConnection, get_devices
+from pyquil.api import QVMConnection
 from pyquil.quil import Pragma, Program, shift_quantum_gates
 from pyquil.gates import CNOT, H, RZ, RX
 import random
-import matplotlib.pyplot as plt
 import numpy as np
 
+from allocation_trace import TraceRecorder, summarize_traces
+from _compiler_pool import CompilerPool
+from _placement import program_interactions, greedy_placement
+
+# shared compiler connections to the 19Q-Acorn device, looked up once
+compiler_pool = CompilerPool(device_name='19Q-Acorn')
+
+# highest fidelity found by the current trial, reset by the caller
+global_mx = 0.
+
+# compilations without a fidelity estimate are retried by the pool
+def check_fidelity(job):
+    job.program_fidelity()
+
 
 # create a random embedding of 19 qubits
 # built specifically for Rigetti 19 qubit machine
@@ -14,6 +27,15 @@ def create(n):
     random.shuffle(qubits)
     return qubits[:n]
 
+# embedding of a program chosen by a placement heuristic of _placement on a
+# HardwareGraph, e.g. Hardware_load('19Q-Acorn.json', {'org': 'Rigetti'}),
+# followed by the other qubits of create so that mix can still use them
+def place(program, hardware, method=greedy_placement):
+    _, weights = program_interactions(program.out(),
+                                      list(program.get_qubits()))
+    embedding = method(hardware, weights)
+    return embedding + [q for q in create(19) if q not in embedding]
+
 # takes a desired embedding and returns a new program with that embedding
 def change(program, embedding):
     p_str = program.out()
@@ -41,95 +63,78 @@ def mix(embedding, sens):
     return embedding
 
 # check 10 random embeddings, run sens/0.05 additional tests, output hightest fidelity
-def max_fid(program, embedding, sens):
+# every fidelity obtained is written to recorder (a TraceRecorder) when given
+def max_fid(program, embedding, sens, recorder=None):
     global global_mx
-    devices = get_devices(as_dict=True)
-    acorn = devices['19Q-Acorn']
-    compiler = CompilerConnection(acorn)
     
     while True:
-        p = change(program, embedding)
-        job_id = compiler.compile_async(p)
-        job = compiler.wait_for_job(job_id)
         if sens <= 0:
             return global_mx
-        else:
-            try:
-                fid = job.program_fidelity()
-                print("fid:", fid)
-                break
-            except:
-                sens -= .05
-                continue
-        mx = max(fid, max_fid(program, mix(embedding, sens), sens - .05))
-        global_mx = max(global_mx, mx)
-        max_list.append(global_mx)
-        return mx
+        p = change(program, embedding)
+        try:
+            job = compiler_pool.compile(p, check_fidelity)
+        except Exception:
+            # still failing after the retries of the pool
+            sens -= .05
+            continue
+        fid = job.program_fidelity()
+        print("fid:", fid)
+        if recorder is not None:
+            recorder.record(fid, embedding)
+        break
+    mx = max(fid, max_fid(program, mix(embedding, sens), sens - .05,
+                          recorder))
+    global_mx = max(global_mx, mx)
+    return mx
     
 # uses Rigetti QPU to estimate fidelity, and returns the best allocation found
-def allocator(program):
-    devices = get_devices(as_dict=True)
-    acorn = devices['19Q-Acorn']
-    compiler = CompilerConnection(acorn)
+# initial embeddings (e.g. from place) are tried before the random ones
+def allocator(program, recorder=None, initial=()):
     res = []
     res_embed = []
+    initial = [list(embedding) for embedding in initial]
     i = 0
     while i <= 10:
-        embedding = create(19)
+        embedding = initial.pop(0) if initial else create(19)
         
         p = change(program, embedding)
-        job_id = compiler.compile_async(p)
-        job = compiler.wait_for_job(job_id)
         print(embedding)
         try:
-            fid = job.program_fidelity()
-        
-            print('fid:', fid)
-            global global_mx
-            global_mx = max(global_mx, fid)
-            max_list.append(global_mx)
-
-            res.append(fid)
-            res_embed.append(embedding)
-            i += 1
-        except:
-            fid = 0
+            job = compiler_pool.compile(p, check_fidelity)
+        except Exception:
             continue
+        fid = job.program_fidelity()
+    
+        print('fid:', fid)
+        global global_mx
+        global_mx = max(global_mx, fid)
+        if recorder is not None:
+            recorder.record(fid, embedding)
+
+        res.append(fid)
+        res_embed.append(embedding)
+        i += 1
     mx = max(res)
     mx_embed = res_embed[res.index(mx)]    
-    return max_fid(program, mx_embed, 1), mx_embed
-
-# Test on a randomly generated circuit 5 times to show average trend
-program = Program(CNOT (9, 14),RZ (-0.743043, 14),CNOT (9, 14),CNOT (12, 16),RZ (-0.743043, 16),CNOT (12, 16),CNOT (16, 2))
-
-max_lists = []
-for i in range(5):
-    global global_mx
-    global_mx = 0.
-    global max_lst 
-    max_list = []
-
-    allocator(program)
-    max_lists.append(max_list)
-
-# change in fidelity over time
-plt.figure(figsize=(9, 6))  
-plt.xlabel('# calls to compiler', fontsize=16)  
-plt.ylabel('maximum fidelity', fontsize=16)  
-plt.title('Change in fidelity over time', fontsize=22)  
-
-for lst in max_lists:
-    plt.plot(lst)
-
-plt.show()
-
-# average change in fidelity over time
-plt.figure(figsize=(9, 6))  
-
-plt.plot(np.mean(np.array(max_lists), axis=0), 'b')
-
-plt.xlabel('# calls to compiler', fontsize=16)  
-plt.ylabel('maximum fidelity', fontsize=16)  
-plt.title('Change in fidelity over time (Average of 10 trials)', fontsize=22)  
-
-plt.show()
+    return max_fid(program, mx_embed, 1, recorder), mx_embed
+
+if __name__ == "__main__":
+    # Test on a randomly generated circuit 5 times to show average trend.
+    # Each trial writes its convergence trace under traces/; summarize them
+    # (or the traces of many more trials) with allocation_trace.py
+    program = Program(CNOT (9, 14),RZ (-0.743043, 14),CNOT (9, 14),CNOT (12, 16),RZ (-0.743043, 16),CNOT (12, 16),CNOT (16, 2))
+
+    trace_dirs = []
+    for i in range(5):
+        global_mx = 0.
+        trace_dir = 'traces/trial_{0}'.format(i)
+        with TraceRecorder(trace_dir, overwrite=True) as recorder:
+            allocator(program, recorder)
+        trace_dirs.append(trace_dir)
+
+    # average change in fidelity over time
+    summary = summarize_traces(trace_dirs)
+    print("# calls to compiler\tmaximum fidelity (average of {0} trials)".format(
+        summary['n_trials']))
+    for n, fid in zip(summary['evaluation'], summary['mean_best']):
+        print("{0}\t{1}".format(n, fid))
@@ -1,6 +1,10 @@
 # Define the basic classes needed for hardware embedding
 
-from numpy import zeros
+from collections import deque
+
+from numpy import full, inf, zeros
+
+from _fingerprint import element_hash
 
 class HardwareGraph():
 	"""
@@ -51,6 +55,347 @@ class HardwareGraph():
 		self.qubit_list = qubit_list
 		self.adjacency_list = adjacency_list
 		self.fidelity_list = fidelity_list
+		self._topology_hash = None
+		self._fidelity_hash = None
+		self._qubit_indexes = None
+		self._edge_indexes = None
+		self._neighbors = None
+		self._distances = None
+		self._automorphisms = {}
+		self._orbits = {}
+		self._order = None
+
+	def neighbors(self, qubit):
+		"""
+		Returns the set of qubits coupled to a qubit.
+		"""
+		if self._neighbors is None:
+			self._neighbors = dict((int(q), set()) for q in\
+				self.qubit_list)
+			for u, v in self.adjacency_list:
+				self._neighbors.setdefault(int(u), set()).add(int(v))
+				self._neighbors.setdefault(int(v), set()).add(int(u))
+		return self._neighbors.get(int(qubit), set())
+
+	def connected_subgraph(self, start, size, exclude=()):
+		"""
+		Returns up to size qubits of a connected subgraph grown by depth
+		first search from a qubit, avoiding some qubits.
+
+		Args:
+			start: qubit the search starts from
+			size: number of qubits wanted
+			exclude: qubits which cannot be part of the subgraph
+		"""
+		exclude = set(exclude)
+		visited = []
+		if int(start) in exclude:
+			return visited
+		stack = [int(start)]
+		seen = set(stack)
+		while stack and len(visited) < size:
+			q = stack.pop()
+			visited.append(q)
+			for p in sorted(self.neighbors(q), reverse=True):
+				if p not in seen and p not in exclude:
+					seen.add(p)
+					stack.append(p)
+		return visited
+
+	def distance_matrix(self):
+		"""
+		Returns the matrix of the number of couplings on the shortest path
+		between every pair of qubits, indexed by position in qubit_list.
+		Disconnected pairs are at distance inf.
+		"""
+		if self._distances is None:
+			distances = full((self.nqubits, self.nqubits), inf)
+			for i, source in enumerate(self.qubit_list):
+				# breadth first search from every qubit
+				distances[i, i] = 0
+				queue = deque([int(source)])
+				while queue:
+					u = queue.popleft()
+					d = distances[i, self.qubit_index(u)]
+					for v in self.neighbors(u):
+						if v not in self._qubit_indexes:
+							continue
+						j = self.qubit_index(v)
+						if distances[i, j] == inf:
+							distances[i, j] = d + 1
+							queue.append(v)
+			self._distances = distances
+		return self._distances
+
+	def _same_fidelities(self, group, i, j, tolerance):
+		"""
+		Returns whether entries i and j of every fidelity of a group
+		differ by at most tolerance.
+		"""
+		for values in self.fidelity_list[group].values():
+			if abs(values[i] - values[j]) > tolerance:
+				return False
+		return True
+
+	def _search_order(self):
+		"""
+		Returns the qubits in breadth first order, so that every qubit
+		but the first of a component has a neighbour before it.
+		"""
+		if self._order is None:
+			qubits = set(int(q) for q in self.qubit_list)
+			order = []
+			seen = set()
+			for root in [int(q) for q in self.qubit_list]:
+				if root in seen:
+					continue
+				order.append(root)
+				seen.add(root)
+				k = len(order) - 1
+				while k < len(order):
+					for v in sorted(self.neighbors(order[k])):
+						if v in qubits and v not in seen:
+							order.append(v)
+							seen.add(v)
+					k += 1
+			self._order = order
+		return self._order
+
+	def _automorphism_search(self, tolerance, fixed=()):
+		"""
+		Yields by backtracking the permutations of the qubits preserving
+		the couplings and sending every qubit u of the pairs (u, p) of
+		fixed to p, each as a tuple holding the image of every qubit of
+		qubit_list.
+
+		Args:
+			tolerance: fidelity tolerance, see automorphisms
+			fixed: (qubit, image) pairs
+		"""
+		qubits = [int(q) for q in self.qubit_list]
+		members = set(qubits)
+		order = self._search_order()
+		image = {}
+		preimage = {}
+
+		def candidates(v):
+			placed = [w for w in self.neighbors(v) if w in image]
+			if placed:
+				return self.neighbors(image[placed[0]])
+			return qubits
+
+		def fits(v, p):
+			if p in preimage or p not in members or\
+				len(self.neighbors(v)) != len(self.neighbors(p)):
+				return False
+			mapped = [w for w in self.neighbors(v) if w in image]
+			if len([w for w in self.neighbors(p) if w in\
+				preimage]) != len(mapped):
+				return False
+			for w in mapped:
+				if image[w] not in self.neighbors(p):
+					return False
+			if tolerance is None:
+				return True
+			if not self._same_fidelities('single_qubit',\
+				self.qubit_index(v), self.qubit_index(p),\
+				tolerance):
+				return False
+			for w in mapped:
+				if not self._same_fidelities('two-qubit',\
+					self.edge_index(v, w),\
+					self.edge_index(p, image[w]), tolerance):
+					return False
+			return True
+
+		def extend(k):
+			if k == len(order):
+				yield tuple(image[q] for q in qubits)
+				return
+			v = order[k]
+			if v in image:
+				for sigma in extend(k + 1):
+					yield sigma
+				return
+			for p in sorted(candidates(v)):
+				if fits(v, p):
+					image[v] = p
+					preimage[p] = v
+					for sigma in extend(k + 1):
+						yield sigma
+					del image[v]
+					del preimage[p]
+
+		for v, p in fixed:
+			v, p = int(v), int(p)
+			if v in image or not fits(v, p):
+				return
+			image[v] = p
+			preimage[p] = v
+		for sigma in extend(0):
+			yield sigma
+
+	def automorphisms(self, tolerance=None, limit=None):
+		"""
+		Returns the permutations of the qubits preserving the couplings,
+		computed once. Each one is a tuple holding the image of every
+		qubit of qubit_list, the identity being the first. The group
+		can be very large (n! on a fully connected device), so
+		canonical_mapping does not enumerate it.
+
+		Args:
+			tolerance: if None, the fidelities are ignored. Otherwise
+				every qubit and coupling must be sent to one whose
+				fidelities differ by at most tolerance.
+			limit: raise ValueError rather than enumerating more
+				than limit permutations
+		"""
+		if tolerance not in self._automorphisms:
+			qubits = tuple(int(q) for q in self.qubit_list)
+			found = []
+			for sigma in self._automorphism_search(tolerance):
+				if limit is not None and len(found) == limit:
+					raise ValueError('The hardware has more than '\
+						'{0} automorphisms'.format(limit))
+				if sigma != qubits:
+					found.append(sigma)
+			self._automorphisms[tolerance] = [qubits] + found
+		return self._automorphisms[tolerance]
+
+	def orbits(self, tolerance=None):
+		"""
+		Returns the orbit of every qubit under the automorphisms, the
+		sorted list of the qubits it can be sent to, computed once
+		without enumerating the group.
+
+		Args:
+			tolerance: fidelity tolerance, see automorphisms
+		"""
+		if tolerance not in self._orbits:
+			qubits = sorted(int(q) for q in self.qubit_list)
+			orbit = {}
+			for q in qubits:
+				if q in orbit:
+					continue
+				orbit[q] = [q]
+				for p in qubits:
+					if p not in orbit and next(\
+						self._automorphism_search(tolerance,\
+						[(q, p)]), None) is not None:
+						orbit[q].append(p)
+						orbit[p] = orbit[q]
+			self._orbits[tolerance] = orbit
+		return self._orbits[tolerance]
+
+	def canonical_mapping(self, mapping, tolerance=None):
+		"""
+		Returns the smallest image of a mapping under the automorphisms,
+		so that two mappings related by a symmetry of the hardware have
+		the same canonical mapping. The image of every qubit of the
+		mapping in turn is the smallest one which a symmetry can send
+		it to, given the images chosen before, so the group is never
+		enumerated.
+
+		Args:
+			mapping: list of the physical qubits of the logical qubits
+			tolerance: fidelity tolerance, see automorphisms
+		"""
+		orbit = self.orbits(tolerance)
+		if all(len(images) == 1 for images in orbit.values()):
+			# no symmetry but the identity
+			return [orbit[int(q)][0] for q in mapping]
+		fixed = []
+		for q in mapping:
+			used = set(p for _, p in fixed)
+			for p in orbit[int(q)]:
+				if p in used:
+					continue
+				if next(self._automorphism_search(tolerance,\
+					fixed + [(q, p)]), None) is not None:
+					break
+			fixed.append((int(q), p))
+		return [p for _, p in fixed]
+
+	def qubit_index(self, qubit):
+		"""
+		Returns the position of a qubit in qubit_list, i.e. the index of
+		its single qubit fidelities.
+		"""
+		if self._qubit_indexes is None:
+			self._qubit_indexes = dict((int(q), i) for i, q in\
+				enumerate(self.qubit_list))
+		return self._qubit_indexes[int(qubit)]
+
+	def edge_index(self, u, v):
+		"""
+		Returns the position of the pair (u,v) or (v,u) in adjacency_list,
+		i.e. the index of its two-qubit fidelities, or None when the
+		qubits are not coupled.
+		"""
+		if self._edge_indexes is None:
+			self._edge_indexes = {}
+			for i, (a, b) in enumerate(self.adjacency_list):
+				self._edge_indexes.setdefault((int(a), int(b)), i)
+				self._edge_indexes.setdefault((int(b), int(a)), i)
+		return self._edge_indexes.get((int(u), int(v)))
+
+	def topology_fingerprint(self):
+		"""
+		Returns a 64-bit hash of the qubits and couplings of the hardware.
+		"""
+		if self._topology_hash is None:
+			self._topology_hash = element_hash('topology',
+				[int(q) for q in self.qubit_list],
+				[(int(u), int(v)) for u,v in self.adjacency_list])
+		return self._topology_hash
+
+	def fidelity_fingerprint(self):
+		"""
+		Returns a 64-bit hash of the fidelities of the hardware. It is the
+		sum (mod 2^64) of one hash per fidelity value, so set_fidelity
+		updates it without rehashing the other values.
+		"""
+		if self._fidelity_hash is None:
+			total = 0
+			for group in self.fidelity_list:
+				for name in self.fidelity_list[group]:
+					for index, value in enumerate(\
+						self.fidelity_list[group][name]):
+						total += element_hash(group, name, index,\
+							float(value))
+			self._fidelity_hash = total % 2**64
+		return self._fidelity_hash
+
+	def fingerprint(self):
+		"""
+		Returns a stable hexadecimal hash of the topology and fidelities.
+		"""
+		return '%016x%016x' % (self.topology_fingerprint(),\
+			self.fidelity_fingerprint())
+
+	def set_fidelity(self, group, name, index, value):
+		"""
+		Change one calibration value, keeping the fingerprint up to date.
+
+		Args:
+			group: 'single_qubit' or 'two-qubit'
+			name: name of the fidelity, e.g. 'f1QRB' or 'f2CZ'
+			index: position of the qubit in qubit_list, or of the
+				pair in adjacency_list
+			value: new fidelity
+		"""
+		values = self.fidelity_list[group][name]
+		old_value = values[index]
+		values[index] = value
+		# only the automorphisms ignoring the fidelities are still valid
+		self._automorphisms = dict((tolerance, group) for tolerance, group\
+			in self._automorphisms.items() if tolerance is None)
+		self._orbits = dict((tolerance, orbit) for tolerance, orbit\
+			in self._orbits.items() if tolerance is None)
+		if self._fidelity_hash is not None:
+			self._fidelity_hash = (self._fidelity_hash -\
+				element_hash(group, name, index, float(old_value)) +\
+				element_hash(group, name, index, float(value))) % 2**64
 
 def Hardware_load(input_file, options):
 	"""
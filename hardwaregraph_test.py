@@ -0,0 +1,116 @@
+"""Tests for hardwaregraph.py."""
+import unittest
+
+from _coplacement_test import build_grid
+from hardwaregraph import HardwareGraph
+
+
+def build_line(n=4):
+    """ Line of n qubits with distinct fidelities"""
+    edges = [(q, q + 1) for q in range(n - 1)]
+    fidelity_list = {
+        'single_qubit': {'f1QRB': [0.99 - 0.01 * q for q in range(n)],
+                         'f1RO': [0.95] * n},
+        'two-qubit': {'f2CZ': [0.9 - 0.01 * e for e in range(n - 1)],
+                      'f2CPHASE': [1.] * (n - 1)}
+    }
+    return HardwareGraph(list(range(n)), edges, fidelity_list)
+
+
+def build_graph(n, edges):
+    """ HardwareGraph of n qubits with uniform fidelities"""
+    fidelity_list = {
+        'single_qubit': {'f1QRB': [0.99] * n},
+        'two-qubit': {'f2CZ': [0.9] * len(edges)}
+    }
+    return HardwareGraph(list(range(n)), edges, fidelity_list)
+
+
+class HardwareFingerprintTest(unittest.TestCase):
+
+    def test_stable(self):
+        self.assertEqual(build_line().fingerprint(),
+                         build_line().fingerprint())
+        self.assertNotEqual(build_line(4).topology_fingerprint(),
+                            build_line(5).topology_fingerprint())
+
+    def test_set_fidelity(self):
+        hardware = build_line()
+        before = hardware.fingerprint()
+        hardware.set_fidelity('two-qubit', 'f2CZ', 1, 0.5)
+        hardware.set_fidelity('single_qubit', 'f1RO', 3, 0.8)
+        # updated incrementally, as if computed from scratch
+        fresh = HardwareGraph(hardware.qubit_list, hardware.adjacency_list,
+                              hardware.fidelity_list)
+        self.assertEqual(hardware.fingerprint(), fresh.fingerprint())
+        self.assertNotEqual(hardware.fingerprint(), before)
+        self.assertEqual(hardware.topology_fingerprint(),
+                         build_line().topology_fingerprint())
+        # back to the original calibration
+        hardware.set_fidelity('two-qubit', 'f2CZ', 1, 0.89)
+        hardware.set_fidelity('single_qubit', 'f1RO', 3, 0.95)
+        self.assertEqual(hardware.fingerprint(), before)
+
+    def test_set_fidelity_before_fingerprint(self):
+        hardware = build_line()
+        hardware.set_fidelity('single_qubit', 'f1QRB', 0, 0.5)
+        fresh = build_line()
+        fresh.fidelity_list['single_qubit']['f1QRB'][0] = 0.5
+        self.assertEqual(hardware.fingerprint(), fresh.fingerprint())
+
+
+class HardwareSymmetryTest(unittest.TestCase):
+
+    def test_automorphisms(self):
+        hardware = build_grid(bad_edges=[(1, 2)])
+        # mirror images of the rectangle
+        group = hardware.automorphisms()
+        self.assertEqual(len(group), 4)
+        self.assertEqual(group[0], tuple(range(12)))
+        self.assertIn((3, 2, 1, 0, 7, 6, 5, 4, 11, 10, 9, 8), group)
+        # only the left-right mirror keeps the bad coupling in place
+        self.assertEqual(len(hardware.automorphisms(1e-9)), 2)
+        self.assertEqual(len(hardware.automorphisms(0.5)), 4)
+        self.assertEqual(len(build_grid(3, 3).automorphisms()), 8)
+
+    def test_canonical_mapping(self):
+        hardware = build_grid(bad_edges=[(1, 2)])
+        self.assertEqual(hardware.canonical_mapping([11, 10, 6]),
+                         [0, 1, 5])
+        self.assertEqual(hardware.canonical_mapping([11, 10, 6], 1e-9),
+                         [8, 9, 5])
+        self.assertEqual(hardware.canonical_mapping([0, 1, 5]), [0, 1, 5])
+
+    def test_set_fidelity(self):
+        hardware = build_grid(3, 3)
+        self.assertEqual(len(hardware.automorphisms(1e-9)), 8)
+        hardware.set_fidelity('single_qubit', 'f1QRB', 0, 0.9)
+        # the corners are no longer alike
+        self.assertEqual(len(hardware.automorphisms(1e-9)), 2)
+        self.assertEqual(len(hardware.automorphisms()), 8)
+
+    def test_large_groups(self):
+        # 9! symmetries of a star, 10! of a fully connected device
+        star = build_graph(10, [(0, q) for q in range(1, 10)])
+        self.assertEqual(star.canonical_mapping([7, 0, 3]), [1, 0, 2])
+        complete = build_graph(10, [(u, v) for u in range(10)
+                                    for v in range(u + 1, 10)])
+        self.assertEqual(complete.canonical_mapping([9, 4, 6, 0]),
+                         [0, 1, 2, 3])
+        self.assertEqual(complete.orbits()[5], list(range(10)))
+        with self.assertRaises(ValueError):
+            complete.automorphisms(limit=1000)
+
+    def test_pendant_symmetry(self):
+        # a path with a pendant qubit on its second qubit
+        hardware = build_graph(5, [(0, 1), (1, 2), (2, 3), (1, 4)])
+        self.assertEqual(hardware.orbits()[2], [2])
+        self.assertEqual(hardware.canonical_mapping([3, 2]), [3, 2])
+        # 0 and 4 are both pendant on 1
+        self.assertEqual(hardware.canonical_mapping([4, 3]), [0, 3])
+        with self.assertRaises(KeyError):
+            hardware.canonical_mapping([7])
+
+
+if __name__ == '__main__':
+    unittest.main()
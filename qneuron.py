@@ -9,7 +9,10 @@ from pyquil.gates import RY, RZ, Y, NOT, H, CNOT, MEASURE
 from pyquil.api import QVMConnection
 from pyquil.parameters import Parameter, quil_sin, quil_cos
 from pyquil.device import Device
-from pyquil.api import CompilerConnection
+
+import _neuron_template
+from _compiler_pool import CompilerPool
+from _coplacement import merge_programs
 
 qvm = QVMConnection()
 
@@ -53,28 +56,72 @@ def DOUBLERYINV(w, beta, q0, q1, q2):
     """
     return Program(RY(-beta, q2), CRY(-4*w[1], q1, q2), CRY(-4*w[0], q0, q2))
 
+class NeuronTemplate(_neuron_template.NeuronTemplate):
+    """
+    Quil text of the quantum neuron circuit for a fixed qubit layout,
+    built once with the gate angles left as format fields, preceded by
+    the definitions of the new gates. Binding a weight/bias pair only
+    formats the angles into the text.
+    """
+    def __init__(self, inputs, training, ancilla, output, measure=False):
+        super(NeuronTemplate, self).__init__(
+            inputs, training, ancilla, output, measure,
+            add_new_gates(Program()).out())
+
+    def bind(self, w, b):
+        """
+        Returns the Program of the neuron for a weight/bias pair.
+        """
+        return Program(self.bind_text(w, b))
+
+    def bind_many(self, weights, biases, as_text=False):
+        """
+        Returns the programs of many weight/bias pairs.
+
+        Args:
+            weights: (N, 2) array of weights
+            biases: (N,) array of biases
+            as_text: return Quil text instead of Programs
+        """
+        texts = self.bind_many_text(weights, biases)
+        if as_text:
+            return texts
+        return [Program(text) for text in texts]
+
+    def parametric_program(self):
+        return Program(self.parametric_text())
+
+_neuron_templates = {}
+
+def get_neuron_template(inputs, training, ancilla, output, measure=False):
+    """
+    Returns the NeuronTemplate of a qubit layout, building it on first use.
+    """
+    key = (tuple(inputs), training, tuple(ancilla), output, measure)
+    if key not in _neuron_templates:
+        _neuron_templates[key] = NeuronTemplate(inputs, training, ancilla,
+                                                output, measure)
+    return _neuron_templates[key]
+
 # Function which generates a Program object for the quantum neuron circuit
 def make_neuron(w, b, inputs, training, ancilla, output):
-    beta = np.pi/4. + b - w[0] - w[1]
-    neuron_prog = add_new_gates(Program())
-    
-    neuron_prog += Program(H(inputs[0]), H(inputs[1]), CNOT(inputs[0], training), CNOT(inputs[1], training))
-    
-    neuron_prog += DOUBLERY(w, beta, inputs[0], inputs[1], ancilla[0])
-    neuron_prog += CMIY(ancilla[0], ancilla[2])
-    neuron_prog += DOUBLERYINV(w, beta, inputs[0], inputs[1], ancilla[0])
-    neuron_prog += CMIY(ancilla[2], output)
-    
-    neuron_prog += DOUBLERYINV(w, beta, inputs[0], inputs[1], ancilla[1])
-    neuron_prog += CIY(ancilla[1], ancilla[2])
-    neuron_prog += DOUBLERY(w, beta, inputs[0], inputs[1], ancilla[1])
-    return neuron_prog
+    return get_neuron_template(inputs, training, ancilla, output).bind(w, b)
+
+# Function which generates one Program running several neurons side by side,
+# neuron k on the qubits mapping[k] ordered as inputs, training, ancilla
+# and output
+def make_neurons(weights, biases, mappings, measure=True):
+    programs = [get_neuron_template(m[0:2], m[2], m[3:6], m[6],
+                                    measure).bind_text(w, b)
+                for w, b, m in zip(weights, biases, mappings)]
+    return Program(merge_programs(programs))
 
 # Load device information and generate compiler object
 with open('19Q-Acorn.json', 'r') as infile:
     dev_data = json.load(infile)
 acorn = Device('19Q-Acorn', dev_data)
-compiler = CompilerConnection(acorn)
+# pooled connections to the compiler, made when first needed
+compiler = CompilerPool(device=acorn)
 
 # Helper function which prints the status of the compilation
 def print_job_stats(job):
@@ -85,9 +132,8 @@ def check_compilation(inputs, training, ancilla, output, cmp=compiler):
     qnn_prog = make_neuron([0, 1], np.pi/3., inputs, training, ancilla, output)
     qubits = list(inputs + [training] + ancilla + [output])
     qnn_prog += Program([MEASURE(xx, xx) for xx in qubits])
-    compiled_result = compiler.compile_async(Program(qnn_prog))
-    job = compiler.get_job(compiled_result)
-    job = wait_for_job(compiled_result)
+    compiled_result = cmp.compile_async(Program(qnn_prog))
+    job = cmp.wait_for_job(compiled_result)
     #print_job_stats(job)
     return job
 
@@ -5,10 +5,17 @@ __author__ = 'Yudong Cao'
 
 from qneuron import *
 from hardwaregraph import *
-
+from _local_compiler import LocalCompiler
+from _coplacement import CoPlacement
+from _reallocation import calibration_changes, reallocate
+from _placement import program_interactions, greedy_placement,\
+	spectral_placement, move_delta
+import _annealing
+import _tabu
+
+from math import log
 from random import randint, uniform, shuffle
 from copy import deepcopy
-from math import exp
 
 # Hardware graph of Rigetti
 # See Figure 1a at http://pyquil.readthedocs.io/en/latest/qpu.html
@@ -18,6 +25,21 @@ HG = Hardware_load(input_file, options)
 adj_list = HG.adjacency_list
 subgraph_size = 7 # for 7 qubits in the qneuron circuit
 
+# Compiler used by the objective function, qneuron's remote compiler by
+# default. The local compiler routes the circuit on HG offline and
+# deterministically, e.g. as a baseline; see use_local_compiler
+obj_compiler = compiler
+local_compiler = LocalCompiler(HG)
+
+def use_local_compiler(enable = True):
+	"""
+	Switch the objective functions to the local compiler, or back to the
+	remote one. The objective values already computed are dropped.
+	"""
+	global obj_compiler
+	obj_compiler = local_compiler if enable else compiler
+	obj_cache.clear()
+
 # Collect qubit labels
 qubit_labels = []
 for u,v in adj_list:
@@ -31,13 +53,23 @@ def neighbors(qubit_label):
 	return set([y for x,y in adj_list if x==qubit_label] +\
 		   [y for y,x in adj_list if x==qubit_label])
 
+# Objective values by canonical mapping. Mappings related by a symmetry of
+# HG are compiled once, as their canonical mapping: the routing breaks ties
+# by qubit labels, so that is the mapping the value belongs to
+obj_cache = {}
+
 # Objective function to be fed into SA subroutine
 def obj_func(input_mapping):
-	res = check_compilation(inputs=input_mapping[0:2],\
-				training=input_mapping[2],\
-				ancilla=input_mapping[3:6],\
-				output=input_mapping[6])
-	return res.topological_swaps()+res.gate_depth()
+	key = tuple(HG.canonical_mapping(input_mapping))
+	if key not in obj_cache:
+		mapping = list(key)
+		res = check_compilation(inputs=mapping[0:2],\
+					training=mapping[2],\
+					ancilla=mapping[3:6],\
+					output=mapping[6],\
+					cmp=obj_compiler)
+		obj_cache[key] = res.topological_swaps()+res.gate_depth()
+	return obj_cache[key]
 
 # Function for generating a connected subgraph of the hardware given a starting
 # node
@@ -70,6 +102,18 @@ def init_gen(): # choose a random initial node
 
 	return connected_subgraph_gen(qubit_chosen)
 
+# Interaction weights of the neuron qubits, in the order of the mappings:
+# inputs, training, ancilla and output
+neuron_qubits, neuron_weights = program_interactions(\
+	get_neuron_template([0,1], 2, [3,4,5], 6).parametric_text(),\
+	list(range(subgraph_size)))
+
+def greedy_init(): # place the busiest qubits on the best hardware qubits
+	return greedy_placement(HG, neuron_weights)
+
+def spectral_init(): # align the spectra of the neuron and of the hardware
+	return spectral_placement(HG, neuron_weights)
+
 # Function for perturbing a particular connected subgraph of the hardware
 def perturb_subgraph(qubit_list):
 
@@ -77,8 +121,8 @@ def perturb_subgraph(qubit_list):
 	if eta > 0.5:
 		# Generate a connected subgraph from a random node on the
 		# current subgraph
-        	rand_index = randint(0,len(qubit_list)-1)
-        	qubit_chosen = qubit_list[rand_index]
+		rand_index = randint(0,len(qubit_list)-1)
+		qubit_chosen = qubit_list[rand_index]
 		output_list = connected_subgraph_gen(qubit_chosen)
 	else:
 		# Shuffle the qubit labels in the current subgraph
@@ -116,96 +160,95 @@ default_options = {
 	'perturb': perturb_subgraph,
 }
 
+def canonical_results(results, obj_function):
+	"""
+	Returns the results of a search with the best mapping replaced by the
+	canonical one when obj_function is obj_func, since fval_opt is the
+	objective of that mapping
+	"""
+	if obj_function is obj_func:
+		results['xval_opt'] = HG.canonical_mapping(results['xval_opt'])
+	return results
+
 def sa(init_guess, obj_function, options = default_options):
+	"""
+	Simulated annealing of _annealing.sa, with the options of this module
+	by default. See _annealing.sa for the options and the results.
+	"""
+	return canonical_results(\
+		_annealing.sa(init_guess, obj_function, options), obj_function)
+
+# Tabu search, an alternative to sa which never compiles a mapping twice.
+# The placement cost changes of the moves rank them, so that only the most
+# promising ones are compiled
+tabu_options = {
+	'neighborhood': _tabu.swap_relocate(HG),
+	'delta': move_delta(HG, neuron_weights),
+	'maxiter': 200,
+	'sample_size': 10,
+	'tenure': 7,
+	'tabu_size': 50,
+}
+
+def tabu(init_guess, obj_function, options = tabu_options):
+	"""
+	Tabu search of _tabu.tabu_search, with the options of this module by
+	default. It returns the same results as sa, for comparisons.
+	"""
+	return canonical_results(\
+		_tabu.tabu_search(init_guess, obj_function, options), obj_function)
+
+# Co-placement of several neurons on disjoint regions of the hardware
+def coplace_neurons(n_neurons, options = None):
 	"""
 	Args:
-		init_guess: initial guess for the qubit mapping.
-		obj_function: Objective function
-		options: a dictionary containing optimization settings.
-			'init_T': initial temperature
-			'time_const': time constant
-			'step_perT': iterations per temperature
-			'final_T': final temperature
-				The overall annealing has temperature dropping
-				as T0 * exp(-t/tau) where T0 is the initial
-				temperature and tau is the time constant. Here
-				the time parameter t is an integer marking the
-				number of steps in dropping temperature so far. 				For every 'step_perT' number of iterations we 
-				increment t by 1. Iterations are stopped until
-				final temperature is reached or maximum number
-				of iterations is reached.
-			'maxiter': maximum number of iterations
-			'perturb': function for perturbing the current guess
+		n_neurons: number of neurons placed together
+		options: simulated annealing settings, see _annealing.sa
+
 	Returns:
-		results: a dictionary containing the outcome of optimization
-			'fval_opt': optimized function value
-			'xval_opt': optimized input
-			'total_iter': total number of iterations
+		results: outcome of the annealing, 'xval_opt' holding one
+			mapping per neuron, canonical as a whole
 	"""
+	placement = CoPlacement(HG, [subgraph_size] * n_neurons,\
+		lambda k, mapping: obj_func(mapping),\
+		canonicalize=HG.canonical_mapping)
+	return placement.optimize(options=options)
+
+# Objective depending on the calibration: minus the log of the fidelity of
+# the circuit routed by cmp, obj_compiler by default
+def fidelity_obj_func(input_mapping, cmp = None):
+	if cmp is None:
+		cmp = obj_compiler
+	res = check_compilation(inputs=input_mapping[0:2],\
+				training=input_mapping[2],\
+				ancilla=input_mapping[3:6],\
+				output=input_mapping[6],\
+				cmp=cmp)
+	return -log(res.program_fidelity())
 
-	# General simulated annealing parameters
-	iter_count = 0
-	iter_max = options['maxiter']
-	xval_current = init_guess
-	fval_current = obj_function(init_guess)
-	ps = options['perturb']
-
-	# Annealing scheme parameters
-	T0 = options['init_T']
-	tau = options['time_const']
-	inner_count = 0
-	step_perT = options['step_perT']
-	t = 0
-	T_current = T0
-	T_final = options['final_T']
-	if T0*exp(-iter_max/(step_perT*tau)) > T_final:
-		print('Warning: final temperature not reached even at maximum iteration.')
-
-	# Storing the history
-	history_xval = [xval_current]
-	history_fval = [fval_current]
-	xval_opt = xval_current
-	fval_opt = fval_current
-
-	print("Iter\tFval")
-	while iter_count < iter_max and T_current > T_final:
-
-		# Generate and evaluate new guess
-		xval_proposed = ps(xval_current)
-		try:
-			fval_proposed = obj_function(xval_proposed)
-			print("%d\t%d" % (iter_count, fval_proposed))	
-			iter_count = iter_count + 1
-			inner_count = inner_count + 1
-		except (AttributeError, ValueError):
-			#print("(Error from quilc received and handled)")
-			fval_proposed = fval_current
-		delta_f = fval_proposed - fval_current		
-
-		# Metropolis step
-		if inner_count == step_perT:
-			t = t + 1
-			T_current = T0 * exp(-t/tau)
-			inner_count = 0
-		eta = uniform(0,1)
-		if eta < min(1,exp(-delta_f/T_current)):
-			if fval_proposed < fval_current:
-				xval_opt = xval_proposed
-				fval_opt = fval_proposed
-			xval_current = xval_proposed
-			fval_current = fval_proposed
-		history_xval = history_xval + [xval_current]
-		history_fval = history_fval + [fval_current]
-		
-		result = {
-			'fval_opt': fval_opt,
-			'xval_opt': xval_opt,
-			'total_iter': iter_count,
-			'history_xval': history_xval,
-			'history_fval': history_fval
-		}
-	return result
+# Re-allocation of a neuron after a recalibration of the hardware
+def reallocate_neuron(previous, new_HG, options = None):
+	"""
+	Args:
+		previous: best mapping found on HG
+		new_HG: HardwareGraph of the new calibration, e.g. loaded by
+			Hardware_load
+		options: settings of the warm annealing, see
+			_reallocation.reallocate
+
+	Returns:
+		results: outcome of the annealing, see _reallocation.reallocate.
+			Only the logical qubits on changed qubits or couplings are
+			moved, unless previous uses a qubit missing from new_HG.
+	"""
+	qubits, edges = calibration_changes(HG, new_HG)
+	# the local compiler routes on the new calibration
+	new_compiler = LocalCompiler(new_HG)\
+		if obj_compiler is local_compiler else obj_compiler
+	return reallocate(new_HG, previous,\
+		lambda mapping: fidelity_obj_func(mapping, new_compiler),\
+		qubits, edges, options)
 
 if __name__ == "__main__":
-	init_guess = init_gen()
+	init_guess = greedy_init()
 	res = sa(init_guess, obj_func)